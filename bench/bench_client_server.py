@@ -0,0 +1,156 @@
+# bench/bench_client_server.py
+"""
+Client-server socket throughput and end-to-end latency.
+
+One process holds a ServerState and a ClientServer on a Unix socket (or TCP)
+and applies level updates to B books at a target rate, notifying the server
+after each. C client processes each subscribe to every book and read until
+the run ends.
+
+Each update's quantity is the monotonic clock in microseconds when it was
+applied, so a client measures update -> ServerState -> diff -> socket ->
+decode latency from the levels it receives. Reports, per client, messages
+and levels per second plus latency percentiles, and the server's delivery
+counters. `--slow N` makes N of the clients sleep after every message, to
+show conflation: slow clients fall behind without holding up ingest or the
+other clients.
+
+usage:
+    python bench/bench_client_server.py [--clients C] [--books B] [--rate U] [--seconds S] [--tcp] [--slow N]
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+import client_protocol as proto  # noqa: E402
+
+_WRAP_US = 10 ** 9
+
+
+def _now_us() -> int:
+    return time.monotonic_ns() // 1000 % _WRAP_US
+
+
+def _client(address, books: int, seconds: float, delay: float, ready, results):
+    async def run():
+        if isinstance(address, str):
+            client = await proto.BookClient.connect_unix(address)
+        else:
+            client = await proto.BookClient.connect_tcp(*address)
+        for i in range(books):
+            await client.subscribe("bench", f"m{i}")
+        ready.put(True)
+        msgs = levels = 0
+        lat = []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                msg = await asyncio.wait_for(client.recv(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            if delay:
+                await asyncio.sleep(delay)
+            if type(msg) is proto.Diff:
+                now = _now_us()
+                qty = msg.levels["quantity"]
+                qty = qty[qty > 0]
+                lat.append((now - qty) % _WRAP_US)
+                msgs += 1
+                levels += len(msg.levels)
+        await client.close()
+        lat = np.concatenate(lat) if lat else np.zeros(1)
+        results.put((msgs / seconds, levels / seconds, *np.percentile(lat, [50, 90, 99, 99.9])))
+    asyncio.run(run())
+
+
+async def _serve(address, args, ready):
+    import orderbook_ext as ob
+    from client_server import ClientServer
+
+    state = ob.ServerState()
+    server = ClientServer(state)
+    if isinstance(address, str):
+        await server.start(path=address)
+    else:
+        await server.start(host=address[0], port=address[1])
+    handles = [state.register_book("bench", f"m{i}") for i in range(args.books)]
+    for h in handles:
+        state.init_order_book(h, [ob.LOBEntry(p / 100, 1.0) for p in range(30, 50)],
+                              [ob.LOBEntry(p / 100, 1.0) for p in range(51, 70)])
+
+    for _ in range(args.clients):
+        await asyncio.get_running_loop().run_in_executor(None, ready.get)
+
+    rng = random.Random(0)
+    prices = [p / 100 for p in range(1, 100)]
+    per_tick = max(1, args.rate // 1000)
+    n = 0
+    start = time.monotonic()
+    while time.monotonic() - start < args.seconds:
+        for _ in range(per_tick):
+            price = rng.choice(prices)
+            state.update_order_book(rng.choice(handles), "y", "b" if price < 0.5 else "o",
+                                    ob.LOBEntry(price, float(_now_us())), False)
+            server.notify()
+        n += per_tick
+        # pace to the target rate; also lets the loop publish
+        await asyncio.sleep(max(0.0, n / args.rate - (time.monotonic() - start)))
+    rate = n / (time.monotonic() - start)
+    stats = server.stats()
+    await asyncio.sleep(0.5)
+    await server.close()
+    return rate, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--books", type=int, default=16)
+    parser.add_argument("--rate", type=int, default=20000, help="target updates per second")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--tcp", action="store_true", help="use TCP on localhost instead of a unix socket")
+    parser.add_argument("--slow", type=int, default=0, help="clients that sleep 1ms after each message")
+    args = parser.parse_args()
+
+    address = ("127.0.0.1", 47811) if args.tcp else os.path.join(tempfile.mkdtemp(), "bench.sock")
+    ctx = mp.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+
+    async def run():
+        server = asyncio.create_task(_serve(address, args, ready))
+        await asyncio.sleep(0.5)  # let the server bind
+        procs = [ctx.Process(target=_client, args=(address, args.books, args.seconds,
+                                                   0.001 if i >= args.clients - args.slow else 0.0, ready, results))
+                 for i in range(args.clients)]
+        for p in procs:
+            p.start()
+        rate = await server
+        for p in procs:
+            p.join()
+        return rate
+
+    rate, stats = asyncio.run(run())
+    print(f"{'tcp' if args.tcp else 'unix'} socket, {args.books} books, {args.clients} clients, "
+          f"{rate:,.0f} updates/s applied")
+    print(f"{'client':>6} {'msgs/s':>10} {'levels/s':>10} {'p50 us':>8} {'p90 us':>8} {'p99 us':>8} {'p99.9 us':>9}")
+    for i in range(args.clients):
+        msgs, levels, p50, p90, p99, p999 = results.get()
+        print(f"{i:>6} {msgs:>10,.0f} {levels:>10,.0f} {p50:>8.0f} {p90:>8.0f} {p99:>8.0f} {p999:>9.0f}")
+    print(f"\nserver side{'':>4} {'frames':>8} {'conflated':>10} {'catch-ups':>10} {'max queue B':>12}")
+    for i, st in enumerate(stats):
+        print(f"connection {i:<4} {st['frames_sent']:>8,} {st['conflated']:>10,} {st['catch_ups']:>10,} "
+              f"{st['max_queue_bytes']:>12,}")
+
+
+if __name__ == "__main__":
+    main()
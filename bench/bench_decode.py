@@ -0,0 +1,105 @@
+# bench/bench_decode.py
+"""
+Messages/sec decoding exchange frames: json.loads + pydantic model (the
+validated path) vs fast_decode structs, for every message type in
+kalshi_tickerv2_dtypes and polymarket_wss_dtypes.
+
+usage:
+    python bench/bench_decode.py [--seconds S]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+import fast_decode as fd  # noqa: E402
+import kalshi_tickerv2_dtypes as ktypes  # noqa: E402
+import polymarket_wss_dtypes as ptypes  # noqa: E402
+
+TS = 1757000000
+
+KALSHI_SAMPLES = {
+    ktypes.SubscribedMessage: {"id": 1, "type": "subscribed", "msg": {"channel": "orderbook_delta", "sid": 1}},
+    ktypes.ErrorMessage: {"id": 1, "type": "error", "msg": {"code": 6, "msg": "Already subscribed"}},
+    ktypes.UnsubscribedMessage: {"sid": 1, "type": "unsubscribed"},
+    ktypes.OkMessage: {"id": 1, "sid": 1, "seq": 7, "type": "ok", "market_tickers": ["KXA", "KXB"]},
+    ktypes.OrderbookSnapshotMessage: {"type": "orderbook_snapshot", "sid": 1, "seq": 1, "msg": {
+        "market_ticker": "KXMAYORNYCNOMD-25-AC",
+        "yes": [[p, 100 + p] for p in range(1, 40)],
+        "no": [[p, 200 + p] for p in range(1, 40)]}},
+    ktypes.OrderbookDeltaMessage: {"type": "orderbook_delta", "sid": 1, "seq": 2, "msg": {
+        "market_ticker": "KXMAYORNYCNOMD-25-AC", "price": 54, "delta": -12, "side": "yes"}},
+    ktypes.TickerMessage: {"type": "ticker", "sid": 2, "msg": {
+        "market_ticker": "KXA", "price": 48, "yes_bid": 47, "yes_ask": 49, "volume": 1000, "open_interest": 500,
+        "dollar_volume": 480, "dollar_open_interest": 240, "ts": TS}},
+    ktypes.TickerV2Message: {"type": "ticker_v2", "sid": 2, "msg": {
+        "market_ticker": "KXA", "price": 48, "volume_delta": 3, "open_interest_delta": 1, "ts": TS}},
+    ktypes.TradeMessage: {"type": "trade", "sid": 3, "msg": {
+        "market_ticker": "KXA", "yes_price": 48, "no_price": 52, "count": 10, "taker_side": "yes", "ts": TS}},
+    ktypes.FillMessage: {"type": "fill", "sid": 4, "msg": {
+        "trade_id": "t1", "order_id": "o1", "market_ticker": "KXA", "is_taker": True, "side": "yes",
+        "yes_price": 48, "no_price": 52, "count": 10, "action": "buy", "ts": TS}},
+    ktypes.MarketLifecycleV2Message: {"type": "market_lifecycle_v2", "sid": 5, "msg": {
+        "event_type": "created", "market_ticker": "KXA", "open_ts": TS, "close_ts": TS + 3600}},
+    ktypes.EventLifecycleMessage: {"type": "event_lifecycle", "sid": 6, "msg": {
+        "event_ticker": "KXE", "title": "Event", "sub_title": "Sub", "collateral_return_type": "binary",
+        "series_ticker": "KXS", "strike_date": TS}},
+    ktypes.MarketLifecycleMessage: {"type": "market_lifecycle", "sid": 7, "msg": {
+        "market_ticker": "KXA", "open_ts": TS, "close_ts": TS + 3600, "result": "yes"}},
+    ktypes.MultivariateLookupMessage: {"type": "multivariate_lookup", "sid": 8, "msg": {
+        "collection_ticker": "KXC", "event_ticker": "KXE", "market_ticker": "KXA",
+        "selected_markets": [{"event_ticker": "KXE", "market_ticker": "KXA", "side": "yes"}] * 3}},
+}
+
+_ASSET = "33064224357523449786613480102704635026181428303479305990935387590344871823925"
+POLYMARKET_SAMPLES = {
+    ptypes.BookMessage: {"event_type": "book", "asset_id": _ASSET, "market": "0xabc", "timestamp": str(TS), "hash": "0x1",
+                         "bids": [{"price": f"{p / 100:.2f}", "size": "125.5"} for p in range(1, 40)],
+                         "asks": [{"price": f"{p / 100:.2f}", "size": "80"} for p in range(60, 99)]},
+    ptypes.PriceChangeMessage: {"event_type": "price_change", "asset_id": _ASSET, "market": "0xabc", "timestamp": str(TS),
+                                "hash": "0x2", "changes": [{"price": "0.48", "side": "BUY", "size": "10"},
+                                                           {"price": "0.52", "side": "SELL", "size": "0"}]},
+    ptypes.TickSizeChangeMessage: {"event_type": "tick_size_change", "asset_id": _ASSET, "market": "0xabc",
+                                   "old_tick_size": "0.01", "new_tick_size": "0.001", "timestamp": str(TS)},
+    ptypes.LastTradePriceMessage: {"event_type": "last_trade_price", "asset_id": _ASSET, "market": "0xabc",
+                                   "fee_rate_bps": "0", "price": "0.48", "side": "BUY", "size": "12", "timestamp": str(TS)},
+}
+
+
+def _rate(fn, frame, seconds: float) -> float:
+    n, batch = 0, 256
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            fn(frame)
+        n += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=0.5, help="time per measurement")
+    args = parser.parse_args()
+
+    print(f"json backend: {fd._loads.__module__ or 'json'}")
+    print(f"{'message':<28} {'pydantic msg/s':>15} {'fast msg/s':>12} {'speedup':>8}")
+    for model, sample in KALSHI_SAMPLES.items():
+        frame = json.dumps(sample)
+        slow = _rate(lambda f: model(**json.loads(f)), frame, args.seconds)
+        fast = _rate(fd.decode_kalshi, frame, args.seconds)
+        print(f"{'kalshi ' + sample['type']:<28} {slow:>15,.0f} {fast:>12,.0f} {fast / slow:>7.1f}x")
+    for model, sample in POLYMARKET_SAMPLES.items():
+        # polymarket frames are lists of events
+        frame = json.dumps([sample])
+        slow = _rate(lambda f: [model(**e) for e in json.loads(f)], frame, args.seconds)
+        fast = _rate(fd.decode_polymarket, frame, args.seconds)
+        print(f"{'polymarket ' + sample['event_type']:<28} {slow:>15,.0f} {fast:>12,.0f} {fast / slow:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# bench/bench_end_to_end.py
+"""
+End-to-end throughput and latency against the local exchange simulator.
+
+One process runs server/exchange_sim.py with M kalshi markets and M
+polymarket assets, each sending `--rate` x `--load` messages per second
+(with optional bursts). The server process runs the real pipeline against
+it: ConnectionPool shards with the real kalshi / polymarket clients, the
+chosen ingest path, ServerState and a ClientServer on a Unix socket. C
+client processes subscribe to every polymarket book.
+
+The simulator puts its send time in microseconds into every polymarket
+size, so clients measure exchange send -> websocket -> ingest -> diff ->
+socket -> decode latency from the levels they receive. Reports what the
+simulator sent, what the pool applied, the ingest queue's high-water mark,
+and per-client messages per second and latency percentiles.
+
+usage:
+    python bench/bench_end_to_end.py [--markets M] [--rate R] [--load X] [--seconds S] [--clients C]
+                                     [--ingest pydantic fast native] [--per-connection N]
+                                     [--burst-every S --burst-seconds S --burst-factor F]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+import client_protocol as proto  # noqa: E402
+
+_WRAP_US = 10 ** 9
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000 % _WRAP_US
+
+
+def _simulator(args, port, stop, stats):
+    from exchange_sim import ExchangeSimulator
+
+    async def run():
+        sim = ExchangeSimulator(port=0, markets=args.markets, rate=args.rate * args.load, probe=True,
+                                burst_every=args.burst_every, burst_seconds=args.burst_seconds,
+                                burst_factor=args.burst_factor)
+        await sim.start()
+        port.put(sim.port)
+        await asyncio.get_running_loop().run_in_executor(None, stop.get)
+        stats.put(sim.stats())
+        await sim.close()
+    asyncio.run(run())
+
+
+def _client(address, assets, seconds: float, ready, results):
+    async def run():
+        client = await proto.BookClient.connect_unix(address)
+        for a in assets:
+            await client.subscribe("polymarket", a)
+        ready.put(True)
+        msgs = 0
+        lat = []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                msg = await asyncio.wait_for(client.recv(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            if type(msg) is proto.Diff:
+                now = _now_us()
+                qty = msg.levels["quantity"]
+                qty = qty[qty > 0]
+                lat.append((now - qty) % _WRAP_US)
+                msgs += 1
+        await client.close()
+        lat = np.concatenate(lat) if lat else np.zeros(1)
+        results.put((msgs / seconds, *np.percentile(lat, [50, 90, 99, 99.9])))
+    asyncio.run(run())
+
+
+async def _serve(address, sim_port: int, args, ctx, ready, results):
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    import orderbook_ext as ob
+    from client_server import ClientServer
+    from connection_pool import ConnectionPool
+    from exchange_sim import ExchangeSimulator
+    from kalshi_client import Environment
+    from server_internal_dtypes import Auth_Kalshi, Endpoint
+    from websocket_handlers import add_kalshi_feed, add_polymarket_feed
+
+    names = ExchangeSimulator(markets=args.markets)
+    tickers, assets = names.kalshi_tickers(), names.polymarket_assets()
+    marks = [Endpoint(description=None, group_id=None, market_name=None, token_id=None, exchange_id=ex, market_id=m)
+             for ex, ms in (("kalshi", tickers), ("polymarket", assets)) for m in ms]
+    # the simulator does not check signatures; any key will do
+    auth = Auth_Kalshi(keyid="sim", env=Environment.DEMO,
+                       private_key=rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+    state = ob.ServerState()
+    pool = ConnectionPool(state)
+    server = ClientServer(state)
+    pool.on_update = server.notify
+    fast, native = args.ingest != "pydantic", args.ingest == "native"
+    add_kalshi_feed(pool, marks, auth, fast, native, max_markets_per_connection=args.per_connection,
+                    ws_base_url=f"ws://127.0.0.1:{sim_port}")
+    add_polymarket_feed(pool, marks, fast, native, max_markets_per_connection=args.per_connection,
+                        url=f"ws://127.0.0.1:{sim_port}/ws/")
+    await server.start(path=address)
+    with contextlib.redirect_stdout(io.StringIO()):  # the clients print their subscribe commands
+        running = asyncio.create_task(pool.run())
+        await asyncio.sleep(args.warmup)
+    procs = [ctx.Process(target=_client, args=(address, assets, args.seconds, ready, results))
+             for _ in range(args.clients)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        await asyncio.get_running_loop().run_in_executor(None, ready.get)
+
+    def applied():
+        return sum(s["messages"] for s in pool.stats())
+    first, start = applied(), time.monotonic()
+    await asyncio.sleep(args.seconds)
+    rate = (applied() - first) / (time.monotonic() - start)
+    for p in procs:
+        await asyncio.get_running_loop().run_in_executor(None, p.join)
+    running.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await running
+    stats = pool.stats()
+    await server.close()
+    return rate, pool.max_queue_depth, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markets", type=int, default=200, help="markets per exchange")
+    parser.add_argument("--rate", type=float, default=2.0, help="production messages per second per market")
+    parser.add_argument("--load", type=float, default=10.0, help="multiple of production rate")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--ingest", default="native", choices=["pydantic", "fast", "native"])
+    parser.add_argument("--per-connection", type=int, default=250, help="max markets per exchange connection")
+    parser.add_argument("--burst-every", type=float, default=0.0)
+    parser.add_argument("--burst-seconds", type=float, default=0.0)
+    parser.add_argument("--burst-factor", type=float, default=1.0)
+    args = parser.parse_args()
+
+    address = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    ctx = mp.get_context("spawn")
+    port, stop, sim_stats, ready, results = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+    sim = ctx.Process(target=_simulator, args=(args, port, stop, sim_stats))
+    sim.start()
+    rate, depth, stats = asyncio.run(_serve(address, port.get(), args, ctx, ready, results))
+    stop.put(True)
+    sent = sim_stats.get()
+    sim.join()
+
+    target = 2 * args.markets * args.rate * args.load
+    print(f"{args.markets} markets per exchange at {args.rate:g} msg/s x{args.load:g} = {target:,.0f} msg/s, "
+          f"{args.ingest} ingest")
+    print(f"simulator sent {sum(sent['frames_sent'].values()):,} frames "
+          f"({sent['messages_sent']['kalshi']:,} kalshi, {sent['messages_sent']['polymarket']:,} polymarket messages)")
+    print(f"pool applied {rate:,.0f} frames/s over {len(stats)} connections, max ingest queue {depth:,}, "
+          f"errors {sum(s['errors'] for s in stats)}")
+    print(f"{'client':>6} {'msgs/s':>10} {'p50 us':>8} {'p90 us':>8} {'p99 us':>8} {'p99.9 us':>9}")
+    for i in range(args.clients):
+        msgs, p50, p90, p99, p999 = results.get()
+        print(f"{i:>6} {msgs:>10,.0f} {p50:>8.0f} {p90:>8.0f} {p99:>8.0f} {p999:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# bench/bench_replay.py
+"""
+Replay a feed recording (server/feed_recorder.py) into a fresh ServerState
+through each ingest path and report throughput.
+
+Without a recording, writes a synthetic one first (kalshi snapshots and
+deltas on one sid per market, polymarket book / price_change /
+tick_size_change batches) and reports the recorder's own cost and
+compression ratio. `--speed` paces the replay (1.0 = recorded pace); the
+default replays as fast as possible.
+
+usage:
+    python bench/bench_replay.py [RECORDING_DIR] [--ingest pydantic fast native] [--speed X]
+                                 [--frames N] [--markets M] [--compress]
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+from feed_recorder import FeedRecorder, replay  # noqa: E402
+from orderbook_ext import ServerState  # noqa: E402
+
+
+def _synthetic_frames(n: int, markets: int, seed: int = 0):
+    """ (exchange, frame) pairs, about 60% kalshi """
+    r = random.Random(seed)
+    seq = {}
+    for m in range(markets):
+        seq[m] = 1
+        yield "kalshi", json.dumps({"type": "orderbook_snapshot", "sid": m + 1, "seq": 1, "msg": {
+            "market_ticker": f"K{m}", "market_id": f"k{m}",
+            "yes": [[p, r.randint(1, 500)] for p in range(1, 50, 3)],
+            "no": [[p, r.randint(1, 500)] for p in range(1, 50, 3)]}})
+        yield "polymarket", json.dumps([{"event_type": "book", "asset_id": f"P{m}", "market": "0xm",
+            "bids": [{"price": f"{p / 100:.2f}", "size": str(r.randint(1, 500))} for p in range(1, 50, 3)],
+            "asks": [{"price": f"{p / 100:.2f}", "size": str(r.randint(1, 500))} for p in range(51, 100, 3)],
+            "timestamp": "1", "hash": "h"}])
+    for _ in range(n):
+        m = r.randrange(markets)
+        if r.random() < 0.6:
+            seq[m] += 1
+            yield "kalshi", json.dumps({"type": "orderbook_delta", "sid": m + 1, "seq": seq[m], "msg": {
+                "market_ticker": f"K{m}", "market_id": f"k{m}", "price": r.randint(1, 99),
+                "delta": r.randint(-20, 20), "side": r.choice(["yes", "no"])}})
+        elif r.random() < 0.002:
+            yield "polymarket", json.dumps([{"event_type": "tick_size_change", "asset_id": f"P{m}", "market": "0xm",
+                                             "old_tick_size": "0.01", "new_tick_size": "0.01", "timestamp": "1"}])
+        else:
+            yield "polymarket", json.dumps([{"event_type": "price_change", "asset_id": f"P{m}", "market": "0xm",
+                "changes": [{"price": f"{r.randint(1, 99) / 100:.2f}", "side": r.choice(["BUY", "SELL"]),
+                             "size": str(r.randint(0, 500))} for _ in range(r.randint(1, 4))],
+                "timestamp": "1", "hash": "h"}])
+
+
+def _record_synthetic(directory: str, args) -> None:
+    frames = list(_synthetic_frames(args.frames, args.markets))
+    ns = time.time_ns()
+    start = time.perf_counter()
+    with FeedRecorder(directory, compress=args.compress) as rec:
+        for i, (exchange, frame) in enumerate(frames):
+            rec.record(exchange, 0, frame, ns + i * 100_000)  # 10k frames/s of recorded time
+    elapsed = time.perf_counter() - start
+    st = rec.stats()
+    print(f"recorded {st['frames']:,} frames in {elapsed:.2f}s ({st['frames'] / elapsed:,.0f} frames/s), "
+          f"{st['bytes_in'] / 1e6:.1f} MB -> {st['bytes_written'] / 1e6:.1f} MB on disk "
+          f"in {st['segments']} segment(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", nargs="?", help="recording directory (default: synthesize one)")
+    parser.add_argument("--ingest", nargs="+", default=["pydantic", "fast", "native"],
+                        choices=["pydantic", "fast", "native"])
+    parser.add_argument("--speed", type=float, default=0.0, help="1.0 = recorded pace, 0 = as fast as possible")
+    parser.add_argument("--frames", type=int, default=200_000, help="synthetic frames")
+    parser.add_argument("--markets", type=int, default=100, help="synthetic markets per exchange")
+    parser.add_argument("--compress", action="store_true", help="compress the synthetic recording")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.recording
+        if path is None:
+            path = tmp
+            _record_synthetic(path, args)
+        print(f"{'ingest':>9} {'frames':>9} {'errors':>7} {'seconds':>8} {'frames/s':>10} {'MB/s':>7} {'max lag ms':>11}")
+        for ingest in args.ingest:
+            st = replay(path, ServerState(), ingest=ingest, speed=args.speed)
+            print(f"{ingest:>9} {st.frames:>9,} {st.errors:>7,} {st.seconds:>8.2f} {st.frames_per_second:>10,.0f} "
+                  f"{st.bytes / st.seconds / 1e6 if st.seconds else 0:>7.1f} {st.max_lag_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench/bench_shm.py
+"""
+Same-host book reads through the shared-memory mirror.
+
+A writer process feeds a ServerState with shared memory enabled at a target
+update rate; this process reads top of book and 10-level depth through
+orderbook_ext.ShmReader (C++) and server/shm_reader.py (pure Python), and,
+for comparison, through ServerState.get_market in the writer's own process.
+
+usage:
+    python bench/bench_shm.py [--books N] [--rate U] [--seconds S]
+"""
+import argparse
+import multiprocessing as mp
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+import orderbook_ext as ob  # noqa: E402
+from shm_reader import ShmBooks  # noqa: E402
+
+SHM_NAME = "predme_bench_shm"
+
+
+def _writer(books: int, rate: int, seconds: float, ready):
+    state = ob.ServerState()
+    state.enable_shm(SHM_NAME, max_books=max(books, 16))
+    handles = [state.register_book("bench", f"m{i}") for i in range(books)]
+    for h in handles:
+        state.init_order_book(h, [ob.LOBEntry(p / 100, 10.0) for p in range(30, 50)],
+                              [ob.LOBEntry(p / 100, 10.0) for p in range(51, 70)])
+    ready.set()
+    rng = random.Random(0)
+    start = time.monotonic()
+    n = 0
+    while time.monotonic() - start < seconds:
+        for _ in range(100):
+            price = rng.randint(1, 99) / 100
+            state.update_order_book(rng.choice(handles), "y", "b" if price < 0.5 else "o",
+                                    ob.LOBEntry(price, float(rng.randint(0, 20))), False)
+        n += 100
+        time.sleep(max(0.0, n / rate - (time.monotonic() - start)))
+    ready.clear()
+
+
+def _ns_per_call(fn, handles, seconds: float) -> float:
+    n = 0
+    start = time.perf_counter_ns()
+    deadline = start + int(seconds * 1e9)
+    while True:
+        for h in handles:
+            fn(h)
+        n += len(handles)
+        now = time.perf_counter_ns()
+        if now >= deadline:
+            return (now - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=16)
+    parser.add_argument("--rate", type=int, default=50000, help="writer updates per second")
+    parser.add_argument("--seconds", type=float, default=0.5, help="time per measurement")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    ready = ctx.Event()
+    writer = ctx.Process(target=_writer, args=(args.books, args.rate, args.seconds * 6 + 2, ready))
+    writer.start()
+    ready.wait()
+
+    native = ob.ShmReader(SHM_NAME)
+    python = ShmBooks(SHM_NAME)
+    handles = [native.find("bench", f"m{i}") for i in range(args.books)]
+
+    local = ob.ServerState()
+    lh = [local.register_book("bench", f"m{i}") for i in range(args.books)]
+    for h in lh:
+        local.init_order_book(h, [ob.LOBEntry(p / 100, 10.0) for p in range(30, 50)],
+                              [ob.LOBEntry(p / 100, 10.0) for p in range(51, 70)])
+
+    rows = [
+        ("ShmReader.top_of_book", native.top_of_book, handles),
+        ("ShmReader.depth(10)", native.depth, handles),
+        ("ShmBooks.top_of_book", python.top_of_book, handles),
+        ("ShmBooks.depth(10)", python.depth, handles),
+        ("in-process get_market", local.get_market, lh),
+    ]
+    print(f"writer at ~{args.rate:,} updates/s over {args.books} books")
+    print(f"{'read':<24} {'ns/call':>10}")
+    for label, fn, hs in rows:
+        print(f"{label:<24} {_ns_per_call(fn, hs, args.seconds):>10,.0f}")
+    python.close()
+    writer.join()
+
+
+if __name__ == "__main__":
+    main()
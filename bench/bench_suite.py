@@ -0,0 +1,546 @@
+# bench/bench_suite.py
+"""
+Reproducible benchmark suite for the order book core, ServerState and the
+ingest handlers, against the C++ extension and the legacy pure-Python
+implementation in server/.old.
+
+    core      OrderBookCore: update_level, update_levels, add_limit_order,
+              get_col, best_bid / best_offer, set_tick_size
+    state     ServerState.get_market on 1k, 10k and 100k books, and (C++
+              only) get_depth of 10 levels, get_bbo, and get_bbos of a
+              thousand books per call
+    handlers  kalshi and polymarket frames from a synthetic stream through
+              each ingest path (pydantic, fast, native)
+    ticks     ServerState with TICK_BOOKS books at tick sizes 0.01, 0.001
+              and 0.0001, each with 40 levels a side near the touch:
+              update_order_book (a third of them clear a level),
+              get_book_arrays and get_market; rss is the books' memory
+    kalshi    kalshi snapshots and deltas (integer cents, half of them on
+              the no side) applied through the float price API, as the
+              handlers used to, and through the integer tick API
+    groups    GROUPS groups of a kalshi and a polymarket book (the polymarket
+              one with yes and no swapped): integer tick deltas on books in
+              no group and in a group, the group book's get_group_depth of
+              10 levels, get_group_bbo and get_group_bbos of a thousand
+              groups per call, against merging get_market of the members
+              in Python. Then, at 1k and 10k groups, top_spreads of 10, and
+              batches of 100 deltas each followed by a SpreadScanner scan,
+              against following each with a poll of every member's
+              get_bbos and a numpy top 10 of the groups' spreads
+
+Every case reports ops/s from a tight loop, p50 / p99 latency from
+individually timed calls (less the timer's own cost), and the resident
+memory the case added. The legacy implementation has no handlers, and has
+get_best for best_bid / best_offer. Its methods are coroutines, which are
+run without an event loop, since their locks are never contended here.
+
+`--json` saves the results with the commit and machine they came from;
+`--compare` prints the speedup over an earlier run.
+
+usage:
+    python bench/bench_suite.py [--impl cpp legacy] [--only core state handlers ticks kalshi groups] [--quick]
+                                [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import ctypes
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "server"))
+
+from bench_replay import _synthetic_frames  # noqa: E402
+
+BOOK_COUNTS = [1_000, 10_000, 100_000]
+TICK_SIZES = [0.01, 0.001, 0.0001]
+TICK_BOOKS = 1_000
+GROUPS = 1_000
+SPREAD_GROUPS = [1_000, 10_000]
+LATENCY_SAMPLES = 20_000
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:  # not linux: peak rather than current
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def _release():
+    """ collect, and hand freed heap back to the OS so the next RSS baseline is honest """
+    gc.collect()
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):  # not glibc
+        pass
+
+
+def _timer_overhead_ns() -> int:
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(10_000):
+        t = clock()
+        samples.append(clock() - t)
+    return int(np.median(samples))
+
+
+def _drive(coro):
+    """ run a legacy coroutine that never suspends """
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("legacy call suspended")
+
+
+class Case:
+    """ `setup()` builds the fixture and returns (op, args); `op(arg)` is timed once per arg """
+
+    def __init__(self, group: str, name: str, impl: str, setup, params: dict | None = None):
+        self.group = group
+        self.name = name
+        self.impl = impl
+        self.setup = setup
+        self.params = params or {}
+
+    def run(self, overhead_ns: int) -> dict:
+        _release()
+        rss = _rss_mb()
+        op, args = self.setup()
+        gc.disable()
+        try:
+            start = time.perf_counter_ns()
+            for a in args:
+                op(a)
+            elapsed = time.perf_counter_ns() - start
+            clock = time.perf_counter_ns
+            lat = np.empty(min(len(args), LATENCY_SAMPLES), dtype=np.int64)
+            for i in range(len(lat)):
+                a = args[i]
+                t = clock()
+                op(a)
+                lat[i] = clock() - t
+        finally:
+            gc.enable()
+        lat = np.maximum(lat - overhead_ns, 0)
+        result = {
+            "group": self.group,
+            "name": self.name,
+            "impl": self.impl,
+            **self.params,
+            "ops": len(args),
+            "ops_per_sec": len(args) / (elapsed / 1e9) if elapsed else 0.0,
+            "p50_ns": float(np.percentile(lat, 50)),
+            "p99_ns": float(np.percentile(lat, 99)),
+            "rss_mb": round(_rss_mb() - rss, 2),
+        }
+        return result
+
+
+def _levels(rng: random.Random, side: str, n: int, tick: float = 0.01):
+    lo, hi = (1, 49) if side == "b" else (51, 99)
+    return [(rng.randint(lo, hi) * tick, float(rng.randint(1, 500))) for _ in range(n)]
+
+
+def _core_cases(impl: str, n: int) -> list:
+    if impl == "cpp":
+        import orderbook_ext as ob
+        entry = ob.LOBEntry
+
+        def book(rng):
+            return ob.OrderBookCore(0.01, [entry(p, q) for p, q in _levels(rng, "b", 20)],
+                                    [entry(p, q) for p, q in _levels(rng, "o", 20)])
+
+        def sync(fn):
+            return fn
+    else:
+        import OrderBook as legacy
+
+        def entry(p, q):
+            return legacy.LOB_Entry(price=p, quantity=q)
+
+        def book(rng):
+            key = legacy.OrderBook_Key(exchange_id="bench", market_id="m")
+            return legacy.OrderBook(key, [entry(p, q) for p, q in _levels(rng, "b", 20)],
+                                    [entry(p, q) for p, q in _levels(rng, "o", 20)])
+
+        def sync(fn):
+            return lambda *a: _drive(fn(*a))
+
+    def update_level():
+        rng = random.Random(1)
+        f = sync(book(rng).update_level)
+        return (lambda a: f(a[0], a[1], False),
+                [(entry(p, q), s) for s in ("b", "o") for p, q in _levels(rng, s, n // 2)])
+
+    def update_levels():
+        rng = random.Random(2)
+        f = sync(book(rng).update_levels)
+        return (lambda a: f(a[0], a[1], False),
+                [([entry(p, q) for p, q in _levels(rng, s, 8)], s) for s in ("b", "o") for _ in range(n // 16)])
+
+    def add_limit_order():
+        # small orders around the touch: some fill, the rest rest on the book
+        rng = random.Random(3)
+        f = sync(book(rng).add_limit_order)
+        return (lambda a: f(a[0], a[1]),
+                [(entry(0.5 + (rng.random() - 0.5) * 0.1, float(rng.randint(1, 5))), rng.choice("bo"))
+                 for _ in range(n)])
+
+    def get_col():
+        b = book(random.Random(4))
+        return lambda a: b.get_col(), [None] * max(n // 10, 1000)
+
+    def best():
+        b = book(random.Random(5))
+        if impl == "cpp":
+            return lambda a: (b.best_bid(), b.best_offer()), [None] * n
+        return lambda a: b.get_best(), [None] * n
+
+    def set_tick_size():
+        b = book(random.Random(6))
+        # alternate, ending back on 0.01
+        return b.set_tick_size, [(0.001, 0.01)[i % 2] for i in range(max(n // 100, 200))]
+
+    return [
+        Case("core", "update_level", impl, update_level),
+        Case("core", "update_levels[8]", impl, update_levels),
+        Case("core", "add_limit_order", impl, add_limit_order),
+        Case("core", "get_col", impl, get_col),
+        Case("core", "best_bid+best_offer", impl, best),
+        Case("core", "set_tick_size", impl, set_tick_size),
+    ]
+
+
+def _state_setup(impl: str, books: int, n: int, op_name: str = "get_market"):
+    rng = random.Random(books)
+    keys = [f"m{i}" for i in range(books)]
+    if impl == "cpp":
+        import orderbook_ext as ob
+        state = ob.ServerState()
+        for k in keys:
+            state.init_order_book("bench", k, [ob.LOBEntry(p, q) for p, q in _levels(rng, "b", 20)],
+                                  [ob.LOBEntry(p, q) for p, q in _levels(rng, "o", 20)])
+        op = lambda k: state.get_market("bench", k)  # noqa: E731
+        if op_name != "get_market":
+            handles = [state.find_handle("bench", k) for k in keys]
+            if op_name == "get_depth[10]":
+                out = np.empty((2, 10, 2))
+                return lambda h: state.get_depth(h, 10, out), [rng.choice(handles) for _ in range(n)]
+            if op_name == "get_bbo":
+                return state.get_bbo, [rng.choice(handles) for _ in range(n)]
+            out = np.empty((1000, 4))
+            return (lambda hs: state.get_bbos(hs, out),
+                    [np.array(rng.sample(handles, 1000), dtype=np.int32) for _ in range(max(n // 1000, 100))])
+    else:
+        import server_state as legacy_state
+        from server_state import LOB_Entry, OrderBook_Key  # its own key class, not OrderBook's
+        legacy_state.ServerState._instance = None  # a singleton; start empty
+        state = legacy_state.ServerState()
+        for k in keys:
+            _drive(state.init_order_book(OrderBook_Key(exchange_id="bench", market_id=k),
+                                         [LOB_Entry(price=p, quantity=q) for p, q in _levels(rng, "b", 20)],
+                                         [LOB_Entry(price=p, quantity=q) for p, q in _levels(rng, "o", 20)]))
+        op = lambda k: _drive(state.get_market("bench", k, "y", "b"))  # noqa: E731
+    return op, [rng.choice(keys) for _ in range(n)]
+
+
+def _state_cases(impl: str, n: int, max_books: int) -> list:
+    ops = ["get_market"] + (["get_depth[10]", "get_bbo", "get_bbos[1000]"] if impl == "cpp" else [])
+    return [Case("state", op_name, impl, lambda books=books, op_name=op_name: _state_setup(impl, books, n, op_name),
+                 {"books": books})
+            for books in BOOK_COUNTS if books <= max_books for op_name in ops]
+
+
+def _handler_setup(frames: list, exchange: str, ingest: str):
+    import orderbook_ext as ob
+    import websocket_handlers as wh
+
+    state = ob.ServerState()
+    fast = ingest != "pydantic"
+    if ingest == "native":
+        native = wh._ingest_kalshi_native if exchange == "kalshi" else wh._ingest_polymarket_native
+        op = lambda m: native(state, m, fast)  # noqa: E731
+    else:
+        handler = wh._update_serverstate_from_kalshi if exchange == "kalshi" else wh._update_serverstate_from_polymarket
+        op = lambda m: handler(state, m, None, fast)  # noqa: E731
+    mine = [f for ex, f in frames if ex == exchange]
+    for f in mine[:100]:  # the snapshots, so deltas land on existing books
+        op(f)
+    return op, mine[100:]
+
+
+def _handler_cases(n: int) -> list:
+    frames = list(_synthetic_frames(n, 100))
+    return [Case("handlers", exchange, "cpp", lambda exchange=exchange, ingest=ingest:
+                 _handler_setup(frames, exchange, ingest), {"ingest": ingest})
+            for ingest in ("pydantic", "fast", "native") for exchange in ("kalshi", "polymarket")]
+
+
+def _tick_setup(tick: float, op_name: str, n: int):
+    import orderbook_ext as ob
+    rng = random.Random(round(1 / tick))
+    state = ob.ServerState()
+    mid = round(0.5 / tick)
+
+    def level(side: str) -> int:
+        k = rng.randint(0, 39)
+        return mid - 1 - k if side == "b" else mid + 1 + k
+    handles = []
+    for i in range(TICK_BOOKS):
+        h = state.register_book("bench", f"m{i}")
+        state.init_order_book(h, [], [])
+        state.set_tick_size(h, tick)
+        for side in ("b", "o"):
+            state.update_order_book(h, "y", side, [ob.LOBEntry(level(side) * tick, float(rng.randint(1, 500)))
+                                                   for _ in range(40)], False)
+        handles.append(h)
+    if op_name == "update_order_book":
+        update = state.update_order_book
+        return (lambda a: update(a[0], "y", a[1], a[2], False),
+                [(rng.choice(handles), side, ob.LOBEntry(level(side) * tick, 0.0 if rng.random() < 0.33
+                                                         else float(rng.randint(1, 500))))
+                 for side in ("b", "o") for _ in range(n // 2)])
+    if op_name == "get_book_arrays":
+        return state.get_book_arrays, [rng.choice(handles) for _ in range(n // 10)]
+    return state.get_market, [rng.choice(handles) for _ in range(n // 100)]
+
+
+def _tick_cases(n: int) -> list:
+    return [Case("ticks", op_name, "cpp", lambda tick=tick, op_name=op_name: _tick_setup(tick, op_name, n),
+                 {"tick": tick})
+            for tick in TICK_SIZES for op_name in ("update_order_book", "get_book_arrays", "get_market")]
+
+
+def _kalshi_setup(api: str, op_name: str, n: int):
+    import orderbook_ext as ob
+    rng = random.Random(7)
+    state = ob.ServerState()
+    handles = [state.register_book("kalshi", f"m{i}") for i in range(100)]
+
+    def levels(lo, hi):
+        return [[c, rng.randint(1, 500)] for c in range(lo, hi) if rng.random() < 0.5]
+    snapshots = [(rng.choice(handles), levels(1, 50), levels(1, 50)) for _ in range(max(n // 10, 1000))]
+    if api == "float":
+        lob = ob.LOBEntry
+
+        def init(s):
+            state.init_order_book(s[0], [lob(round(d[0] / 100, 3), d[1]) for d in s[1]],
+                                  [lob(round(1 - (d[0] / 100), 3), d[1]) for d in s[2]])
+
+        def delta(d):
+            state.update_order_book(d[0], d[1], "b", lob(d[2] / 100, d[3]), True)
+    else:
+        def init(s):
+            state.init_order_book_ticks(s[0], s[1], s[2])
+
+        def delta(d):
+            state.update_order_book_ticks(d[0], d[1], "b", d[2], d[3], True)
+    for h in handles:
+        init((h, levels(1, 50), levels(1, 50)))
+    if op_name == "snapshot":
+        return init, snapshots
+    return delta, [(rng.choice(handles), rng.choice("yn"), rng.randint(1, 49), rng.choice((-5, -1, 1, 5)))
+                   for _ in range(n)]
+
+
+def _kalshi_cases(n: int) -> list:
+    return [Case("kalshi", op_name, "cpp", lambda api=api, op_name=op_name: _kalshi_setup(api, op_name, n),
+                 {"api": api})
+            for op_name in ("snapshot", "delta") for api in ("float", "ticks")]
+
+
+def _grouped_state(groups: int, grouped: bool):
+    """ `groups` pairs of a kalshi book and a flipped polymarket book, 20 levels a side """
+    import orderbook_ext as ob
+    rng = random.Random(groups)
+    state = ob.ServerState()
+    members = []
+    for g in range(groups):
+        pair = []
+        for exchange, pred in (("kalshi", "y"), ("polymarket", "n")):
+            h = state.register_book(exchange, f"m{g}")
+            state.init_order_book_ticks(h, [(c, float(rng.randint(1, 500))) for c in rng.sample(range(1, 50), 20)],
+                                        [(c, float(rng.randint(1, 500))) for c in rng.sample(range(1, 50), 20)])
+            if grouped:
+                state.add_to_group(g, h, pred)
+            pair.append((h, pred))
+        members.append(pair)
+    return state, members
+
+
+def _group_setup(op_name: str, grouped: bool, n: int):
+    rng = random.Random(GROUPS)
+    state, members = _grouped_state(GROUPS, grouped)
+    if op_name == "update_order_book_ticks":
+        update = state.update_order_book_ticks
+        return (lambda d: update(d[0], d[1], "b", d[2], d[3], True),
+                [(rng.choice(members)[rng.randint(0, 1)][0], rng.choice("yn"), rng.randint(1, 49),
+                  rng.choice((-5, -1, 1, 5))) for _ in range(n)])
+    if op_name == "get_group_depth[10]":
+        return lambda g: state.get_group_depth(g, 10), [rng.randrange(GROUPS) for _ in range(n // 10)]
+    if op_name == "get_group_bbo":
+        return state.get_group_bbo, [rng.randrange(GROUPS) for _ in range(n // 10)]
+    if op_name == "get_group_bbos[1000]":
+        out = np.empty((1000, 4))
+        return (lambda gs: state.get_group_bbos(gs, out),
+                [np.array(rng.sample(range(GROUPS), 1000), dtype=np.int32)
+                 for _ in range(max(n // 1000, 100))])
+
+    def merge(pair):
+        # what a client does without group books: both members' books, flipped and summed
+        bids, offers = {}, {}
+        for h, pred in pair:
+            b, o = state.get_market(h)
+            for lv, side in ((b, bids), (o, offers)):
+                if pred == "n":
+                    side = offers if side is bids else bids
+                for e in lv:
+                    p = round(1 - e.price if pred == "n" else e.price, 4)
+                    side[p] = side.get(p, 0.0) + e.quantity
+        return sorted(bids.items(), reverse=True)[:10], sorted(offers.items())[:10]
+    return merge, [rng.choice(members) for _ in range(n // 10)]
+
+
+def _spread_setup(op_name: str, groups: int, n: int):
+    import orderbook_ext as ob
+    from spread_scanner import SpreadScanner
+    rng = random.Random(groups)
+    state, members = _grouped_state(groups, True)
+    if op_name == "top_spreads[10]":
+        return lambda _: state.top_spreads(10), range(n // 10)
+    handles = np.array([h for pair in members for h, _ in pair], dtype=np.int32)
+    batches = []
+    for _ in range(max(n // 100, 100)):
+        records = np.zeros(100, dtype=ob.BOOK_UPDATE_DTYPE)
+        records["book"] = rng.choices(handles.tolist(), k=100)
+        records["pred"] = [rng.choice(b"yn") for _ in range(100)]
+        records["side"] = b"b"
+        records["is_delta"] = True
+        records["in_ticks"] = True
+        records["price"] = [rng.randint(1, 49) for _ in range(100)]
+        records["quantity"] = [rng.choice((-5, -1, 1, 5)) for _ in range(100)]
+        batches.append(records)
+    if op_name == "scan":
+        scanner = SpreadScanner(state, k=10)
+        return lambda records: (state.apply_batch(records), scanner.scan()), batches
+    out = np.empty((len(handles), 4))
+
+    def poll(records):
+        # the polling alternative: every member's top of book, then the best cross pair of each group
+        state.apply_batch(records)
+        tops = state.get_bbos(handles, out)
+        kalshi, poly = tops[0::2], tops[1::2]  # poly is flipped: its offers are group bids
+        with np.errstate(invalid="ignore"):
+            edge = np.fmax(kalshi[:, 0] - (1 - poly[:, 0]), (1 - poly[:, 2]) - kalshi[:, 2])
+        edge = np.nan_to_num(edge, nan=-np.inf)
+        best = np.argpartition(-edge, 10)[:10]
+        return best[np.argsort(-edge[best])]
+    return poll, batches
+
+
+def _group_cases(n: int) -> list:
+    cases = [Case("groups", "update_order_book_ticks", "cpp",
+                  lambda grouped=grouped: _group_setup("update_order_book_ticks", grouped, n), {"grouped": grouped})
+             for grouped in (False, True)]
+    return cases + [Case("groups", op_name, "cpp", lambda op_name=op_name: _group_setup(op_name, True, n))
+                    for op_name in ("get_group_depth[10]", "get_group_bbo", "get_group_bbos[1000]", "merge get_market")] + \
+        [Case("groups", op_name, "cpp", lambda op_name=op_name, groups=groups: _spread_setup(op_name, groups, n),
+              {"groups": groups})
+         for groups in SPREAD_GROUPS for op_name in ("top_spreads[10]", "scan", "poll get_bbos")]
+
+
+def _label(r: dict) -> str:
+    extra = "".join(f" {k}={r[k]}" for k in ("books", "ingest", "tick", "api", "grouped", "groups") if k in r)
+    return f"{r['group']}/{r['name']}{extra}"
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--impl", nargs="+", default=["cpp", "legacy"], choices=["cpp", "legacy"])
+    parser.add_argument("--only", nargs="+", default=["core", "state", "handlers", "ticks", "kalshi", "groups"],
+                        choices=["core", "state", "handlers", "ticks", "kalshi", "groups"])
+    parser.add_argument("--ops", type=int, default=200_000, help="ops per case (legacy runs a tenth)")
+    parser.add_argument("--max-books", type=int, default=max(BOOK_COUNTS))
+    parser.add_argument("--quick", action="store_true", help="a tenth of the ops, at most 10k books")
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    args = parser.parse_args()
+    if args.quick:
+        args.ops //= 10
+        args.max_books = min(args.max_books, 10_000)
+    if "legacy" in args.impl:
+        sys.path.insert(0, str(ROOT / "server" / ".old"))
+
+    cases = []
+    for impl in args.impl:
+        n = args.ops if impl == "cpp" else args.ops // 10
+        if "core" in args.only:
+            cases += _core_cases(impl, n)
+        if "state" in args.only:
+            cases += _state_cases(impl, n, args.max_books)
+    if "handlers" in args.only and "cpp" in args.impl:
+        cases += _handler_cases(args.ops)
+    if "ticks" in args.only and "cpp" in args.impl:
+        cases += _tick_cases(args.ops)
+    if "kalshi" in args.only and "cpp" in args.impl:
+        cases += _kalshi_cases(args.ops)
+    if "groups" in args.only and "cpp" in args.impl:
+        cases += _group_cases(args.ops)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {(_label(r), r["impl"]): r for r in json.load(f)["results"]}
+
+    overhead = _timer_overhead_ns()
+    print(f"{'case':<40} {'impl':>6} {'ops/s':>12} {'p50 ns':>9} {'p99 ns':>9} {'rss MB':>7}"
+          + (f" {'vs base':>8}" if baseline else ""))
+    results = []
+    for case in cases:
+        r = case.run(overhead)
+        results.append(r)
+        line = (f"{_label(r):<40} {r['impl']:>6} {r['ops_per_sec']:>12,.0f} {r['p50_ns']:>9,.0f} "
+                f"{r['p99_ns']:>9,.0f} {r['rss_mb']:>7.1f}")
+        base = baseline.get((_label(r), r["impl"]))
+        if base and base["ops_per_sec"]:
+            line += f" {r['ops_per_sec'] / base['ops_per_sec']:>7.2f}x"
+        print(line, flush=True)
+
+    if args.json:
+        meta = {
+            "commit": _commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "ops": args.ops,
+            "timer_overhead_ns": overhead,
+        }
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=1)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
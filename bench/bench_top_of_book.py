@@ -0,0 +1,61 @@
+# bench/bench_top_of_book.py
+"""
+Top-of-book read latency vs tick size.
+
+best_bid/best_offer/get_col used to scan the whole ladder, so their cost grew
+with 1/tick_size. With the cached best indices, best_bid/best_offer should read
+flat across tick sizes (get_col still returns the full ladder, so it scales).
+
+usage:
+    python bench/bench_top_of_book.py [--iters N]
+"""
+import argparse
+import time
+
+from orderbook_ext import OrderBookCore, LOBEntry
+
+TICK_SIZES = [0.01, 0.001, 0.0001]
+
+
+def _book(tick: float) -> OrderBookCore:
+    # A realistic sparse book: a handful of levels near a 0.50 midpoint,
+    # leaving most of the ladder empty on both sides.
+    bids = [LOBEntry(0.45 + i * 0.01, 100.0 + i) for i in range(5)]
+    offers = [LOBEntry(0.51 + i * 0.01, 100.0 + i) for i in range(5)]
+    return OrderBookCore(tick, bids, offers)
+
+
+def _ns_per_call(fn, iters: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter_ns() - start) / iters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iters", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'tick':>8} {'levels':>7} {'best_bid ns':>12} {'best_offer ns':>14} {'update+bbo ns':>14}")
+    for tick in TICK_SIZES:
+        ob = _book(tick)
+        entry = LOBEntry(0.49, 5.0)
+        clear = LOBEntry(0.49, 0.0)
+
+        def churn():
+            # Insert a new best bid then remove it, forcing the cache to move
+            # both ways, and read top of book after each write.
+            ob.update_level(entry, 'b', False)
+            ob.best_bid()
+            ob.update_level(clear, 'b', False)
+            ob.best_bid()
+
+        bb = _ns_per_call(ob.best_bid, args.iters)
+        bo = _ns_per_call(ob.best_offer, args.iters)
+        ch = _ns_per_call(churn, args.iters // 4) / 2
+        print(f"{tick:>8} {int(1 / tick) + 1:>7} {bb:>12.1f} {bo:>14.1f} {ch:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# bench/stress_threads.py
+"""
+Concurrency stress test for ServerState: W writer threads each feed their own
+slice of books (init + single-level deltas + apply_batch + tick size changes)
+while R reader threads hammer get_market / get_book_arrays across all books.
+
+Checks, per read, that a book snapshot is internally consistent (both sides
+sorted by price, every quantity positive) and, once writers are joined, that
+every book matches a single-threaded replay of the same updates.
+
+Reports update and read throughput. On a free-threaded (3.13t) build the
+threads run in parallel; on a regular build they interleave on the GIL, but
+the extension still drops it around every C++ call.
+
+usage:
+    python bench/stress_threads.py [--writers W] [--readers R] [--books N] [--updates U]
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+import orderbook_ext as ob
+
+
+def _ops(seed: int, handles, n: int):
+    """ a deterministic update stream over `handles` """
+    rng = random.Random(seed)
+    ops = []
+    for h in handles:
+        ops.append(("init", h, [ob.LOBEntry(p / 100, 10.0) for p in range(20, 45)],
+                    [ob.LOBEntry(p / 100, 10.0) for p in range(55, 80)]))
+    for _ in range(n):
+        h = rng.choice(handles)
+        r = rng.random()
+        if r < 0.7:
+            side = rng.choice("bo")
+            price = rng.randint(1, 49) / 100 if side == "b" else rng.randint(51, 99) / 100
+            ops.append(("level", h, side, price, float(rng.randint(0, 50))))
+        elif r < 0.98:
+            recs = np.zeros(8, dtype=ob.BOOK_UPDATE_DTYPE)
+            recs["book"] = h
+            recs["pred"] = b"y"
+            recs["side"] = b"b"
+            recs["price"] = [rng.randint(1, 49) / 100 for _ in range(8)]
+            recs["quantity"] = [float(rng.randint(0, 50)) for _ in range(8)]
+            ops.append(("batch", h, recs))
+        else:
+            ops.append(("tick", h, rng.choice((0.01, 0.001))))
+    return ops
+
+
+def _apply(state, ops):
+    for op in ops:
+        kind, h = op[0], op[1]
+        if kind == "init":
+            state.init_order_book(h, op[2], op[3])
+        elif kind == "level":
+            state.update_order_book(h, "y", op[2], ob.LOBEntry(op[3], op[4]), False)
+        elif kind == "batch":
+            state.apply_batch(op[2])
+        else:
+            state.set_tick_size(h, op[2])
+
+
+def _consistent(bids, offers) -> bool:
+    bp = [e.price for e in bids]
+    op = [e.price for e in offers]
+    return (bp == sorted(bp) and op == sorted(op)
+            and all(e.quantity > 0 for e in bids) and all(e.quantity > 0 for e in offers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--books", type=int, default=64)
+    parser.add_argument("--updates", type=int, default=20000, help="updates per writer")
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+
+    state = ob.ServerState()
+    handles = [state.register_book("stress", f"m{i}") for i in range(args.books)]
+    slices = [handles[w::args.writers] for w in range(args.writers)]
+    streams = [_ops(w, slices[w], args.updates) for w in range(args.writers)]
+    for h in handles:  # every book exists before readers start
+        state.init_order_book(h, [], [])
+
+    done = threading.Event()
+    reads = [0] * args.readers
+    errors = []
+
+    def reader(i):
+        rng = random.Random(1000 + i)
+        n = 0
+        while not done.is_set():
+            h = rng.choice(handles)
+            bids, offers = state.get_market(h)
+            if not _consistent(bids, offers):
+                errors.append(f"inconsistent snapshot of book {h}")
+                return
+            arrays = state.get_book_arrays(h)
+            if arrays is not None and (arrays[0] < 0).any():
+                errors.append(f"negative quantity in book {h}")
+                return
+            n += 1
+        reads[i] = n
+
+    readers = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    writers = [threading.Thread(target=_apply, args=(state, streams[w])) for w in range(args.writers)]
+    for t in readers:
+        t.start()
+    start = time.perf_counter()
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in readers:
+        t.join()
+
+    # each writer owns its books, so a sequential replay must agree exactly
+    expected = ob.ServerState()
+    for h in handles:
+        expected.register_book("stress", f"m{h}")
+        expected.init_order_book(h, [], [])
+    for ops in streams:
+        _apply(expected, ops)
+    for h in handles:
+        got, want = state.get_market(h), expected.get_market(h)
+        if [(e.price, e.quantity) for side in got for e in side] != [(e.price, e.quantity) for side in want for e in side]:
+            errors.append(f"book {h} diverged from sequential replay")
+
+    updates = sum(len(s) for s in streams)
+    print(f"{args.writers} writers: {updates / elapsed:,.0f} ops/s over {elapsed:.2f}s")
+    print(f"{args.readers} readers: {sum(reads) / elapsed:,.0f} reads/s")
+    if errors:
+        print("FAILED:", *errors[:10], sep="\n  ")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
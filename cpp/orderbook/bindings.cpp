@@ -1,13 +1,36 @@
 #include "server_state_cpp.hpp"
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <pybind11/numpy.h>
+#include <stdexcept>
+#include <algorithm>
 #include "orderbook_core.hpp"
+#include "shm_books.hpp"
 
 namespace py = pybind11;
 
-PYBIND11_MODULE(orderbook_ext, m) {
+// Read-only 1-D float64 array over a ladder, without copying it again. The
+// array's base capsule holds a reference to the storage, so it stays valid
+// after the book is rebuilt by a tick size change or a layout switch (it just
+// stops receiving updates). Over a dense side's live storage it updates in
+// place; a sparse side's ladder is already a copy (see bid_ladder), so its
+// array is a snapshot.
+static py::array ladder_view(std::shared_ptr<const OrderBookCore::Ladder> ladder) {
+    typedef std::shared_ptr<const OrderBookCore::Ladder> Ref;
+    py::capsule base(new Ref(ladder), [](void* p) { delete static_cast<Ref*>(p); });
+    py::array_t<double> arr(static_cast<py::ssize_t>(ladder->size()), ladder->data(), base);
+    arr.attr("setflags")(py::arg("write") = false);
+    return arr;
+}
+
+PYBIND11_MODULE(orderbook_ext, m, py::mod_gil_not_used()) {
     m.doc() = "OrderBook C++ core (pybind11, C++11)";
 
+    PYBIND11_NUMPY_DTYPE(BookUpdate, book, pred, side, is_delta, in_ticks, price, quantity);
+    m.attr("BOOK_UPDATE_DTYPE") = py::dtype::of<BookUpdate>();
+    PYBIND11_NUMPY_DTYPE(GroupSpread, group, bid_handle, offer_handle, edge, bid_price, bid_qty, offer_price, offer_qty);
+    m.attr("SPREAD_DTYPE") = py::dtype::of<GroupSpread>();
+
     py::class_<LOBEntry>(m, "LOBEntry")
         .def(py::init<double,double>())
         .def_readwrite("price", &LOBEntry::price)
@@ -18,6 +41,8 @@ PYBIND11_MODULE(orderbook_ext, m) {
         .def_readwrite("price", &Trade::price)
         .def_readwrite("quantity", &Trade::quantity);
 
+    // A bare OrderBookCore is not synchronized; share books between threads
+    // through ServerState.
     py::class_<OrderBookCore>(m, "OrderBookCore")
         .def(py::init<double,const std::vector<LOBEntry>&,const std::vector<LOBEntry>&>(),
              py::arg("tick_size"),
@@ -37,19 +62,366 @@ PYBIND11_MODULE(orderbook_ext, m) {
         .def("update_level", &OrderBookCore::update_level, py::arg("entry"), py::arg("side"), py::arg("is_delta")=false)
         .def("update_levels", &OrderBookCore::update_levels, py::arg("entries"), py::arg("side"), py::arg("is_delta")=false)
         .def("add_limit_order", &OrderBookCore::add_limit_order)
-        .def("get_col", &OrderBookCore::get_col);
+        .def("get_col", &OrderBookCore::get_col)
+        .def("tick_size", &OrderBookCore::tick_size)
+        .def("memory_bytes", &OrderBookCore::memory_bytes)
+        .def("is_sparse", [](const OrderBookCore& ob) {
+            return py::make_tuple(ob.bid_levels().sparse(), ob.offer_levels().sparse());
+        })
+        .def("bids_view", [](const OrderBookCore& ob) { return ladder_view(ob.bid_ladder()); })
+        .def("offers_view", [](const OrderBookCore& ob) { return ladder_view(ob.offer_ladder()); });
+
+    typedef std::pair<std::vector<LOBEntry>, std::vector<LOBEntry>> Market;
+    auto raw_list = [](const std::vector<RawMessage>& rest) {
+        py::list out;
+        for (std::size_t i = 0; i < rest.size(); ++i)
+            out.append(py::make_tuple(rest[i].kind, py::bytes(rest[i].raw)));
+        return out;
+    };
+    auto book_arrays = [](const ServerStateCPP& s, int handle) -> py::object {
+        // (bids, offers, tick_size): read-only quantity-per-index arrays, price =
+        // index * tick_size. A dense side's array is a view of its live ladder; a
+        // sparse side's is a copy made now. Re-fetch for current data, and after
+        // a tick_size_change.
+        std::shared_ptr<const OrderBookCore::Ladder> bids, offers;
+        double tick = 0.0;
+        if (!s.book_ladders(handle, bids, offers, tick)) return py::none();
+        return py::make_tuple(ladder_view(bids), ladder_view(offers), tick);
+    };
+    typedef py::call_guard<py::gil_scoped_release> nogil;
 
+    auto group_levels = [](const std::vector<GroupBook::DepthLevel>& levels) {
+        py::list out;
+        for (std::size_t i = 0; i < levels.size(); ++i) {
+            const std::vector<GroupBook::Contribution>& venues = levels[i].venues;
+            py::list v;
+            for (std::size_t k = 0; k < venues.size(); ++k) v.append(py::make_tuple(venues[k].handle, venues[k].quantity));
+            out.append(py::make_tuple(levels[i].price, levels[i].quantity, v));
+        }
+        return out;
+    };
+
+    // Handle-keyed overloads are registered first: they are the hot path, and
+    // pybind11 tries overloads in order. Methods that only touch C++ state drop
+    // the GIL, so threads feeding or reading different books run in parallel.
     py::class_<ServerStateCPP>(m, "ServerState")
         .def(py::init<>())
-        .def("init_order_book", &ServerStateCPP::init_order_book,
+        .def("register_book", &ServerStateCPP::register_book,
+             py::arg("exchange_id"), py::arg("market_id"), nogil())
+        .def("find_handle", &ServerStateCPP::find_handle,
+             py::arg("exchange_id"), py::arg("market_id"), nogil())
+        .def("book_key", &ServerStateCPP::book_key, py::arg("handle"))
+        .def("num_books", &ServerStateCPP::num_books)
+        .def("init_order_book", (void (ServerStateCPP::*)(int, const std::vector<LOBEntry>&, const std::vector<LOBEntry>&)) &ServerStateCPP::init_order_book,
+             py::arg("handle"), py::arg("bids"), py::arg("offers"), nogil())
+        .def("init_order_book", (void (ServerStateCPP::*)(const std::string&, const std::string&, const std::vector<LOBEntry>&, const std::vector<LOBEntry>&)) &ServerStateCPP::init_order_book,
              py::arg("exchange_id"), py::arg("market_id"),
-             py::arg("bids"), py::arg("offers"))
+             py::arg("bids"), py::arg("offers"), nogil())
+        .def("remove_order_book", (void (ServerStateCPP::*)(int)) &ServerStateCPP::remove_order_book,
+             py::arg("handle"), nogil())
+        .def("remove_order_book", (void (ServerStateCPP::*)(const std::string&, const std::string&)) &ServerStateCPP::remove_order_book,
+             py::arg("exchange_id"), py::arg("market_id"), nogil())
+        .def("update_order_book", (void (ServerStateCPP::*)(int, char, char, const LOBEntry&, bool)) &ServerStateCPP::update_order_book,
+             py::arg("handle"), py::arg("pred"), py::arg("side"), py::arg("data"), py::arg("is_delta") = false, nogil())
+        .def("update_order_book", (void (ServerStateCPP::*)(int, char, char, const std::vector<LOBEntry>&, bool)) &ServerStateCPP::update_order_book,
+             py::arg("handle"), py::arg("pred"), py::arg("side"), py::arg("data"), py::arg("is_delta") = false, nogil())
         .def("update_order_book", (void (ServerStateCPP::*)(const std::string&, const std::string&, char, char, const LOBEntry&, bool)) &ServerStateCPP::update_order_book,
-             py::arg("exchange_id"), py::arg("market_id"), py::arg("pred"), py::arg("side"), py::arg("data"), py::arg("is_delta") = false)
+             py::arg("exchange_id"), py::arg("market_id"), py::arg("pred"), py::arg("side"), py::arg("data"), py::arg("is_delta") = false, nogil())
         .def("update_order_book", (void (ServerStateCPP::*)(const std::string&, const std::string&, char, char, const std::vector<LOBEntry>&, bool)) &ServerStateCPP::update_order_book,
-             py::arg("exchange_id"), py::arg("market_id"), py::arg("pred"), py::arg("side"), py::arg("data"), py::arg("is_delta") = false)
-        .def("get_market", &ServerStateCPP::get_market,
-             py::arg("exchange_id"), py::arg("market_id"))
-        .def("set_tick_size", &ServerStateCPP::set_tick_size,
-             py::arg("exchange_id"), py::arg("market_id"), py::arg("new_tick_size"));
+             py::arg("exchange_id"), py::arg("market_id"), py::arg("pred"), py::arg("side"), py::arg("data"), py::arg("is_delta") = false, nogil())
+        .def("init_order_book_ticks", &ServerStateCPP::init_order_book_ticks,
+             py::arg("handle"), py::arg("yes"), py::arg("no"), nogil())
+        .def("update_order_book_ticks", (void (ServerStateCPP::*)(int, char, char, int, double, bool)) &ServerStateCPP::update_order_book_ticks,
+             py::arg("handle"), py::arg("pred"), py::arg("side"), py::arg("tick"), py::arg("quantity"), py::arg("is_delta") = false, nogil())
+        .def("update_order_book_ticks", (void (ServerStateCPP::*)(int, char, char, const std::vector<TickLevel>&, bool)) &ServerStateCPP::update_order_book_ticks,
+             py::arg("handle"), py::arg("pred"), py::arg("side"), py::arg("levels"), py::arg("is_delta") = false, nogil())
+        .def("apply_batch", [](ServerStateCPP& s, py::array_t<BookUpdate, py::array::c_style> records) {
+            if (records.ndim() != 1) throw std::invalid_argument("records must be 1-D");
+            const BookUpdate* data = records.data();
+            const std::size_t n = static_cast<std::size_t>(records.shape(0));
+            py::gil_scoped_release release; // `records` keeps the buffer alive
+            s.apply_batch(data, n);
+        }, py::arg("records"))
+        // Parse and apply without the GIL; ServerState locks per book.
+        .def("ingest_kalshi", [raw_list](ServerStateCPP& s, const std::string& frame, int stream) {
+            std::vector<RawMessage> rest;
+            {
+                py::gil_scoped_release release;
+                rest = s.ingest_kalshi(frame.data(), frame.size(), stream);
+            }
+            return raw_list(rest);
+        }, py::arg("frame"), py::arg("stream") = 0,
+           "Apply a raw kalshi frame; returns [(type, raw_json_bytes)] for messages left to Python.")
+        .def("ingest_polymarket", [raw_list](ServerStateCPP& s, const std::string& frame) {
+            std::vector<RawMessage> rest;
+            {
+                py::gil_scoped_release release;
+                rest = s.ingest_polymarket(frame.data(), frame.size());
+            }
+            return raw_list(rest);
+        }, py::arg("frame"),
+           "Apply a raw polymarket frame; returns [(event_type, raw_json_bytes)] for events left to Python.")
+        .def("get_market", (Market (ServerStateCPP::*)(int) const) &ServerStateCPP::get_market,
+             py::arg("handle"), nogil())
+        .def("get_market", (Market (ServerStateCPP::*)(const std::string&, const std::string&) const) &ServerStateCPP::get_market,
+             py::arg("exchange_id"), py::arg("market_id"), nogil())
+        .def("get_depth", [](const ServerStateCPP& s, int handle, int levels, py::object out) -> py::object {
+            if (levels < 0) throw std::invalid_argument("levels must be >= 0");
+            py::array_t<double, py::array::c_style> buf;
+            if (out.is_none()) {
+                buf = py::array_t<double, py::array::c_style>({static_cast<py::ssize_t>(2), static_cast<py::ssize_t>(levels), static_cast<py::ssize_t>(2)});
+            } else {
+                buf = py::array_t<double, py::array::c_style>::ensure(out);
+                if (!buf || buf.ndim() != 3 || buf.shape(0) != 2 || buf.shape(1) < levels || buf.shape(2) != 2
+                    || !buf.writeable() || buf.ptr() != out.ptr())
+                    throw std::invalid_argument("out must be a writeable C-contiguous float64 array of shape (2, >= levels, 2)");
+            }
+            double* d = buf.mutable_data();
+            const py::ssize_t stride = buf.shape(1) * 2;
+            int n_bids = 0, n_offers = 0;
+            bool found;
+            {
+                py::gil_scoped_release release;
+                found = s.get_depth(handle, levels, d, n_bids, d + stride, n_offers);
+            }
+            if (!found) return py::none();
+            py::slice bids(0, n_bids, 1), offers(0, n_offers, 1);
+            return py::make_tuple(buf[py::make_tuple(0, bids)], buf[py::make_tuple(1, offers)]);
+        }, py::arg("handle"), py::arg("levels") = 10, py::arg("out") = py::none(),
+           "(bids, offers) as (n, 2) [price, qty] arrays, best level first, or None if the book is absent. "
+           "With out (float64, shape (2, >= levels, 2)) they are views of out[0] and out[1].")
+        .def("get_bbo", [](const ServerStateCPP& s, int handle) -> py::object {
+            double top[4];
+            bool found;
+            {
+                py::gil_scoped_release release;
+                found = s.get_bbo(handle, top);
+            }
+            if (!found) return py::none();
+            auto level = [](double p, double q) { return p == p ? py::object(py::make_tuple(p, q)) : py::object(py::none()); };
+            return py::make_tuple(level(top[0], top[1]), level(top[2], top[3]));
+        }, py::arg("handle"),
+           "((bid_price, bid_qty) | None, (offer_price, offer_qty) | None), or None if the book is absent.")
+        .def("get_bbos", [](const ServerStateCPP& s, py::array_t<int32_t, py::array::c_style | py::array::forcecast> handles,
+                            py::object out) {
+            if (handles.ndim() != 1) throw std::invalid_argument("handles must be 1-D");
+            const py::ssize_t n = handles.shape(0);
+            py::array_t<double, py::array::c_style> buf;
+            if (out.is_none()) {
+                buf = py::array_t<double, py::array::c_style>({n, static_cast<py::ssize_t>(4)});
+            } else {
+                buf = py::array_t<double, py::array::c_style>::ensure(out);
+                if (!buf || buf.ndim() != 2 || buf.shape(0) != n || buf.shape(1) != 4 || !buf.writeable() || buf.ptr() != out.ptr())
+                    throw std::invalid_argument("out must be a writeable C-contiguous float64 array of shape (len(handles), 4)");
+            }
+            static_assert(sizeof(int) == sizeof(int32_t), "handles are passed as int");
+            const int32_t* h = handles.data();
+            double* d = buf.mutable_data();
+            {
+                py::gil_scoped_release release;
+                s.get_bbo(reinterpret_cast<const int*>(h), static_cast<std::size_t>(n), d);
+            }
+            return buf;
+        }, py::arg("handles"), py::arg("out") = py::none(),
+           "Top of book of many books in one call: a (len(handles), 4) float64 array of "
+           "[bid_price, bid_qty, offer_price, offer_qty], NaN where a side is empty or a book is absent.")
+        .def("get_book_arrays", [book_arrays](const ServerStateCPP& s, int handle) {
+            return book_arrays(s, handle);
+        }, py::arg("handle"))
+        .def("get_book_arrays", [book_arrays](const ServerStateCPP& s, const std::string& ex, const std::string& mar) {
+            return book_arrays(s, s.find_handle(ex, mar));
+        }, py::arg("exchange_id"), py::arg("market_id"))
+        .def("set_tick_size", (void (ServerStateCPP::*)(int, double)) &ServerStateCPP::set_tick_size,
+             py::arg("handle"), py::arg("new_tick_size"), nogil())
+        .def("set_tick_size", (void (ServerStateCPP::*)(const std::string&, const std::string&, double)) &ServerStateCPP::set_tick_size,
+             py::arg("exchange_id"), py::arg("market_id"), py::arg("new_tick_size"), nogil())
+        .def("drain_dirty", [](ServerStateCPP& s) {
+            std::vector<int> handles;
+            {
+                py::gil_scoped_release release;
+                handles = s.drain_dirty();
+            }
+            py::array_t<int32_t> out(static_cast<py::ssize_t>(handles.size()));
+            std::copy(handles.begin(), handles.end(), out.mutable_data());
+            return out;
+        }, "Handles (int32 array) of books changed since the last call.")
+        .def("kalshi_sequence", [](ServerStateCPP& s, int sid, long long seq, int handle, bool snapshot, int stream) {
+            std::vector<int> gapped;
+            bool apply;
+            {
+                py::gil_scoped_release release;
+                apply = s.kalshi_sequence(stream, sid, seq, handle, snapshot, gapped);
+            }
+            return py::make_tuple(apply, gapped);
+        }, py::arg("sid"), py::arg("seq"), py::arg("handle"), py::arg("snapshot"), py::arg("stream") = 0,
+           "Track a kalshi orderbook message; returns (apply, handles newly marked stale by a gap).")
+        .def("reset_kalshi_sequence", &ServerStateCPP::reset_kalshi_sequence, py::arg("stream"), nogil(),
+             "Forget the sids seen on `stream` (a replaced connection).")
+        .def("kalshi_sequence_stats", [](const ServerStateCPP& s) {
+            uint64_t gaps = 0, stale = 0, dup = 0;
+            {
+                py::gil_scoped_release release;
+                s.kalshi_sequence_stats(gaps, stale, dup);
+            }
+            py::dict out;
+            out["seq_gaps"] = gaps;
+            out["stale_marks"] = stale;
+            out["duplicates"] = dup;
+            return out;
+        })
+        .def("mark_stale", &ServerStateCPP::mark_stale, py::arg("handle"), nogil())
+        .def("is_stale", &ServerStateCPP::is_stale, py::arg("handle"), nogil())
+        .def("enable_shm", &ServerStateCPP::enable_shm,
+             py::arg("name"), py::arg("max_books") = 1024, py::arg("ladder_capacity") = 10001,
+             "Mirror all books into POSIX shared memory `name` for ShmReader / server/shm_reader.py.")
+        .def("shm_name", &ServerStateCPP::shm_name)
+        .def("add_to_group", &ServerStateCPP::add_to_group,
+             py::arg("group_id"), py::arg("handle"), py::arg("pred") = 'y', nogil(),
+             "Merge a book into the consolidated book of group_id; pred 'n' if its yes is the group's no.")
+        .def("remove_from_group", &ServerStateCPP::remove_from_group, py::arg("handle"), nogil())
+        .def("book_group", [](const ServerStateCPP& s, int handle) -> py::object {
+            char pred = 'y';
+            const int group = s.book_group(handle, pred);
+            if (group < 0) return py::none();
+            return py::make_tuple(group, std::string(1, pred));
+        }, py::arg("handle"), "(group_id, pred) of a book, or None if it is in no group.")
+        .def("group_members", &ServerStateCPP::group_members, py::arg("group_id"),
+             "Members of a group as [(handle, pred)].")
+        .def("get_group_depth", [group_levels](const ServerStateCPP& s, int group_id, int levels) -> py::object {
+            if (levels < 0) throw std::invalid_argument("levels must be >= 0");
+            std::vector<GroupBook::DepthLevel> bids, offers;
+            bool found;
+            {
+                py::gil_scoped_release release;
+                found = s.get_group_depth(group_id, levels, bids, offers);
+            }
+            if (!found) return py::none();
+            return py::make_tuple(group_levels(bids), group_levels(offers));
+        }, py::arg("group_id"), py::arg("levels") = 10,
+           "(bids, offers) of a group's consolidated book, best first, as [(price, qty, [(handle, qty), ...])], "
+           "or None if the group is unknown.")
+        .def("get_group_bbo", [group_levels](const ServerStateCPP& s, int group_id) -> py::object {
+            std::vector<GroupBook::DepthLevel> bids, offers;
+            bool found;
+            {
+                py::gil_scoped_release release;
+                found = s.get_group_depth(group_id, 1, bids, offers);
+            }
+            if (!found) return py::none();
+            py::list b = group_levels(bids), o = group_levels(offers);
+            return py::make_tuple(b.size() ? py::object(b[0]) : py::object(py::none()),
+                                  o.size() ? py::object(o[0]) : py::object(py::none()));
+        }, py::arg("group_id"),
+           "((price, qty, [(handle, qty), ...]) | None for the best bid, the same for the best offer), "
+           "or None if the group is unknown.")
+        .def("get_group_bbos", [](const ServerStateCPP& s, py::array_t<int32_t, py::array::c_style | py::array::forcecast> group_ids,
+                                  py::object out) {
+            if (group_ids.ndim() != 1) throw std::invalid_argument("group_ids must be 1-D");
+            const py::ssize_t n = group_ids.shape(0);
+            py::array_t<double, py::array::c_style> buf;
+            if (out.is_none()) {
+                buf = py::array_t<double, py::array::c_style>({n, static_cast<py::ssize_t>(4)});
+            } else {
+                buf = py::array_t<double, py::array::c_style>::ensure(out);
+                if (!buf || buf.ndim() != 2 || buf.shape(0) != n || buf.shape(1) != 4 || !buf.writeable() || buf.ptr() != out.ptr())
+                    throw std::invalid_argument("out must be a writeable C-contiguous float64 array of shape (len(group_ids), 4)");
+            }
+            const int32_t* g = group_ids.data();
+            double* d = buf.mutable_data();
+            {
+                py::gil_scoped_release release;
+                s.get_group_bbo(reinterpret_cast<const int*>(g), static_cast<std::size_t>(n), d);
+            }
+            return buf;
+        }, py::arg("group_ids"), py::arg("out") = py::none(),
+           "Consolidated top of book of many groups, as get_bbos: a (len(group_ids), 4) float64 array.")
+        .def("top_spreads", [](const ServerStateCPP& s, int k) {
+            if (k < 0) throw std::invalid_argument("k must be >= 0");
+            std::vector<GroupSpread> top;
+            {
+                py::gil_scoped_release release;
+                top = s.top_spreads(k);
+            }
+            py::array_t<GroupSpread> out(static_cast<py::ssize_t>(top.size()));
+            std::copy(top.begin(), top.end(), out.mutable_data());
+            return out;
+        }, py::arg("k") = 10,
+           "The k groups with the largest cross-venue edge (best bid on one book minus best offer on another), "
+           "as a SPREAD_DTYPE array, largest first.")
+        .def("get_spread", [](const ServerStateCPP& s, int group_id) -> py::object {
+            GroupSpread spread;
+            if (!s.get_spread(group_id, spread)) return py::none();
+            py::array_t<GroupSpread> out(1);
+            out.mutable_data()[0] = spread;
+            return out[py::int_(0)];
+        }, py::arg("group_id"), "A group's SPREAD_DTYPE record, or None if two of its books don't quote opposite sides.")
+        .def("num_spreads", &ServerStateCPP::num_spreads)
+        .def("drain_spread_changes", [](ServerStateCPP& s) {
+            std::vector<int> groups;
+            {
+                py::gil_scoped_release release;
+                groups = s.drain_spread_changes();
+            }
+            py::array_t<int32_t> out(static_cast<py::ssize_t>(groups.size()));
+            std::copy(groups.begin(), groups.end(), out.mutable_data());
+            return out;
+        }, "Group ids (int32 array) whose spread changed or went away since the last call.");
+
+    auto levels_array = [](const std::vector<LOBEntry>& levels) {
+        py::array_t<double> out({static_cast<py::ssize_t>(levels.size()), static_cast<py::ssize_t>(2)});
+        double* d = out.mutable_data();
+        for (std::size_t i = 0; i < levels.size(); ++i) {
+            d[2 * i] = levels[i].price;
+            d[2 * i + 1] = levels[i].quantity;
+        }
+        return out;
+    };
+
+    // Same-host reader of ServerState.enable_shm; every read is a consistent
+    // copy taken without locks or syscalls.
+    py::register_exception<ShmReadTimeout>(m, "ShmReadTimeout", PyExc_TimeoutError);
+    py::class_<ShmBookReader>(m, "ShmReader")
+        .def(py::init<const std::string&, double>(), py::arg("name"), py::arg("timeout") = 1.0,
+             "Reads raise ShmReadTimeout (a TimeoutError) if a book stays mid-write for `timeout` seconds.")
+        .def("num_books", &ShmBookReader::num_books, nogil())
+        .def("find", &ShmBookReader::find, py::arg("exchange_id"), py::arg("market_id"), nogil(),
+             "Handle for (exchange, market), or -1 if not (yet) mirrored.")
+        .def("key", &ShmBookReader::key, py::arg("handle"), nogil())
+        .def("version", &ShmBookReader::version, py::arg("handle"), nogil())
+        // Reads can wait out a slot that is mid-write (up to the timeout), so
+        // they run without the GIL and build the Python results afterwards.
+        .def("top_of_book", [](const ShmBookReader& r, int handle) -> py::object {
+            bool has_bid = false, has_offer = false, ok;
+            double bp = 0.0, bq = 0.0, op = 0.0, oq = 0.0;
+            {
+                py::gil_scoped_release release;
+                ok = r.top_of_book(handle, has_bid, bp, bq, has_offer, op, oq);
+            }
+            if (!ok) return py::none();
+            return py::make_tuple(has_bid ? py::object(py::make_tuple(bp, bq)) : py::object(py::none()),
+                                  has_offer ? py::object(py::make_tuple(op, oq)) : py::object(py::none()));
+        }, py::arg("handle"), "((bid_price, bid_qty) | None, (offer_price, offer_qty) | None), or None if the book is absent.")
+        .def("depth", [levels_array](const ShmBookReader& r, int handle, int levels) -> py::object {
+            std::vector<LOBEntry> bids, offers;
+            bool ok;
+            {
+                py::gil_scoped_release release;
+                ok = r.depth(handle, levels, bids, offers);
+            }
+            if (!ok) return py::none();
+            return py::make_tuple(levels_array(bids), levels_array(offers));
+        }, py::arg("handle"), py::arg("levels") = 10,
+           "(bids, offers) as (n, 2) [price, qty] arrays, best level first, or None.")
+        .def("ladders", [](const ShmBookReader& r, int handle) -> py::object {
+            std::vector<double> bids, offers;
+            double tick = 0.0;
+            bool ok;
+            {
+                py::gil_scoped_release release;
+                ok = r.ladders(handle, bids, offers, tick);
+            }
+            if (!ok) return py::none();
+            return py::make_tuple(py::array_t<double>(bids.size(), bids.data()),
+                                  py::array_t<double>(offers.size(), offers.data()), tick);
+        }, py::arg("handle"), "(bids, offers, tick_size) copies of the ladders, or None.");
 }
\ No newline at end of file
@@ -0,0 +1,227 @@
+// Native decoding of raw exchange frames straight into the books. Mirrors
+// _update_serverstate_from_kalshi / _update_serverstate_from_polymarket in
+// server/websocket_handlers.py; anything those apply is applied here, the
+// rest is handed back to Python untouched.
+#include "server_state_cpp.hpp"
+#include "json_cursor.hpp"
+#include <cmath>
+#include <stdexcept>
+#include <string>
+
+namespace {
+
+// [[price_cents, qty], ...] as sent in kalshi snapshots
+bool read_cent_pairs(JsonCursor& c, std::vector<TickLevel>& out) {
+    out.clear();
+    if (c.peek('n')) return c.skip_value(); // null
+    if (!c.consume('[')) return false;
+    bool first = true;
+    while (c.next_element(first)) {
+        double p = 0.0, q = 0.0;
+        bool inner = true;
+        if (!c.consume('[')) return false;
+        if (!c.next_element(inner) || !c.read_number(p)) return false;
+        if (!c.next_element(inner) || !c.read_number(q)) return false;
+        while (c.next_element(inner)) {
+            if (!c.skip_value()) return false;
+        }
+        if (!c.ok()) return false;
+        out.push_back(TickLevel(static_cast<int>(std::llround(p)), q));
+    }
+    return c.ok();
+}
+
+// [{"price": "0.48", "size": "12"}, ...] as sent in polymarket books
+bool read_summaries(JsonCursor& c, std::vector<LOBEntry>& out, std::string& key) {
+    out.clear();
+    if (!c.consume('[')) return false;
+    bool first = true;
+    while (c.next_element(first)) {
+        LOBEntry e;
+        bool member = true;
+        if (!c.consume('{')) return false;
+        while (c.next_member(member, key)) {
+            bool ok;
+            if (key == "price") ok = c.read_number(e.price);
+            else if (key == "size") ok = c.read_number(e.quantity);
+            else ok = c.skip_value();
+            if (!ok) return false;
+        }
+        if (!c.ok()) return false;
+        out.push_back(e);
+    }
+    return c.ok();
+}
+
+struct PriceChange {
+    char side; // 'b' for BUY, 'o' for SELL
+    LOBEntry entry;
+};
+
+// [{"price": "0.48", "side": "BUY", "size": "10"}, ...]
+bool read_changes(JsonCursor& c, std::vector<PriceChange>& out, std::string& key, std::string& scratch) {
+    out.clear();
+    if (!c.consume('[')) return false;
+    bool first = true;
+    while (c.next_element(first)) {
+        PriceChange ch;
+        ch.side = 'o';
+        bool member = true;
+        if (!c.consume('{')) return false;
+        while (c.next_member(member, key)) {
+            bool ok;
+            if (key == "price") ok = c.read_number(ch.entry.price);
+            else if (key == "size") ok = c.read_number(ch.entry.quantity);
+            else if (key == "side") {
+                ok = c.read_string(scratch);
+                ch.side = (scratch == "BUY") ? 'b' : 'o';
+            }
+            else ok = c.skip_value();
+            if (!ok) return false;
+        }
+        if (!c.ok()) return false;
+        out.push_back(ch);
+    }
+    return c.ok();
+}
+
+} // namespace
+
+std::vector<RawMessage> ServerStateCPP::ingest_kalshi(const char* data, std::size_t n, int stream) {
+    std::vector<RawMessage> rest;
+    JsonCursor c(data, data + n);
+    std::string key, type;
+    const char* msg_begin = nullptr;
+    const char* msg_end = nullptr;
+    double sid = 0.0, seq = 0.0;
+    bool has_seq = false;
+
+    // Keys can come in any order, so remember where "msg" is and come back to
+    // it once "type" is known.
+    bool first = true;
+    if (!c.consume('{')) throw std::invalid_argument("malformed kalshi frame");
+    while (c.next_member(first, key)) {
+        bool ok;
+        if (key == "type") ok = c.read_string(type);
+        else if (key == "sid") ok = c.read_number(sid);
+        else if (key == "seq") ok = has_seq = c.read_number(seq);
+        else if (key == "msg") {
+            msg_begin = c.value_start();
+            ok = c.skip_value();
+            msg_end = c.pos();
+        }
+        else ok = c.skip_value();
+        if (!ok) break;
+    }
+    if (!c.ok()) throw std::invalid_argument("malformed kalshi frame");
+
+    const bool snapshot = (type == "orderbook_snapshot");
+    if ((!snapshot && type != "orderbook_delta") || msg_begin == nullptr) {
+        rest.push_back(RawMessage(type, std::string(data, n)));
+        return rest;
+    }
+
+    JsonCursor m(msg_begin, msg_end);
+    std::string ticker, side;
+    std::vector<TickLevel> yes, no;
+    double price = 0.0, delta = 0.0;
+    bool member = true;
+    if (!m.consume('{')) throw std::invalid_argument("malformed kalshi msg");
+    while (m.next_member(member, key)) {
+        bool ok;
+        if (key == "market_ticker") ok = m.read_string(ticker);
+        else if (snapshot && key == "yes") ok = read_cent_pairs(m, yes);
+        else if (snapshot && key == "no") ok = read_cent_pairs(m, no);
+        else if (!snapshot && key == "price") ok = m.read_number(price);
+        else if (!snapshot && key == "delta") ok = m.read_number(delta);
+        else if (!snapshot && key == "side") ok = m.read_string(side);
+        else ok = m.skip_value();
+        if (!ok) break;
+    }
+    if (!m.ok()) throw std::invalid_argument("malformed kalshi msg");
+
+    const int handle = snapshot ? register_book("kalshi", ticker) : find_handle("kalshi", ticker);
+    if (has_seq) {
+        std::vector<int> gapped;
+        const bool apply = kalshi_sequence(stream, static_cast<int>(sid), static_cast<long long>(seq), handle, snapshot, gapped);
+        if (!gapped.empty()) {
+            // same shape as websocket_handlers expects from the Python path
+            std::string note = "{\"type\":\"seq_gap\",\"stream\":" + std::to_string(static_cast<long long>(stream)) +
+                               ",\"sid\":" + std::to_string(static_cast<long long>(sid)) +
+                               ",\"seq\":" + std::to_string(static_cast<long long>(seq)) + ",\"books\":[";
+            for (std::size_t i = 0; i < gapped.size(); ++i) {
+                if (i) note += ",";
+                note += std::to_string(gapped[i]);
+            }
+            note += "]}";
+            rest.push_back(RawMessage("seq_gap", note));
+        }
+        if (!apply) return rest;
+    }
+
+    // Prices are cents, which are ladder indices at the default tick.
+    if (snapshot) {
+        init_order_book_ticks(handle, yes, no);
+    } else {
+        const char pred = (side == "yes") ? 'y' : 'n';
+        update_order_book_ticks(handle, pred, 'b', static_cast<int>(std::llround(price)), delta, true);
+    }
+    return rest;
+}
+
+std::vector<RawMessage> ServerStateCPP::ingest_polymarket(const char* data, std::size_t n) {
+    std::vector<RawMessage> rest;
+    JsonCursor c(data, data + n);
+    std::string key, member_key, side, event_type, asset_id;
+    std::vector<LOBEntry> bids, asks, bid_updates, offer_updates;
+    std::vector<PriceChange> changes;
+    double new_tick = 0.0;
+
+    // A frame is a list of events; accept a bare event too.
+    const bool is_list = c.peek('[');
+    bool first_event = true;
+    if (is_list) c.consume('[');
+    while (is_list ? c.next_element(first_event) : (first_event && !c.at_end())) {
+        first_event = false;
+        const char* event_begin = c.value_start();
+        event_type.clear();
+        asset_id.clear();
+        bids.clear();
+        asks.clear();
+        changes.clear();
+        bool member = true;
+        if (!c.consume('{')) break;
+        while (c.next_member(member, key)) {
+            bool ok;
+            if (key == "event_type") ok = c.read_string(event_type);
+            else if (key == "asset_id") ok = c.read_string(asset_id);
+            else if (key == "bids") ok = read_summaries(c, bids, member_key);
+            else if (key == "asks") ok = read_summaries(c, asks, member_key);
+            else if (key == "changes") ok = read_changes(c, changes, member_key, side);
+            else if (key == "new_tick_size") ok = c.read_number(new_tick);
+            else ok = c.skip_value();
+            if (!ok) break;
+        }
+        if (!c.ok()) break;
+
+        if (event_type == "book") {
+            init_order_book(register_book("polymarket", asset_id), bids, asks);
+        } else if (event_type == "price_change") {
+            bid_updates.clear();
+            offer_updates.clear();
+            for (std::size_t i = 0; i < changes.size(); ++i) {
+                if (changes[i].side == 'b') bid_updates.push_back(changes[i].entry);
+                else offer_updates.push_back(changes[i].entry);
+            }
+            const int h = find_handle("polymarket", asset_id);
+            if (!bid_updates.empty()) update_order_book(h, 'y', 'b', bid_updates, false);
+            if (!offer_updates.empty()) update_order_book(h, 'y', 'o', offer_updates, false);
+        } else if (event_type == "tick_size_change") {
+            set_tick_size(find_handle("polymarket", asset_id), new_tick);
+        } else {
+            rest.push_back(RawMessage(event_type, std::string(event_begin, c.pos())));
+        }
+    }
+    if (!c.ok()) throw std::invalid_argument("malformed polymarket frame");
+    return rest;
+}
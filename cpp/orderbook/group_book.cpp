@@ -0,0 +1,315 @@
+#include "group_book.hpp"
+#include <algorithm>
+#include <limits>
+
+void SpreadIndex::mark(int group, Entry& entry) {
+    if (entry.changed) return;
+    entry.changed = true;
+    changed_.push_back(group);
+}
+
+void SpreadIndex::update(const GroupSpread& spread) {
+    ExclusiveLock guard(lock_);
+    std::unordered_map<int, Entry>::iterator it = entries_.find(spread.group);
+    if (it == entries_.end()) {
+        Entry e;
+        e.live = false;
+        e.changed = false;
+        it = entries_.insert(std::make_pair(spread.group, e)).first;
+    }
+    Entry& entry = it->second;
+    if (entry.live) order_.erase(std::make_pair(-entry.spread.edge, spread.group));
+    entry.spread = spread;
+    entry.live = true;
+    order_.insert(std::make_pair(-spread.edge, spread.group));
+    mark(spread.group, entry);
+}
+
+void SpreadIndex::erase(int group) {
+    ExclusiveLock guard(lock_);
+    std::unordered_map<int, Entry>::iterator it = entries_.find(group);
+    if (it == entries_.end() || !it->second.live) return;
+    order_.erase(std::make_pair(-it->second.spread.edge, group));
+    it->second.live = false;
+    mark(group, it->second);
+}
+
+std::vector<GroupSpread> SpreadIndex::top(int k) const {
+    std::vector<GroupSpread> out;
+    SharedLock guard(lock_);
+    for (std::set<std::pair<double, int> >::const_iterator it = order_.begin();
+         it != order_.end() && static_cast<int>(out.size()) < k; ++it)
+        out.push_back(entries_.find(it->second)->second.spread);
+    return out;
+}
+
+bool SpreadIndex::get(int group, GroupSpread& out) const {
+    SharedLock guard(lock_);
+    std::unordered_map<int, Entry>::const_iterator it = entries_.find(group);
+    if (it == entries_.end() || !it->second.live) return false;
+    out = it->second.spread;
+    return true;
+}
+
+std::size_t SpreadIndex::size() const {
+    SharedLock guard(lock_);
+    return order_.size();
+}
+
+std::vector<int> SpreadIndex::drain_changed() {
+    std::vector<int> out;
+    ExclusiveLock guard(lock_);
+    out.swap(changed_);
+    for (std::size_t i = 0; i < out.size(); ++i) entries_[out[i]].changed = false;
+    return out;
+}
+
+int GroupBook::slot_of(int handle) const {
+    for (int j = 0; j < width_; ++j) {
+        if (slots_[j].first == handle) return j;
+    }
+    return -1;
+}
+
+void GroupBook::add_member(int handle, char pred) {
+    ExclusiveLock guard(lock_);
+    int slot = slot_of(handle);
+    if (slot < 0) slot = slot_of(-1);
+    if (slot < 0) {
+        widen(bids_, width_ + 1);
+        widen(offers_, width_ + 1);
+        slots_.push_back(std::make_pair(-1, 'y'));
+        tops_.push_back(Top());
+        slot = width_++;
+    }
+    slots_[slot] = std::make_pair(handle, pred);
+}
+
+void GroupBook::remove_member(int handle) {
+    ExclusiveLock guard(lock_);
+    const int slot = slot_of(handle);
+    if (slot < 0) return;
+    clear_slot(bids_, slot);
+    clear_slot(offers_, slot);
+    slots_[slot] = std::make_pair(-1, 'y');
+    if (refresh_top(slot, 'y', nullptr)) refresh_spread();
+}
+
+std::vector<std::pair<int, char> > GroupBook::members() const {
+    std::vector<std::pair<int, char> > out;
+    SharedLock guard(lock_);
+    for (int j = 0; j < width_; ++j) {
+        if (slots_[j].first >= 0) out.push_back(slots_[j]);
+    }
+    return out;
+}
+
+void GroupBook::widen(Side& side, int width) {
+    std::vector<double> qty(side.keys.size() * width, 0.0);
+    for (std::size_t k = 0; k < side.keys.size(); ++k)
+        std::copy(side.qty.begin() + k * width_, side.qty.begin() + (k + 1) * width_, qty.begin() + k * width);
+    side.qty.swap(qty);
+}
+
+void GroupBook::set(Side& side, int key, int slot, double quantity) {
+    const std::size_t k = std::lower_bound(side.keys.begin(), side.keys.end(), key) - side.keys.begin();
+    const std::size_t w = width_;
+    if (k == side.keys.size() || side.keys[k] != key) {
+        if (quantity == 0.0) return;
+        side.keys.insert(side.keys.begin() + k, key);
+        side.total.insert(side.total.begin() + k, quantity);
+        side.qty.insert(side.qty.begin() + k * w, w, 0.0);
+        side.qty[k * w + slot] = quantity;
+        return;
+    }
+    double* row = &side.qty[k * w];
+    row[slot] = quantity;
+    // Summed afresh rather than adjusted, so the total never drifts.
+    double total = 0.0;
+    bool live = false;
+    for (std::size_t j = 0; j < w; ++j) {
+        total += row[j];
+        live |= row[j] != 0.0;
+    }
+    if (live) {
+        side.total[k] = total;
+        return;
+    }
+    side.keys.erase(side.keys.begin() + k);
+    side.total.erase(side.total.begin() + k);
+    side.qty.erase(side.qty.begin() + k * w, side.qty.begin() + (k + 1) * w);
+}
+
+void GroupBook::clear_slot(Side& side, int slot) {
+    const std::size_t w = width_;
+    std::size_t out = 0;
+    for (std::size_t k = 0; k < side.keys.size(); ++k) {
+        double* row = &side.qty[k * w];
+        row[slot] = 0.0;
+        double total = 0.0;
+        bool live = false;
+        for (std::size_t j = 0; j < w; ++j) {
+            total += row[j];
+            live |= row[j] != 0.0;
+        }
+        if (!live) continue;
+        side.keys[out] = side.keys[k];
+        side.total[out] = total;
+        if (out != k) std::copy(row, row + w, side.qty.begin() + out * w);
+        ++out;
+    }
+    side.keys.resize(out);
+    side.total.resize(out);
+    side.qty.resize(out * w);
+}
+
+void GroupBook::load_side(int slot, char pred, const OrderBookCore& book, char side) {
+    const LevelLadder& ladder = side == 'b' ? book.bid_levels() : book.offer_levels();
+    for (int i = ladder.live_at_or_above(0); i >= 0; i = ladder.live_at_or_above(i + 1)) {
+        char s = side;
+        int key = group_index(book, i);
+        Side& into = target(pred, s, key);
+        set(into, key, slot, ladder.get(i));
+    }
+}
+
+void GroupBook::load(int handle, char pred, const OrderBookCore* book) {
+    ExclusiveLock guard(lock_);
+    const int slot = slot_of(handle);
+    if (slot < 0) return;
+    clear_slot(bids_, slot);
+    clear_slot(offers_, slot);
+    if (book) {
+        load_side(slot, pred, *book, 'b');
+        load_side(slot, pred, *book, 'o');
+    }
+    if (refresh_top(slot, pred, book)) refresh_spread();
+}
+
+void GroupBook::level_changed(int handle, char pred, const OrderBookCore& book, char side, int i) {
+    if (i < 0 || i >= book.num_levels()) return;
+    const double quantity = side == 'b' ? book.bid_quantity(i) : book.offer_quantity(i);
+    int key = group_index(book, i);
+    Side& into = target(pred, side, key);
+    ExclusiveLock guard(lock_);
+    const int slot = slot_of(handle);
+    if (slot < 0) return;
+    set(into, key, slot, quantity);
+    if (refresh_top(slot, pred, &book)) refresh_spread();
+}
+
+bool GroupBook::refresh_top(int slot, char pred, const OrderBookCore* book) {
+    Top top;
+    if (book) {
+        const int b = book->best_bid_index(), o = book->best_offer_index();
+        if (pred == 'n') {
+            // the member's offers are the group's bids, and vice versa
+            if (o >= 0) {
+                top.bid = kGroupLevels - group_index(*book, o);
+                top.bid_qty = book->offer_quantity(o);
+            }
+            if (b >= 0) {
+                top.offer = kGroupLevels - group_index(*book, b);
+                top.offer_qty = book->bid_quantity(b);
+            }
+        } else {
+            if (b >= 0) {
+                top.bid = group_index(*book, b);
+                top.bid_qty = book->bid_quantity(b);
+            }
+            if (o >= 0) {
+                top.offer = group_index(*book, o);
+                top.offer_qty = book->offer_quantity(o);
+            }
+        }
+    }
+    if (top == tops_[slot]) return false;
+    tops_[slot] = top;
+    return true;
+}
+
+void GroupBook::refresh_spread() {
+    // The two best bids and two best offers over the members are enough to
+    // pair the best bid with the best offer of a different book.
+    int b1 = -1, b2 = -1, o1 = -1, o2 = -1;
+    for (int j = 0; j < width_; ++j) {
+        if (slots_[j].first < 0) continue;
+        const Top& t = tops_[j];
+        if (t.bid >= 0) {
+            if (b1 < 0 || t.bid > tops_[b1].bid) { b2 = b1; b1 = j; }
+            else if (b2 < 0 || t.bid > tops_[b2].bid) b2 = j;
+        }
+        if (t.offer >= 0) {
+            if (o1 < 0 || t.offer < tops_[o1].offer) { o2 = o1; o1 = j; }
+            else if (o2 < 0 || t.offer < tops_[o2].offer) o2 = j;
+        }
+    }
+    int bid = -1, offer = -1;
+    if (b1 >= 0 && o1 >= 0 && b1 != o1) {
+        bid = b1;
+        offer = o1;
+    } else if (b1 >= 0 && o1 >= 0) {
+        const bool alt_offer = o2 >= 0, alt_bid = b2 >= 0;
+        if (alt_offer && (!alt_bid || tops_[b1].bid - tops_[o2].offer >= tops_[b2].bid - tops_[o1].offer)) {
+            bid = b1;
+            offer = o2;
+        } else if (alt_bid) {
+            bid = b2;
+            offer = o1;
+        }
+    }
+    if (bid < 0) {
+        if (has_spread_) {
+            has_spread_ = false;
+            spreads_->erase(id_);
+        }
+        return;
+    }
+    GroupSpread s;
+    s.group = id_;
+    s.bid_handle = slots_[bid].first;
+    s.offer_handle = slots_[offer].first;
+    s.bid_price = static_cast<double>(tops_[bid].bid) / kGroupLevels;
+    s.bid_qty = tops_[bid].bid_qty;
+    s.offer_price = static_cast<double>(tops_[offer].offer) / kGroupLevels;
+    s.offer_qty = tops_[offer].offer_qty;
+    s.edge = static_cast<double>(tops_[bid].bid - tops_[offer].offer) / kGroupLevels;
+    if (has_spread_ && s.bid_handle == spread_.bid_handle && s.offer_handle == spread_.offer_handle
+        && s.bid_price == spread_.bid_price && s.bid_qty == spread_.bid_qty
+        && s.offer_price == spread_.offer_price && s.offer_qty == spread_.offer_qty)
+        return;
+    spread_ = s;
+    has_spread_ = true;
+    spreads_->update(s);
+}
+
+void GroupBook::read_level(const Side& side, std::size_t k, std::vector<DepthLevel>& out) const {
+    out.push_back(DepthLevel(static_cast<double>(side.keys[k]) / kGroupLevels, side.total[k]));
+    const double* row = &side.qty[k * width_];
+    for (int j = 0; j < width_; ++j) {
+        if (row[j] != 0.0) out.back().venues.push_back(Contribution(slots_[j].first, row[j]));
+    }
+}
+
+void GroupBook::depth(int levels, std::vector<DepthLevel>& bids, std::vector<DepthLevel>& offers) const {
+    bids.clear();
+    offers.clear();
+    SharedLock guard(lock_);
+    const std::size_t n_bids = std::min<std::size_t>(std::max(levels, 0), bids_.keys.size());
+    const std::size_t n_offers = std::min<std::size_t>(std::max(levels, 0), offers_.keys.size());
+    for (std::size_t k = 0; k < n_bids; ++k) read_level(bids_, bids_.keys.size() - 1 - k, bids);
+    for (std::size_t k = 0; k < n_offers; ++k) read_level(offers_, k, offers);
+}
+
+void GroupBook::bbo(double* out) const {
+    out[0] = out[1] = out[2] = out[3] = std::numeric_limits<double>::quiet_NaN();
+    SharedLock guard(lock_);
+    if (!bids_.keys.empty()) {
+        out[0] = static_cast<double>(bids_.keys.back()) / kGroupLevels;
+        out[1] = bids_.total.back();
+    }
+    if (!offers_.keys.empty()) {
+        out[2] = static_cast<double>(offers_.keys.front()) / kGroupLevels;
+        out[3] = offers_.total.front();
+    }
+}
@@ -0,0 +1,172 @@
+#pragma once
+#include <cstdint>
+#include <vector>
+#include <utility>
+#include <set>
+#include <unordered_map>
+#include "orderbook_core.hpp"
+#include "rw_spinlock.hpp"
+
+// A group's best cross-venue trade: the best bid of one member book against
+// the best offer of another, in the group's yes terms. Exposed to Python as
+// the structured dtype orderbook_ext.SPREAD_DTYPE.
+struct GroupSpread {
+    int32_t group;
+    int32_t bid_handle;    // book with the bid
+    int32_t offer_handle;  // a different book, with the offer
+    double edge;           // bid_price - offer_price; > 0 is an arbitrage
+    double bid_price;
+    double bid_qty;        // at that book's best bid, not the group's
+    double offer_price;
+    double offer_qty;
+};
+
+// Every group's GroupSpread, ordered by edge so the top K are read without
+// a scan, plus the groups whose spread changed since the last drain. Written
+// by GroupBook under its own lock (order: book, group, index).
+class SpreadIndex {
+public:
+    SpreadIndex() {}
+
+    void update(const GroupSpread& spread);
+    // The group no longer has two books quoting opposite sides.
+    void erase(int group);
+
+    // Up to k spreads, largest edge first.
+    std::vector<GroupSpread> top(int k) const;
+    bool get(int group, GroupSpread& out) const;
+    std::size_t size() const;
+    // Groups whose spread changed or went away since the last call, each once.
+    std::vector<int> drain_changed();
+
+private:
+    SpreadIndex(const SpreadIndex&);
+    SpreadIndex& operator=(const SpreadIndex&);
+
+    struct Entry {
+        GroupSpread spread;
+        bool live;
+        bool changed;  // queued in changed_
+    };
+    void mark(int group, Entry& entry);
+
+    mutable RWSpinLock lock_;
+    std::set<std::pair<double, int> > order_;  // (-edge, group) for live entries
+    std::unordered_map<int, Entry> entries_;
+    std::vector<int> changed_;
+};
+
+// Consolidated book of a group of equivalent markets (Endpoint.group_id), e.g.
+// the same question listed on polymarket and kalshi. Every member's levels are
+// merged onto one grid of prices in the group's yes terms, and each level keeps
+// what each member (by book handle) contributes to it. ServerStateCPP keeps it
+// current as members change, one group level write per book level write, so
+// reads never rebuild it.
+//
+// Each member's top of book is cached too. When one moves, the group's
+// cross-venue spread is recomputed from those tops and, if it changed,
+// published to the SpreadIndex, so spread readers never look at books.
+//
+// Thread-safe; the lock is taken inside each method. ServerStateCPP calls the
+// writers while holding the member book's lock, so the order is always book,
+// then group.
+class GroupBook {
+public:
+    // Prices are kept in 0.0001 steps, the finest tick any venue uses; every
+    // member tick must be a multiple of it.
+    static const int kGroupLevels = 10000;
+
+    struct Contribution {
+        int handle;
+        double quantity;
+        Contribution(int h, double q) : handle(h), quantity(q) {}
+    };
+    struct DepthLevel {
+        double price;
+        double quantity;                   // sum of the contributions
+        std::vector<Contribution> venues;  // members with a nonzero quantity
+        DepthLevel(double p, double q) : price(p), quantity(q) {}
+    };
+
+    GroupBook(int id, SpreadIndex* spreads) : id_(id), width_(0), has_spread_(false), spreads_(spreads) {}
+
+    int id() const { return id_; }
+
+    // Members as (handle, pred): pred 'n' means the member's yes is the
+    // group's no, so its bids are group offers at 1 - price and vice versa.
+    void add_member(int handle, char pred);
+    void remove_member(int handle);
+    std::vector<std::pair<int, char> > members() const;
+
+    // Replace everything `handle` contributes with the live levels of `book`
+    // (nothing if null): for a new member, a new snapshot, a tick size change
+    // or a removed book.
+    void load(int handle, char pred, const OrderBookCore* book);
+    // Level i of side 'b' / 'o' of a member book changed; copy its quantity.
+    void level_changed(int handle, char pred, const OrderBookCore& book, char side, int i);
+
+    // Up to `levels` levels of each side, best first, read together.
+    void depth(int levels, std::vector<DepthLevel>& bids, std::vector<DepthLevel>& offers) const;
+    // Best bid and offer into out[0..4): bid price, bid qty, offer price,
+    // offer qty, NaN for an empty side.
+    void bbo(double* out) const;
+
+private:
+    GroupBook(const GroupBook&);
+    GroupBook& operator=(const GroupBook&);
+
+    // Live levels, ascending by group price index, in flat arrays (a group
+    // book is written as often as all its members together, and thousands of
+    // them don't stay in cache). Row k of qty holds each member slot's
+    // quantity at keys[k]; a level is live while any of them is nonzero.
+    struct Side {
+        std::vector<int> keys;
+        std::vector<double> total;
+        std::vector<double> qty;   // keys.size() rows of width_
+    };
+    // A member's best bid and offer on the group grid, -1 if none.
+    struct Top {
+        int bid;
+        double bid_qty;
+        int offer;
+        double offer_qty;
+        Top() : bid(-1), bid_qty(0.0), offer(-1), offer_qty(0.0) {}
+        bool operator==(const Top& o) const {
+            return bid == o.bid && bid_qty == o.bid_qty && offer == o.offer && offer_qty == o.offer_qty;
+        }
+    };
+
+    void set(Side& side, int key, int slot, double quantity);
+    void clear_slot(Side& side, int slot);
+    void widen(Side& side, int width);
+    void load_side(int slot, char pred, const OrderBookCore& book, char side);
+    void read_level(const Side& side, std::size_t k, std::vector<DepthLevel>& out) const;
+    int slot_of(int handle) const;
+    // Recompute the slot's Top; true if it moved.
+    bool refresh_top(int slot, char pred, const OrderBookCore* book);
+    void refresh_spread();
+
+    static inline int group_index(const OrderBookCore& book, int i) {
+        return static_cast<int>(std::llround(i * book.tick_size() * kGroupLevels));
+    }
+    // Side and group index a member level lands on, flipped for pred 'n'.
+    inline Side& target(char pred, char& side, int& key) {
+        if (pred == 'n') {
+            key = kGroupLevels - key;
+            side = (side == 'b') ? 'o' : 'b';
+        }
+        return side == 'b' ? bids_ : offers_;
+    }
+
+    const int id_;
+    mutable RWSpinLock lock_;
+    // (handle, pred) per member slot, handle -1 for a free slot
+    std::vector<std::pair<int, char> > slots_;
+    int width_;                    // slots_.size(), the row width of qty
+    Side bids_;
+    Side offers_;
+    std::vector<Top> tops_;        // per slot
+    GroupSpread spread_;           // as last published
+    bool has_spread_;
+    SpreadIndex* const spreads_;
+};
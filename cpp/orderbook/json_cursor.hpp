@@ -0,0 +1,192 @@
+#pragma once
+#include <string>
+#include <cstdlib>
+#include <cctype>
+
+// Minimal forward-only JSON reader for picking a few fields out of exchange
+// frames without building a document. Methods return false on malformed input
+// and latch ok() to false; callers bail out on the first failure.
+//
+// Objects and arrays are walked with a caller-held `first` flag:
+//
+//     bool first = true;
+//     if (!c.consume('{')) ...
+//     while (c.next_member(first, key)) { ...read or skip_value()... }
+//     if (!c.ok()) ...
+class JsonCursor {
+public:
+    JsonCursor(const char* begin, const char* end) : p_(begin), end_(end), error_(false) {}
+
+    bool ok() const { return !error_; }
+    const char* pos() const { return p_; }
+
+    bool at_end() { skip_ws(); return p_ >= end_; }
+
+    bool peek(char c) { skip_ws(); return p_ < end_ && *p_ == c; }
+
+    bool consume(char c) {
+        skip_ws();
+        if (p_ < end_ && *p_ == c) { ++p_; return true; }
+        return fail();
+    }
+
+    // Next "key": of an object whose '{' was consumed; false at the closing '}'.
+    bool next_member(bool& first, std::string& key) {
+        skip_ws();
+        if (p_ < end_ && *p_ == '}') { ++p_; return false; }
+        if (!first && !consume(',')) return false;
+        first = false;
+        return read_string(key) && consume(':');
+    }
+
+    // True if another element follows in an array whose '[' was consumed;
+    // false at the closing ']'.
+    bool next_element(bool& first) {
+        skip_ws();
+        if (p_ < end_ && *p_ == ']') { ++p_; return false; }
+        if (!first && !consume(',')) return false;
+        first = false;
+        return true;
+    }
+
+    bool read_string(std::string& out) {
+        skip_ws();
+        if (p_ >= end_ || *p_ != '"') return fail();
+        ++p_;
+        out.clear();
+        while (p_ < end_) {
+            char c = *p_++;
+            if (c == '"') return true;
+            if (c != '\\') { out.push_back(c); continue; }
+            if (p_ >= end_) break;
+            char e = *p_++;
+            switch (e) {
+                case '"': case '\\': case '/': out.push_back(e); break;
+                case 'b': out.push_back('\b'); break;
+                case 'f': out.push_back('\f'); break;
+                case 'n': out.push_back('\n'); break;
+                case 'r': out.push_back('\r'); break;
+                case 't': out.push_back('\t'); break;
+                case 'u': {
+                    unsigned cp = 0;
+                    if (!read_hex4(cp)) return fail();
+                    if (cp >= 0xD800 && cp < 0xDC00 && end_ - p_ >= 6 && p_[0] == '\\' && p_[1] == 'u') {
+                        p_ += 2;
+                        unsigned lo = 0;
+                        if (!read_hex4(lo)) return fail();
+                        cp = 0x10000 + ((cp - 0xD800) << 10) + (lo - 0xDC00);
+                    }
+                    append_utf8(out, cp);
+                    break;
+                }
+                default: return fail();
+            }
+        }
+        return fail();
+    }
+
+    // A JSON number, or a string holding one (polymarket quotes its decimals).
+    bool read_number(double& out) {
+        skip_ws();
+        if (p_ < end_ && *p_ == '"') {
+            if (!read_string(scratch_)) return false;
+            char* stop = nullptr;
+            out = std::strtod(scratch_.c_str(), &stop);
+            return (stop != scratch_.c_str() && *stop == '\0') || fail();
+        }
+        const char* s = p_;
+        while (p_ < end_ && is_number_char(*p_)) ++p_;
+        if (p_ == s) return fail();
+        scratch_.assign(s, p_);
+        char* stop = nullptr;
+        out = std::strtod(scratch_.c_str(), &stop);
+        return *stop == '\0' || fail();
+    }
+
+    // Skip whitespace and return where the next value starts.
+    const char* value_start() { skip_ws(); return p_; }
+
+    bool skip_value() {
+        skip_ws();
+        if (p_ >= end_) return fail();
+        const char c = *p_;
+        if (c == '"') return skip_string();
+        if (c == '{' || c == '[') {
+            int depth = 0;
+            while (p_ < end_) {
+                const char d = *p_;
+                if (d == '"') {
+                    if (!skip_string()) return false;
+                    continue;
+                }
+                if (d == '{' || d == '[') ++depth;
+                else if (d == '}' || d == ']') {
+                    if (--depth == 0) { ++p_; return true; }
+                }
+                ++p_;
+            }
+            return fail();
+        }
+        const char* s = p_;
+        while (p_ < end_ && (std::isalnum(static_cast<unsigned char>(*p_)) || is_number_char(*p_))) ++p_;
+        return p_ > s || fail();
+    }
+
+private:
+    bool fail() { error_ = true; return false; }
+
+    void skip_ws() {
+        while (p_ < end_ && (*p_ == ' ' || *p_ == '\n' || *p_ == '\r' || *p_ == '\t')) ++p_;
+    }
+
+    static bool is_number_char(char c) {
+        return (c >= '0' && c <= '9') || c == '-' || c == '+' || c == '.' || c == 'e' || c == 'E';
+    }
+
+    bool skip_string() {
+        ++p_; // opening quote
+        while (p_ < end_) {
+            const char c = *p_++;
+            if (c == '"') return true;
+            if (c == '\\') ++p_;
+        }
+        return fail();
+    }
+
+    bool read_hex4(unsigned& out) {
+        if (end_ - p_ < 4) return false;
+        out = 0;
+        for (int i = 0; i < 4; ++i) {
+            const char h = *p_++;
+            out <<= 4;
+            if (h >= '0' && h <= '9') out |= static_cast<unsigned>(h - '0');
+            else if (h >= 'a' && h <= 'f') out |= static_cast<unsigned>(h - 'a' + 10);
+            else if (h >= 'A' && h <= 'F') out |= static_cast<unsigned>(h - 'A' + 10);
+            else return false;
+        }
+        return true;
+    }
+
+    static void append_utf8(std::string& out, unsigned cp) {
+        if (cp < 0x80) {
+            out.push_back(static_cast<char>(cp));
+        } else if (cp < 0x800) {
+            out.push_back(static_cast<char>(0xC0 | (cp >> 6)));
+            out.push_back(static_cast<char>(0x80 | (cp & 0x3F)));
+        } else if (cp < 0x10000) {
+            out.push_back(static_cast<char>(0xE0 | (cp >> 12)));
+            out.push_back(static_cast<char>(0x80 | ((cp >> 6) & 0x3F)));
+            out.push_back(static_cast<char>(0x80 | (cp & 0x3F)));
+        } else {
+            out.push_back(static_cast<char>(0xF0 | (cp >> 18)));
+            out.push_back(static_cast<char>(0x80 | ((cp >> 12) & 0x3F)));
+            out.push_back(static_cast<char>(0x80 | ((cp >> 6) & 0x3F)));
+            out.push_back(static_cast<char>(0x80 | (cp & 0x3F)));
+        }
+    }
+
+    const char* p_;
+    const char* end_;
+    bool error_;
+    std::string scratch_;
+};
@@ -1,19 +1,165 @@
 #include "orderbook_core.hpp"
 
+LevelLadder::LevelLadder(int size) : size_(size), live_(0) {
+    if (size_ <= kAlwaysDenseLevels) dense_ = std::make_shared<Dense>(size_, 0.0);
+}
+
+LevelLadder::LevelLadder(const LevelLadder& other)
+    : size_(other.size_), live_(other.live_),
+      dense_(other.dense_ ? std::make_shared<Dense>(*other.dense_) : std::shared_ptr<Dense>()),
+      index_(other.index_), qty_(other.qty_) {}
+
+LevelLadder& LevelLadder::operator=(const LevelLadder& other) {
+    if (this != &other) {
+        size_ = other.size_;
+        live_ = other.live_;
+        dense_ = other.dense_ ? std::make_shared<Dense>(*other.dense_) : std::shared_ptr<Dense>();
+        index_ = other.index_;
+        qty_ = other.qty_;
+    }
+    return *this;
+}
+
+void LevelLadder::set_sparse(int i, double qty) {
+    const std::size_t k = position(i);
+    if (k < index_.size() && index_[k] == i) {
+        // An emptied level stays in place as a zero, since books tend to
+        // refill the same prices; zeros are swept out once they outnumber
+        // the live levels.
+        live_ += (qty != 0.0) - (qty_[k] != 0.0);
+        qty_[k] = qty;
+        if (qty == 0.0 && index_.size() > 2 * static_cast<std::size_t>(live_) + kSparseSlack) sweep();
+    } else if (qty != 0.0) {
+        index_.insert(index_.begin() + k, i);
+        qty_.insert(qty_.begin() + k, qty);
+        ++live_;
+    }
+}
+
+void LevelLadder::sweep() {
+    std::size_t out = 0;
+    for (std::size_t k = 0; k < index_.size(); ++k) {
+        if (qty_[k] == 0.0) continue;
+        index_[out] = index_[k];
+        qty_[out] = qty_[k];
+        ++out;
+    }
+    index_.resize(out);
+    qty_.resize(out);
+}
+
+void LevelLadder::switch_layout() {
+    if (dense_) {
+        std::vector<int> index;
+        std::vector<double> qty;
+        index.reserve(live_);
+        qty.reserve(live_);
+        const Dense& d = *dense_;
+        for (int i = 0; i < size_; ++i) {
+            if (d[i] == 0.0) continue;
+            index.push_back(i);
+            qty.push_back(d[i]);
+        }
+        index_.swap(index);
+        qty_.swap(qty);
+        // Views exported while dense keep the old storage and stop updating.
+        dense_.reset();
+    } else {
+        std::shared_ptr<Dense> levels = std::make_shared<Dense>(size_, 0.0);
+        copy_to(levels->data());
+        dense_ = levels;
+        std::vector<int>().swap(index_);
+        std::vector<double>().swap(qty_);
+    }
+}
+
+int LevelLadder::live_at_or_below(int i) const {
+    if (i >= size_) i = size_ - 1;
+    if (i < 0) return -1;
+    if (dense_) {
+        const Dense& d = *dense_;
+        while (i >= 0 && d[i] == 0.0) --i;
+        return i;
+    }
+    std::size_t k = position(i + 1);
+    while (k > 0) {
+        --k;
+        if (qty_[k] != 0.0) return index_[k];
+    }
+    return -1;
+}
+
+int LevelLadder::live_at_or_above(int i) const {
+    if (i < 0) i = 0;
+    if (i >= size_) return -1;
+    if (dense_) {
+        const Dense& d = *dense_;
+        while (i < size_ && d[i] == 0.0) ++i;
+        return i < size_ ? i : -1;
+    }
+    std::size_t k = position(i);
+    while (k < index_.size() && qty_[k] == 0.0) ++k;
+    return k < index_.size() ? index_[k] : -1;
+}
+
+std::shared_ptr<const LevelLadder::Dense> LevelLadder::dense() const {
+    if (dense_) return dense_;
+    std::shared_ptr<Dense> copy = std::make_shared<Dense>(size_, 0.0);
+    copy_to(copy->data());
+    return copy;
+}
+
+void LevelLadder::copy_to(double* out) const {
+    if (dense_) {
+        std::copy(dense_->begin(), dense_->end(), out);
+        return;
+    }
+    std::fill(out, out + size_, 0.0);
+    for (std::size_t k = 0; k < index_.size(); ++k) out[index_[k]] = qty_[k];
+}
+
+std::size_t LevelLadder::memory_bytes() const {
+    return dense_ ? dense_->capacity() * sizeof(double) : index_.capacity() * sizeof(int) + qty_.capacity() * sizeof(double);
+}
+
 OrderBookCore::OrderBookCore(double tick_size,
                              const std::vector<LOBEntry>& bids,
                              const std::vector<LOBEntry>& offers)
-    : tick_size_(tick_size) {
+    : tick_size_(tick_size), best_bid_idx_(-1), best_offer_idx_(-1) {
     const int n = static_cast<int>(1.0 / tick_size_) + 1;
-    bids_.assign(n, 0.0);
-    offers_.assign(n, 0.0);
+    bids_ = LevelLadder(n);
+    offers_ = LevelLadder(n);
     for (const auto& b : bids) {
         int i = price_to_index(b.price);
-        if (i >= 0 && i < n) bids_[i] = b.quantity;
+        if (i >= 0 && i < n) bids_.set(i, b.quantity);
     }
     for (const auto& o : offers) {
         int i = price_to_index(o.price);
-        if (i >= 0 && i < n) offers_[i] = o.quantity;
+        if (i >= 0 && i < n) offers_.set(i, o.quantity);
+    }
+    recompute_best();
+}
+
+void OrderBookCore::recompute_best() {
+    best_bid_idx_ = bids_.live_at_or_below(bids_.size() - 1);
+    best_offer_idx_ = offers_.live_at_or_above(0);
+}
+
+void OrderBookCore::bid_level_changed(int i, double qty) {
+    if (qty != 0.0) {
+        if (i > best_bid_idx_) best_bid_idx_ = i;
+    } else if (i == best_bid_idx_) {
+        // The best level emptied; move down to the next live one.
+        best_bid_idx_ = bids_.live_at_or_below(i - 1);
+    }
+}
+
+void OrderBookCore::offer_level_changed(int i, double qty) {
+    if (qty != 0.0) {
+        if (best_offer_idx_ == -1 || i < best_offer_idx_) best_offer_idx_ = i;
+    } else if (i == best_offer_idx_) {
+        // The best level emptied; move up to the next live one.
+        best_offer_idx_ = offers_.live_at_or_above(i + 1);
     }
 }
 
@@ -22,24 +168,17 @@ void OrderBookCore::rebuild_from_tick_change(double new_tick) {
     const int newN = static_cast<int>(1.0 / new_tick) + 1;
     const double conv = tick_size_ / new_tick;
 
-    std::vector<double> new_bids(newN, 0.0), new_offers(newN, 0.0);
-    for (int i = 0; i < static_cast<int>(bids_.size()); ++i) {
-        double qty = bids_[i];
-        if (qty != 0.0) {
-            int j = static_cast<int>(std::floor(i * conv)); // match Python floor for bids
-            if (j >= 0 && j < newN) new_bids[j] += qty;
-        }
-    }
-    for (int i = 0; i < static_cast<int>(offers_.size()); ++i) {
-        double qty = offers_[i];
-        if (qty != 0.0) {
-            int j = static_cast<int>(std::ceil(i * conv)); // match Python ceil for offers
-            if (j >= 0 && j < newN) new_offers[j] += qty;
-        }
-    }
-    bids_.swap(new_bids);
-    offers_.swap(new_offers);
+    // Fresh ladders rather than an in-place swap: exported views keep the
+    // old storage alive until they are released.
+    LevelLadder new_bids(newN);
+    LevelLadder new_offers(newN);
+    // match Python floor for bids, ceil for offers
+    new_bids.merge_from(bids_, [conv](int i) { return static_cast<int>(std::floor(i * conv)); });
+    new_offers.merge_from(offers_, [conv](int i) { return static_cast<int>(std::ceil(i * conv)); });
+    bids_ = std::move(new_bids);
+    offers_ = std::move(new_offers);
     tick_size_ = new_tick;
+    recompute_best();
 }
 
 void OrderBookCore::set_tick_size(double tick_size) {
@@ -47,36 +186,33 @@ void OrderBookCore::set_tick_size(double tick_size) {
 }
 
 bool OrderBookCore::best_bid(double& price_out, double& qty_out) const {
-    for (int i = static_cast<int>(bids_.size()) - 1; i >= 0; --i) {
-        if (bids_[i] != 0.0) {
-            price_out = index_to_price(i);
-            qty_out = bids_[i];
-            return true;
-        }
-    }
-    return false;
+    if (best_bid_idx_ < 0) return false;
+    price_out = index_to_price(best_bid_idx_);
+    qty_out = bids_.get(best_bid_idx_);
+    return true;
 }
 
 bool OrderBookCore::best_offer(double& price_out, double& qty_out) const {
-    for (int i = 0; i < static_cast<int>(offers_.size()); ++i) {
-        if (offers_[i] != 0.0) {
-            price_out = index_to_price(i);
-            qty_out = offers_[i];
-            return true;
-        }
-    }
-    return false;
+    if (best_offer_idx_ < 0) return false;
+    price_out = index_to_price(best_offer_idx_);
+    qty_out = offers_.get(best_offer_idx_);
+    return true;
 }
 
 void OrderBookCore::update_level(const LOBEntry& entry, char side, bool is_delta) {
-    int i = price_to_index(entry.price);
-    if (i < 0 || i >= static_cast<int>(bids_.size())) return;
+    update_index(price_to_index(entry.price), entry.quantity, side, is_delta);
+}
+
+void OrderBookCore::update_index(int i, double quantity, char side, bool is_delta) {
+    if (i < 0 || i >= bids_.size()) return;
     if (side == 'b') {
-        if (is_delta) bids_[i] += entry.quantity;
-        else bids_[i] = entry.quantity;
+        const double qty = is_delta ? bids_.get(i) + quantity : quantity;
+        bids_.set(i, qty);
+        bid_level_changed(i, qty);
     } else {
-        if (is_delta) offers_[i] += entry.quantity;
-        else offers_[i] = entry.quantity;
+        const double qty = is_delta ? offers_.get(i) + quantity : quantity;
+        offers_.set(i, qty);
+        offer_level_changed(i, qty);
     }
 }
 
@@ -89,39 +225,43 @@ std::vector<Trade> OrderBookCore::add_limit_order(const LOBEntry& entry, char si
     double order_q = entry.quantity;
     int p = price_to_index(entry.price);
     if (p < 0) p = 0;
-    if (p >= static_cast<int>(bids_.size())) p = static_cast<int>(bids_.size()) - 1;
-    bool fully_executed = false;
+    if (p >= bids_.size()) p = bids_.size() - 1;
 
+    // Empty levels cannot trade, so matching walks only the live levels from
+    // the top of book. Once the order is filled nothing rests, so stopping
+    // there matches a walk over every index.
     if (side == 'b') {
-        int i = 0;
-        while (i < static_cast<int>(offers_.size()) && i <= p) {
-            double vol = std::min(order_q, offers_[i]);
+        for (int i = best_offer_idx_; i >= 0 && i <= p && order_q != 0.0; i = offers_.live_at_or_above(i + 1)) {
+            const double level = offers_.get(i);
+            const double vol = std::min(order_q, level);
             if (vol > 0.0) {
                 trades.emplace_back(index_to_price(i), vol);
-                offers_[i] -= vol;
+                offers_.set(i, level - vol);
                 order_q -= vol;
-            } else if (order_q == 0.0) {
-                fully_executed = true;
-                break;
+                offer_level_changed(i, level - vol);
             }
-            ++i;
         }
-        if (!fully_executed && order_q > 0.0) bids_[p] += order_q;
+        if (order_q > 0.0) {
+            const double qty = bids_.get(p) + order_q;
+            bids_.set(p, qty);
+            bid_level_changed(p, qty);
+        }
     } else {
-        int i = static_cast<int>(bids_.size()) - 1;
-        while (i >= 0 && i >= p) {
-            double vol = std::min(order_q, bids_[i]);
+        for (int i = best_bid_idx_; i >= 0 && i >= p && order_q != 0.0; i = bids_.live_at_or_below(i - 1)) {
+            const double level = bids_.get(i);
+            const double vol = std::min(order_q, level);
             if (vol > 0.0) {
                 trades.emplace_back(index_to_price(i), vol);
-                bids_[i] -= vol;
+                bids_.set(i, level - vol);
                 order_q -= vol;
-            } else if (order_q == 0.0) {
-                fully_executed = true;
-                break;
+                bid_level_changed(i, level - vol);
             }
-            --i;
         }
-        if (!fully_executed && order_q > 0.0) offers_[p] += order_q;
+        if (order_q > 0.0) {
+            const double qty = offers_.get(p) + order_q;
+            offers_.set(p, qty);
+            offer_level_changed(p, qty);
+        }
     }
 
     return trades;
@@ -129,41 +269,56 @@ std::vector<Trade> OrderBookCore::add_limit_order(const LOBEntry& entry, char si
 
 double OrderBookCore::tick_size() const { return tick_size_; }
 
-std::pair<std::vector<std::pair<double,double>>, double> OrderBookCore::get_col() const {
-    std::vector<std::pair<double,double>> ladder;
+std::shared_ptr<const OrderBookCore::Ladder> OrderBookCore::bid_ladder() const { return bids_.dense(); }
 
-    // lowest offer index
-    int o = -1;
-    for (int i = 0; i < static_cast<int>(offers_.size()); ++i) {
-        if (offers_[i] != 0.0) { o = i; break; }
-    }
+std::shared_ptr<const OrderBookCore::Ladder> OrderBookCore::offer_ladder() const { return offers_.dense(); }
 
-    // highest bid index
-    int b = -1;
-    for (int i = static_cast<int>(bids_.size()) - 1; i >= 0; --i) {
-        if (bids_[i] != 0.0) { b = i; break; }
+int OrderBookCore::depth(char side, int levels, double* out) const {
+    int k = 0;
+    if (side == 'b') {
+        for (int i = best_bid_idx_; i >= 0 && k < levels; i = bids_.live_at_or_below(i - 1), ++k) {
+            out[2 * k] = index_to_price(i);
+            out[2 * k + 1] = bids_.get(i);
+        }
+    } else {
+        for (int i = best_offer_idx_; i >= 0 && k < levels; i = offers_.live_at_or_above(i + 1), ++k) {
+            out[2 * k] = index_to_price(i);
+            out[2 * k + 1] = offers_.get(i);
+        }
     }
+    return k;
+}
+
+std::pair<std::vector<std::pair<double,double>>, double> OrderBookCore::get_col() const {
+    std::vector<std::pair<double,double>> ladder;
+    const int n = bids_.size();
+
+    int o = best_offer_idx_; // lowest offer index
+    int b = best_bid_idx_;   // highest bid index
 
     // Fallbacks to avoid crashes (mimic original intent but safer)
-    if (o == -1) o = static_cast<int>(offers_.size()) - 1;
+    if (o == -1) o = n - 1;
     if (b == -1) b = 0;
 
     double mid = (o + b) / 2.0;
 
+    // Every index is listed, so lay the rows out with zero quantity and fill
+    // in the live levels; a sparse side then costs its live count, not n lookups.
     // bids from 0..floor(mid)
-    int end_bids = static_cast<int>(std::floor(mid));
-    for (int i = 0; i <= end_bids && i < static_cast<int>(bids_.size()); ++i) {
-        ladder.emplace_back(static_cast<double>(i), bids_[i]);
-    }
+    const int end_bids = std::min(static_cast<int>(std::floor(mid)), n - 1);
+    for (int i = 0; i <= end_bids; ++i) ladder.emplace_back(static_cast<double>(i), 0.0);
+    for (int i = bids_.live_at_or_above(0); i >= 0 && i <= end_bids; i = bids_.live_at_or_above(i + 1))
+        ladder[i].second = bids_.get(i);
     // If mid has fractional, insert (mid, 0)
     if (std::fmod(mid, 1.0) != 0.0) {
         ladder.emplace_back(mid, 0.0);
     }
     // offers from ceil(mid)..end
-    int start_offers = static_cast<int>(std::ceil(mid));
-    for (int i = start_offers; i < static_cast<int>(offers_.size()); ++i) {
-        ladder.emplace_back(static_cast<double>(i), offers_[i]);
-    }
+    const int start_offers = static_cast<int>(std::ceil(mid));
+    const std::size_t first_offer = ladder.size();
+    for (int i = start_offers; i < n; ++i) ladder.emplace_back(static_cast<double>(i), 0.0);
+    for (int i = offers_.live_at_or_above(start_offers); i >= 0; i = offers_.live_at_or_above(i + 1))
+        ladder[first_offer + (i - start_offers)].second = offers_.get(i);
 
     return std::make_pair(ladder, mid);
-}
\ No newline at end of file
+}
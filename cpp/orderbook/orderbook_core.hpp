@@ -3,6 +3,7 @@
 #include <cmath>
 #include <algorithm>
 #include <utility>
+#include <memory>
 
 struct LOBEntry {
     double price;
@@ -18,12 +19,111 @@ struct Trade {
     Trade(double p, double q) : price(p), quantity(q) {}
 };
 
+// One side of a book: quantity per price index 0..size()-1, stored either
+// dense (a slot per index: O(1) access, and exportable without copying) or
+// sparse (the levels in use, sorted by index: memory and scans follow the
+// few dozen levels a real book has, not the 1/tick_size it could have).
+// A side starts sparse when it has more than kAlwaysDenseLevels levels, goes
+// sparse once fewer than 1 in kSparseRatio are live, and dense again above
+// 1 in kDenseRatio; the gap between the two keeps it from flapping.
+class LevelLadder {
+public:
+    typedef std::vector<double> Dense;
+
+    static const int kAlwaysDenseLevels = 128;
+    static const int kSparseRatio = 16;
+    static const int kDenseRatio = 4;
+    static const int kSparseSlack = 16; // emptied levels kept before a sweep
+
+    explicit LevelLadder(int size = 0);
+    LevelLadder(const LevelLadder& other);
+    LevelLadder& operator=(const LevelLadder& other);
+    LevelLadder(LevelLadder&&) = default;
+    LevelLadder& operator=(LevelLadder&&) = default;
+
+    int size() const { return size_; }
+    int live() const { return live_; }
+    bool sparse() const { return !dense_; }
+
+    inline double get(int i) const {
+        if (dense_) return (*dense_)[i];
+        const std::size_t k = position(i);
+        return (k < index_.size() && index_[k] == i) ? qty_[k] : 0.0;
+    }
+
+    inline void set(int i, double qty) {
+        if (dense_) {
+            double& slot = (*dense_)[i];
+            live_ += (qty != 0.0) - (slot != 0.0);
+            slot = qty;
+        } else {
+            set_sparse(i, qty);
+        }
+        if (dense_ ? (size_ > kAlwaysDenseLevels && live_ * kSparseRatio < size_) : (live_ * kDenseRatio > size_))
+            switch_layout();
+    }
+
+    // Nearest live (nonzero) index <= i / >= i, or -1 if there is none.
+    int live_at_or_below(int i) const;
+    int live_at_or_above(int i) const;
+
+    // Add every live level of `other` at the index f(index) (dropped if out of range).
+    template <class F> void merge_from(const LevelLadder& other, F f);
+
+    // Quantities as a dense vector: the live storage when dense (writes show
+    // through), a copy when sparse.
+    std::shared_ptr<const Dense> dense() const;
+    // Write all size() quantities to out.
+    void copy_to(double* out) const;
+    std::size_t memory_bytes() const;
+
+private:
+    // First sparse slot with index >= i (a branchless lower_bound: which way
+    // each step goes is a coin flip on a busy book).
+    inline std::size_t position(int i) const {
+        const int* base = index_.data();
+        std::size_t n = index_.size();
+        if (n == 0) return 0;
+        while (n > 1) {
+            const std::size_t half = n / 2;
+            base = (base[half] < i) ? base + half : base;
+            n -= half;
+        }
+        return (base - index_.data()) + (*base < i);
+    }
+    void set_sparse(int i, double qty);
+    void sweep();
+    void switch_layout();
+
+    int size_;
+    int live_;
+    std::shared_ptr<Dense> dense_; // null when sparse
+    std::vector<int> index_;       // sparse levels, ascending
+    std::vector<double> qty_;
+};
+
+template <class F> void LevelLadder::merge_from(const LevelLadder& other, F f) {
+    for (int i = other.live_at_or_above(0); i >= 0; i = other.live_at_or_above(i + 1)) {
+        const int j = f(i);
+        if (j >= 0 && j < size_) set(j, get(j) + other.get(i));
+    }
+}
+
 class OrderBookCore {
 public:
+    // Quantity per price index; price = index * tick_size.
+    typedef LevelLadder::Dense Ladder;
+
     OrderBookCore(double tick_size,
                   const std::vector<LOBEntry>& bids,
                   const std::vector<LOBEntry>& offers);
 
+    // Copies get their own ladders (the storage is shared only with views).
+    OrderBookCore(const OrderBookCore& other) = default;
+    OrderBookCore& operator=(const OrderBookCore& other) = default;
+    OrderBookCore(OrderBookCore&&) = default;
+    OrderBookCore& operator=(OrderBookCore&&) = default;
+
     void set_tick_size(double tick_size);
 
     // Returns true if present; outputs (price, qty)
@@ -31,12 +131,38 @@ public:
     bool best_offer(double& price_out, double& qty_out) const;
 
     void update_level(const LOBEntry& entry, char side, bool is_delta);
+    // update_level at ladder index i instead of a price (ignored if out of range).
+    void update_index(int i, double quantity, char side, bool is_delta);
     void update_levels(const std::vector<LOBEntry>& entries, char side, bool is_delta);
 
     std::vector<Trade> add_limit_order(const LOBEntry& entry, char side);
     
     double tick_size() const;
 
+    // Ladder index a price maps to (may be out of range), and the cached
+    // top-of-book indices (-1 when that side is empty).
+    int price_index(double price) const { return price_to_index(price); }
+    int best_bid_index() const { return best_bid_idx_; }
+    int best_offer_index() const { return best_offer_idx_; }
+
+    // Ladders as dense vectors. A dense side returns its live storage, which
+    // level updates write through; a sparse side (see LevelLadder) returns a
+    // copy. A tick size change, or a side changing layout, replaces the
+    // storage, leaving previously returned ladders stale.
+    std::shared_ptr<const Ladder> bid_ladder() const;
+    std::shared_ptr<const Ladder> offer_ladder() const;
+
+    double bid_quantity(int i) const { return bids_.get(i); }
+    double offer_quantity(int i) const { return offers_.get(i); }
+    int num_levels() const { return bids_.size(); }
+    const LevelLadder& bid_levels() const { return bids_; }
+    const LevelLadder& offer_levels() const { return offers_; }
+    std::size_t memory_bytes() const { return bids_.memory_bytes() + offers_.memory_bytes(); }
+
+    // Up to `levels` live levels of side 'b' or 'o', best first, as (price,
+    // quantity) pairs in out[0 .. 2 * levels); returns how many.
+    int depth(char side, int levels, double* out) const;
+
     // Ladder as (index, interest) and midpoint *index* (match original Python behavior)
     std::pair<std::vector<std::pair<double,double>>, double> get_col() const;
 private:
@@ -55,7 +181,15 @@ private:
 
     void rebuild_from_tick_change(double new_tick);
 
+    // Top-of-book is cached and kept current on every level write, so
+    // best_bid/best_offer/get_col never scan the ladders.
+    void recompute_best();
+    void bid_level_changed(int i, double qty);
+    void offer_level_changed(int i, double qty);
+
     double tick_size_;
-    std::vector<double> bids_;
-    std::vector<double> offers_;
+    LevelLadder bids_;
+    LevelLadder offers_;
+    int best_bid_idx_;   // -1 when there are no bids
+    int best_offer_idx_; // -1 when there are no offers
 };
\ No newline at end of file
@@ -0,0 +1,67 @@
+#pragma once
+#include <atomic>
+#include <thread>
+
+// Reader/writer spin lock (C++11 has no shared_mutex). ServerStateCPP's
+// critical sections are a level write or a ladder copy, far shorter than a
+// futex round trip, so contended waiters just yield. A waiting writer blocks
+// new readers, so a stream of get_market calls can't starve ingest.
+class RWSpinLock {
+public:
+    RWSpinLock() : state_(0), writers_waiting_(0) {}
+
+    void lock() {
+        writers_waiting_.fetch_add(1, std::memory_order_relaxed);
+        int expected = 0;
+        while (!state_.compare_exchange_weak(expected, kWriter, std::memory_order_acquire,
+                                             std::memory_order_relaxed)) {
+            expected = 0;
+            std::this_thread::yield();
+        }
+        writers_waiting_.fetch_sub(1, std::memory_order_relaxed);
+    }
+
+    void unlock() { state_.store(0, std::memory_order_release); }
+
+    void lock_shared() {
+        for (;;) {
+            if (writers_waiting_.load(std::memory_order_relaxed) == 0) {
+                int s = state_.load(std::memory_order_relaxed);
+                if (s >= 0 && state_.compare_exchange_weak(s, s + 1, std::memory_order_acquire,
+                                                           std::memory_order_relaxed))
+                    return;
+            }
+            std::this_thread::yield();
+        }
+    }
+
+    void unlock_shared() { state_.fetch_sub(1, std::memory_order_release); }
+
+private:
+    RWSpinLock(const RWSpinLock&);
+    RWSpinLock& operator=(const RWSpinLock&);
+
+    static const int kWriter = -1;
+    std::atomic<int> state_;          // -1 writer, 0 free, >0 reader count
+    std::atomic<int> writers_waiting_;
+};
+
+class ExclusiveLock {
+public:
+    explicit ExclusiveLock(RWSpinLock& l) : l_(l) { l_.lock(); }
+    ~ExclusiveLock() { l_.unlock(); }
+private:
+    ExclusiveLock(const ExclusiveLock&);
+    ExclusiveLock& operator=(const ExclusiveLock&);
+    RWSpinLock& l_;
+};
+
+class SharedLock {
+public:
+    explicit SharedLock(RWSpinLock& l) : l_(l) { l_.lock_shared(); }
+    ~SharedLock() { l_.unlock_shared(); }
+private:
+    SharedLock(const SharedLock&);
+    SharedLock& operator=(const SharedLock&);
+    RWSpinLock& l_;
+};
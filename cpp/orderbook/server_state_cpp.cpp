@@ -1,41 +1,141 @@
 #include "server_state_cpp.hpp"
 #include <cmath>
 #include <stdexcept>
+#include <algorithm>
+#include <limits>
+#include <string>
+
+ServerStateCPP::ServerStateCPP()
+    : num_books_(0), seq_gaps_(0), seq_stale_marks_(0), seq_duplicates_(0), shm_(nullptr) {
+    for (int i = 0; i < kMaxChunks; ++i) chunks_[i].store(nullptr, std::memory_order_relaxed);
+}
+
+ServerStateCPP::~ServerStateCPP() {
+    for (int i = 0; i < kMaxChunks; ++i) delete[] chunks_[i].load(std::memory_order_relaxed);
+    delete shm_.load(std::memory_order_relaxed);
+}
+
+int ServerStateCPP::register_book(const std::string& exchange_id,
+                                  const std::string& market_id) {
+    const int existing = find_handle(exchange_id, market_id);
+    if (existing >= 0) return existing;
+
+    ExclusiveLock guard(registry_lock_);
+    auto& markets = handles_[exchange_id];
+    auto it = markets.find(market_id);
+    if (it != markets.end()) return it->second; // registered while we waited
+    const int h = num_books_.load(std::memory_order_relaxed);
+    const int chunk = h >> kChunkBits;
+    if (chunk >= kMaxChunks) throw std::length_error("too many order books");
+    if (chunks_[chunk].load(std::memory_order_relaxed) == nullptr)
+        chunks_[chunk].store(new BookSlot[kChunkSize], std::memory_order_release);
+    markets.emplace(market_id, h);
+    keys_.emplace_back(exchange_id, market_id);
+    if (ShmBookWriter* w = shm()) w->add_book(h, exchange_id, market_id);
+    num_books_.store(h + 1, std::memory_order_release);
+    return h;
+}
+
+int ServerStateCPP::find_handle(const std::string& exchange_id,
+                                const std::string& market_id) const {
+    SharedLock guard(registry_lock_);
+    auto ex = handles_.find(exchange_id);
+    if (ex == handles_.end()) return -1;
+    auto it = ex->second.find(market_id);
+    if (it == ex->second.end()) return -1;
+    return it->second;
+}
+
+std::pair<std::string, std::string> ServerStateCPP::book_key(int handle) const {
+    SharedLock guard(registry_lock_);
+    if (handle < 0 || handle >= static_cast<int>(keys_.size()))
+        throw std::out_of_range("unknown book handle");
+    return keys_[handle];
+}
+
+int ServerStateCPP::num_books() const { return num_books_.load(std::memory_order_acquire); }
+
+void ServerStateCPP::init_order_book(int handle,
+                                     const std::vector<LOBEntry>& bids,
+                                     const std::vector<LOBEntry>& offers) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) throw std::out_of_range("unknown book handle");
+    // Start with default tick; prices given are absolute (0..1), so indices follow tick.
+    // Built outside the lock; the old book is freed after it is released.
+    std::unique_ptr<OrderBookCore> book(new OrderBookCore(kDefaultTick, bids, offers));
+    {
+        ExclusiveLock guard(slot->lock);
+        slot->book.swap(book);
+        slot->stale.store(false, std::memory_order_release);
+        if (ShmBookWriter* w = shm()) w->publish_book(handle, *slot->book);
+        group_reload(handle, slot);
+    }
+    mark_dirty(handle, slot);
+}
 
 void ServerStateCPP::init_order_book(const std::string& exchange_id,
                                      const std::string& market_id,
                                      const std::vector<LOBEntry>& bids,
                                      const std::vector<LOBEntry>& offers) {
-    const std::string k = make_key(exchange_id, market_id);
-    // Start with default tick; prices given are absolute (0..1), so indices follow tick.
-    books_.erase(k);
-    books_.emplace(k, OrderBookCore(kDefaultTick, bids, offers));
+    init_order_book(register_book(exchange_id, market_id), bids, offers);
 }
 
-void ServerStateCPP::update_order_book(const std::string& exchange_id,
-                                       const std::string& market_id,
+void ServerStateCPP::remove_order_book(int handle) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
+    std::unique_ptr<OrderBookCore> book;
+    {
+        ExclusiveLock guard(slot->lock);
+        slot->book.swap(book);
+        slot->stale.store(false, std::memory_order_release);
+        if (ShmBookWriter* w = shm()) w->clear_book(handle);
+        group_reload(handle, slot);
+    }
+    {
+        ExclusiveLock guard(seq_lock_);
+        for (auto it = sid_seq_.begin(); it != sid_seq_.end();) {
+            std::vector<int>& books = it->second.books;
+            books.erase(std::remove(books.begin(), books.end(), handle), books.end());
+            if (books.empty()) it = sid_seq_.erase(it);
+            else ++it;
+        }
+    }
+    if (book) mark_dirty(handle, slot);
+}
+
+void ServerStateCPP::remove_order_book(const std::string& exchange_id,
+                                       const std::string& market_id) {
+    remove_order_book(find_handle(exchange_id, market_id));
+}
+
+void ServerStateCPP::update_order_book(int handle,
                                        char pred,
                                        char side,
                                        const LOBEntry& data,
                                        bool is_delta) {
-    const std::string k = make_key(exchange_id, market_id);
-    auto it = books_.find(k);
-    if (it == books_.end()) return;
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
     LOBEntry e = data;
     char s = side;
     apply_pred_flip(pred, s, e.price);
-    it->second.update_level(e, s, is_delta);
+    {
+        ExclusiveLock guard(slot->lock);
+        if (!slot->book) return;
+        const int i = slot->book->price_index(e.price);
+        slot->book->update_index(i, e.quantity, s, is_delta);
+        if (ShmBookWriter* w = shm()) w->publish_level(handle, *slot->book, s, i);
+        group_level(handle, slot, s, i);
+    }
+    mark_dirty(handle, slot);
 }
 
-void ServerStateCPP::update_order_book(const std::string& exchange_id,
-                                       const std::string& market_id,
+void ServerStateCPP::update_order_book(int handle,
                                        char pred,
                                        char side,
                                        const std::vector<LOBEntry>& entries,
                                        bool is_delta) {
-    const std::string k = make_key(exchange_id, market_id);
-    auto it = books_.find(k);
-    if (it == books_.end()) return;
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
 
     std::vector<LOBEntry> adjusted;
     adjusted.reserve(entries.size());
@@ -48,68 +148,397 @@ void ServerStateCPP::update_order_book(const std::string& exchange_id,
         adjusted.emplace_back(p, e.quantity);
         // NOTE: side can flip per pred, but pred is constant per call so safe to reuse s
     }
-    it->second.update_levels(adjusted, s, is_delta);
+    {
+        ExclusiveLock guard(slot->lock);
+        if (!slot->book) return;
+        slot->book->update_levels(adjusted, s, is_delta);
+        ShmBookWriter* w = shm();
+        if (w || slot->group) {
+            for (std::size_t k = 0; k < adjusted.size(); ++k) {
+                const int i = slot->book->price_index(adjusted[k].price);
+                if (w) w->publish_level(handle, *slot->book, s, i);
+                group_level(handle, slot, s, i);
+            }
+        }
+    }
+    mark_dirty(handle, slot);
 }
 
-std::pair<std::vector<LOBEntry>, std::vector<LOBEntry>>
-ServerStateCPP::get_market(const std::string& exchange_id,
-                           const std::string& market_id) const {
-    const std::string k = make_key(exchange_id, market_id);
-    auto it = books_.find(k);
-    if (it == books_.end()) return {};
+void ServerStateCPP::update_order_book(const std::string& exchange_id,
+                                       const std::string& market_id,
+                                       char pred,
+                                       char side,
+                                       const LOBEntry& data,
+                                       bool is_delta) {
+    update_order_book(find_handle(exchange_id, market_id), pred, side, data, is_delta);
+}
 
-    const auto& ob = it->second;
-    std::vector<LOBEntry> bids, offers;
+void ServerStateCPP::update_order_book(const std::string& exchange_id,
+                                       const std::string& market_id,
+                                       char pred,
+                                       char side,
+                                       const std::vector<LOBEntry>& entries,
+                                       bool is_delta) {
+    update_order_book(find_handle(exchange_id, market_id), pred, side, entries, is_delta);
+}
 
-    auto col_mid = ob.get_col();
-    const auto& ladder = col_mid.first;
-    const double mid = col_mid.second;
+void ServerStateCPP::init_order_book_ticks(int handle,
+                                           const std::vector<TickLevel>& yes,
+                                           const std::vector<TickLevel>& no) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) throw std::out_of_range("unknown book handle");
+    std::unique_ptr<OrderBookCore> book(new OrderBookCore(kDefaultTick, std::vector<LOBEntry>(), std::vector<LOBEntry>()));
+    const int top = book->num_levels() - 1;
+    for (std::size_t i = 0; i < yes.size(); ++i) book->update_index(yes[i].first, yes[i].second, 'b', false);
+    for (std::size_t i = 0; i < no.size(); ++i) book->update_index(top - no[i].first, no[i].second, 'o', false);
+    {
+        ExclusiveLock guard(slot->lock);
+        slot->book.swap(book);
+        slot->stale.store(false, std::memory_order_release);
+        if (ShmBookWriter* w = shm()) w->publish_book(handle, *slot->book);
+        group_reload(handle, slot);
+    }
+    mark_dirty(handle, slot);
+}
 
-    const double tick_probe_best_bid = [&](){
-        double p=0.0,q=0.0;
-        if (ob.best_bid(p,q)) return p>0? p : kDefaultTick; // best available
-        return kDefaultTick;
-    }();
+void ServerStateCPP::update_order_book_ticks(int handle,
+                                             char pred,
+                                             char side,
+                                             int tick,
+                                             double quantity,
+                                             bool is_delta) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
+    {
+        ExclusiveLock guard(slot->lock);
+        if (!slot->book) return;
+        char s = side;
+        apply_pred_flip(pred, s, tick, *slot->book);
+        slot->book->update_index(tick, quantity, s, is_delta);
+        if (ShmBookWriter* w = shm()) w->publish_level(handle, *slot->book, s, tick);
+        group_level(handle, slot, s, tick);
+    }
+    mark_dirty(handle, slot);
+}
 
-    const double tick = ob.tick_size();
+void ServerStateCPP::update_order_book_ticks(int handle,
+                                             char pred,
+                                             char side,
+                                             const std::vector<TickLevel>& levels,
+                                             bool is_delta) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
+    {
+        ExclusiveLock guard(slot->lock);
+        if (!slot->book) return;
+        ShmBookWriter* w = shm();
+        for (std::size_t k = 0; k < levels.size(); ++k) {
+            char s = side;
+            int i = levels[k].first;
+            apply_pred_flip(pred, s, i, *slot->book);
+            slot->book->update_index(i, levels[k].second, s, is_delta);
+            if (w) w->publish_level(handle, *slot->book, s, i);
+            group_level(handle, slot, s, i);
+        }
+    }
+    mark_dirty(handle, slot);
+}
+
+void ServerStateCPP::apply_batch(const BookUpdate* records, std::size_t n) {
+    std::size_t r = 0;
+    while (r < n) {
+        // Hold each book's lock across a run of consecutive records for it.
+        const int handle = static_cast<int>(records[r].book);
+        std::size_t run_end = r + 1;
+        while (run_end < n && static_cast<int>(records[run_end].book) == handle) ++run_end;
 
-    // We don't have public accessors for vectors; reconstruct from ladder.
-    // ladder contains (index or fractional mid, qty). We filter non-zeros and convert index->price.
-    for (const auto& pr : ladder) {
-        const double idx = pr.first;
-        const double qty = pr.second;
-        if (std::fmod(idx, 1.0) != 0.0) continue; // skip mid marker
-        if (qty == 0.0) continue;
-
-        const int i = static_cast<int>(idx);
-        const double price = i * tick_probe_best_bid / std::round(tick_probe_best_bid / tick); // robust to tick changes
-        // Actually we know OrderBookCore uses its own tick; use best bid price to infer tick,
-        // but safer is to ask OrderBookCore to convert; since we can't, assume index_to_price is idx * current tick_size.
-        // We approximate using kDefaultTick if best bid could not be read.
-    }
-
-    // Better approach: We know OrderBookCore uses its internal tick value consistently.
-    // Since we can't read it, assume default tick for price reconstruction.
-
-    for (size_t j = 0; j < ladder.size(); ++j) {
-        const double idx = ladder[j].first;
-        const double qty = ladder[j].second;
-        if (std::fmod(idx, 1.0) != 0.0 || qty == 0.0) continue;
-        const double price = static_cast<int>(idx) * tick;
-        if (idx < std::floor(mid) + 1e-12) {
-            bids.emplace_back(price, qty);
-        } else if (idx > std::ceil(mid) - 1e-12) {
-            offers.emplace_back(price, qty);
+        BookSlot* slot = slot_at(handle);
+        bool applied = false;
+        if (slot) {
+            ExclusiveLock guard(slot->lock);
+            if (slot->book) {
+                ShmBookWriter* w = shm();
+                for (; r < run_end; ++r) {
+                    const BookUpdate& u = records[r];
+                    char s = u.side[0];
+                    int i;
+                    if (u.in_ticks) {
+                        i = static_cast<int>(u.price);
+                        apply_pred_flip(u.pred[0], s, i, *slot->book);
+                    } else {
+                        double price = u.price;
+                        apply_pred_flip(u.pred[0], s, price);
+                        i = slot->book->price_index(price);
+                    }
+                    slot->book->update_index(i, u.quantity, s, u.is_delta);
+                    if (w) w->publish_level(handle, *slot->book, s, i);
+                    group_level(handle, slot, s, i);
+                }
+                applied = true;
+            }
         }
+        if (applied) mark_dirty(handle, slot);
+        r = run_end;
     }
+}
+
+std::pair<std::vector<LOBEntry>, std::vector<LOBEntry>>
+ServerStateCPP::get_market(int handle) const {
+    const BookSlot* slot = slot_at(handle);
+    if (!slot) return {};
+    SharedLock guard(slot->lock);
+    if (!slot->book) return {};
+
+    const OrderBookCore& ob = *slot->book;
+    const LevelLadder& bid_levels = ob.bid_levels();
+    const LevelLadder& offer_levels = ob.offer_levels();
+    const double tick = ob.tick_size();
+    std::vector<LOBEntry> bids, offers;
+    bids.reserve(bid_levels.live());
+    offers.reserve(offer_levels.live());
+    // Every live level of each side, ascending by price. Nothing is above the
+    // best bid or below the best offer, so the walks stop there. (Splitting at
+    // the mid instead dropped levels from crossed books and listed the offer
+    // of a locked book as a bid.)
+    for (int i = bid_levels.live_at_or_above(0); i >= 0 && i <= ob.best_bid_index(); i = bid_levels.live_at_or_above(i + 1))
+        bids.emplace_back(i * tick, bid_levels.get(i));
+    for (int i = ob.best_offer_index(); i >= 0; i = offer_levels.live_at_or_above(i + 1))
+        offers.emplace_back(i * tick, offer_levels.get(i));
     return {bids, offers};
 }
 
+bool ServerStateCPP::get_depth(int handle, int levels, double* bids, int& n_bids, double* offers, int& n_offers) const {
+    n_bids = n_offers = 0;
+    const BookSlot* slot = slot_at(handle);
+    if (!slot) return false;
+    SharedLock guard(slot->lock);
+    if (!slot->book) return false;
+    n_bids = slot->book->depth('b', levels, bids);
+    n_offers = slot->book->depth('o', levels, offers);
+    return true;
+}
+
+bool ServerStateCPP::get_bbo(int handle, double* out) const {
+    out[0] = out[1] = out[2] = out[3] = std::numeric_limits<double>::quiet_NaN();
+    const BookSlot* slot = slot_at(handle);
+    if (!slot) return false;
+    SharedLock guard(slot->lock);
+    if (!slot->book) return false;
+    slot->book->best_bid(out[0], out[1]);
+    slot->book->best_offer(out[2], out[3]);
+    return true;
+}
+
+void ServerStateCPP::get_bbo(const int* handles, std::size_t n, double* out) const {
+    for (std::size_t k = 0; k < n; ++k) get_bbo(handles[k], out + 4 * k);
+}
+
+std::pair<std::vector<LOBEntry>, std::vector<LOBEntry>>
+ServerStateCPP::get_market(const std::string& exchange_id,
+                           const std::string& market_id) const {
+    return get_market(find_handle(exchange_id, market_id));
+}
+
+bool ServerStateCPP::book_ladders(int handle,
+                                  std::shared_ptr<const OrderBookCore::Ladder>& bids,
+                                  std::shared_ptr<const OrderBookCore::Ladder>& offers,
+                                  double& tick_size) const {
+    const BookSlot* slot = slot_at(handle);
+    if (!slot) return false;
+    SharedLock guard(slot->lock);
+    if (!slot->book) return false;
+    bids = slot->book->bid_ladder();
+    offers = slot->book->offer_ladder();
+    tick_size = slot->book->tick_size();
+    return true;
+}
+
+void ServerStateCPP::set_tick_size(int handle, double new_tick_size) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
+    {
+        ExclusiveLock guard(slot->lock);
+        if (!slot->book) return;
+        slot->book->set_tick_size(new_tick_size);
+        if (ShmBookWriter* w = shm()) w->publish_book(handle, *slot->book);
+        group_reload(handle, slot);
+    }
+    mark_dirty(handle, slot);
+}
+
 void ServerStateCPP::set_tick_size(const std::string& exchange_id,
                                    const std::string& market_id,
                                    double new_tick_size) {
-    const std::string k = make_key(exchange_id, market_id);
-    auto it = books_.find(k);
-    if (it == books_.end()) return;
-    it->second.set_tick_size(new_tick_size);
-}
\ No newline at end of file
+    set_tick_size(find_handle(exchange_id, market_id), new_tick_size);
+}
+
+std::vector<int> ServerStateCPP::drain_dirty() {
+    std::vector<int> out;
+    {
+        ExclusiveLock guard(dirty_lock_);
+        out.swap(dirty_);
+    }
+    // Cleared after the swap: a writer that still sees its flag set has
+    // finished its write, so the caller's read of the book will include it.
+    for (std::size_t i = 0; i < out.size(); ++i)
+        slot_at(out[i])->dirty.store(false, std::memory_order_release);
+    return out;
+}
+
+void ServerStateCPP::enable_shm(const std::string& name, uint32_t max_books, uint32_t ladder_capacity) {
+    ExclusiveLock registry(registry_lock_);
+    if (shm()) throw std::logic_error("shared memory is already enabled");
+    std::unique_ptr<ShmBookWriter> w(new ShmBookWriter(name, max_books, ladder_capacity));
+    // Mirror what exists so far; new handles are added by register_book.
+    const int n = num_books_.load(std::memory_order_acquire);
+    for (int h = 0; h < n; ++h) {
+        w->add_book(h, keys_[h].first, keys_[h].second);
+        BookSlot* slot = slot_at(h);
+        ExclusiveLock guard(slot->lock);
+        if (slot->book) w->publish_book(h, *slot->book);
+    }
+    shm_.store(w.release(), std::memory_order_release);
+}
+
+std::string ServerStateCPP::shm_name() const {
+    const ShmBookWriter* w = shm();
+    return w ? w->name() : std::string();
+}
+
+bool ServerStateCPP::kalshi_sequence(int stream, int sid, long long seq, int handle, bool snapshot,
+                                     std::vector<int>& gapped) {
+    BookSlot* slot = slot_at(handle);
+    const long long key = (static_cast<long long>(stream) << 32) | static_cast<uint32_t>(sid);
+    ExclusiveLock guard(seq_lock_);
+    SidSequence& sq = sid_seq_[key];
+    if (slot && std::find(sq.books.begin(), sq.books.end(), handle) == sq.books.end())
+        sq.books.push_back(handle);
+    if (snapshot) {
+        sq.last = seq;
+        return true;
+    }
+    if (sq.last != 0 && seq <= sq.last) {
+        ++seq_duplicates_;
+        return false;
+    }
+    if (sq.last != 0 && seq != sq.last + 1) {
+        ++seq_gaps_;
+        for (std::size_t i = 0; i < sq.books.size(); ++i) {
+            BookSlot* b = slot_at(sq.books[i]);
+            if (!b->stale.exchange(true)) {
+                ++seq_stale_marks_;
+                gapped.push_back(sq.books[i]);
+            }
+        }
+        sq.last = seq;
+        return false;
+    }
+    sq.last = seq;
+    return !(slot && slot->stale.load(std::memory_order_acquire));
+}
+
+void ServerStateCPP::reset_kalshi_sequence(int stream) {
+    ExclusiveLock guard(seq_lock_);
+    for (auto it = sid_seq_.begin(); it != sid_seq_.end();) {
+        if ((it->first >> 32) == stream) it = sid_seq_.erase(it);
+        else ++it;
+    }
+}
+
+void ServerStateCPP::kalshi_sequence_stats(uint64_t& gaps, uint64_t& stale_marks, uint64_t& duplicates) const {
+    ExclusiveLock guard(seq_lock_);
+    gaps = seq_gaps_;
+    stale_marks = seq_stale_marks_;
+    duplicates = seq_duplicates_;
+}
+
+void ServerStateCPP::mark_stale(int handle) {
+    BookSlot* slot = slot_at(handle);
+    if (slot) slot->stale.store(true, std::memory_order_release);
+}
+
+bool ServerStateCPP::is_stale(int handle) const {
+    const BookSlot* slot = slot_at(handle);
+    return slot && slot->stale.load(std::memory_order_acquire);
+}
+
+GroupBook* ServerStateCPP::find_group(int group_id) const {
+    SharedLock guard(groups_lock_);
+    auto it = groups_.find(group_id);
+    return it == groups_.end() ? nullptr : it->second.get();
+}
+
+void ServerStateCPP::add_to_group(int group_id, int handle, char pred) {
+    if (pred != 'y' && pred != 'n') throw std::invalid_argument("pred must be 'y' or 'n'");
+    BookSlot* slot = slot_at(handle);
+    if (!slot) throw std::out_of_range("unknown book handle");
+    GroupBook* group = find_group(group_id);
+    if (!group) {
+        ExclusiveLock guard(groups_lock_);
+        std::unique_ptr<GroupBook>& g = groups_[group_id];
+        if (!g) g.reset(new GroupBook(group_id, &spreads_));
+        group = g.get();
+    }
+    ExclusiveLock guard(slot->lock);
+    if (slot->group && slot->group != group)
+        throw std::invalid_argument("book " + std::to_string(handle) + " is already in group " +
+                                    std::to_string(slot->group->id()));
+    slot->group = group;
+    slot->group_pred = pred;
+    group->add_member(handle, pred);
+    group->load(handle, pred, slot->book.get());
+}
+
+void ServerStateCPP::remove_from_group(int handle) {
+    BookSlot* slot = slot_at(handle);
+    if (!slot) return;
+    ExclusiveLock guard(slot->lock);
+    if (!slot->group) return;
+    slot->group->remove_member(handle);
+    slot->group = nullptr;
+}
+
+int ServerStateCPP::book_group(int handle, char& pred) const {
+    const BookSlot* slot = slot_at(handle);
+    if (!slot) return -1;
+    SharedLock guard(slot->lock);
+    if (!slot->group) return -1;
+    pred = slot->group_pred;
+    return slot->group->id();
+}
+
+std::vector<std::pair<int, char> > ServerStateCPP::group_members(int group_id) const {
+    const GroupBook* group = find_group(group_id);
+    return group ? group->members() : std::vector<std::pair<int, char> >();
+}
+
+bool ServerStateCPP::get_group_depth(int group_id, int levels,
+                                     std::vector<GroupBook::DepthLevel>& bids,
+                                     std::vector<GroupBook::DepthLevel>& offers) const {
+    const GroupBook* group = find_group(group_id);
+    if (!group) return false;
+    group->depth(levels, bids, offers);
+    return true;
+}
+
+bool ServerStateCPP::get_group_bbo(int group_id, double* out) const {
+    const GroupBook* group = find_group(group_id);
+    if (!group) {
+        out[0] = out[1] = out[2] = out[3] = std::numeric_limits<double>::quiet_NaN();
+        return false;
+    }
+    group->bbo(out);
+    return true;
+}
+
+void ServerStateCPP::get_group_bbo(const int* group_ids, std::size_t n, double* out) const {
+    for (std::size_t k = 0; k < n; ++k) get_group_bbo(group_ids[k], out + 4 * k);
+}
+
+std::vector<GroupSpread> ServerStateCPP::top_spreads(int k) const { return spreads_.top(k); }
+
+bool ServerStateCPP::get_spread(int group_id, GroupSpread& out) const { return spreads_.get(group_id, out); }
+
+std::size_t ServerStateCPP::num_spreads() const { return spreads_.size(); }
+
+std::vector<int> ServerStateCPP::drain_spread_changes() { return spreads_.drain_changed(); }
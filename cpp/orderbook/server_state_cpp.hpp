@@ -3,26 +3,98 @@
 #include <string>
 #include <vector>
 #include <utility>
+#include <cstddef>
+#include <cstdint>
+#include <memory>
+#include <atomic>
 #include "orderbook_core.hpp"
+#include "rw_spinlock.hpp"
+#include "shm_books.hpp"
+#include "group_book.hpp"
 
+// One record of a batched update (see ServerStateCPP::apply_batch). Exposed to
+// Python as the structured dtype orderbook_ext.BOOK_UPDATE_DTYPE.
+struct BookUpdate {
+    uint32_t book;      // handle from ServerStateCPP::register_book
+    char pred[1];       // 'y' or 'n'
+    char side[1];       // 'b' or 'o'
+    bool is_delta;
+    bool in_ticks;      // price is a ladder index (see update_order_book_ticks)
+    double price;
+    double quantity;
+};
+
+// A level by ladder index: (index, quantity), price = index * tick_size.
+typedef std::pair<int, double> TickLevel;
+
+// A message the native feed parser did not apply: its type (kalshi) or
+// event_type (polymarket), and its raw JSON for Python to handle.
+struct RawMessage {
+    std::string kind;
+    std::string raw;
+    RawMessage(const std::string& k, const std::string& r) : kind(k), raw(r) {}
+};
+
+// Thread-safe: every method may be called concurrently from any thread.
+// Registration takes a registry lock; book access is per book, behind a
+// reader/writer lock, so ingest threads writing different books and readers
+// of other books never contend. Handles index a chunked slot table that is
+// never moved, so handle lookups take no lock at all.
 class ServerStateCPP {
 public:
-    ServerStateCPP() = default;
+    ServerStateCPP();
+    ~ServerStateCPP();
+
+    // Intern (exchange, market) as a dense integer handle. Idempotent; the
+    // handle stays valid for the life of the state. Every string-keyed method
+    // below is a thin wrapper that resolves the handle and calls the
+    // handle-keyed overload.
+    int register_book(const std::string& exchange_id,
+                      const std::string& market_id);
+
+    // Handle for (exchange, market), or -1 if it was never registered.
+    int find_handle(const std::string& exchange_id,
+                    const std::string& market_id) const;
+
+    // (exchange, market) a handle was registered with.
+    std::pair<std::string, std::string> book_key(int handle) const;
+
+    // Number of registered handles; valid handles are [0, num_books()).
+    int num_books() const;
 
     // Initialize or replace a book for (exchange, market)
+    void init_order_book(int handle,
+                         const std::vector<LOBEntry>& bids,
+                         const std::vector<LOBEntry>& offers);
     void init_order_book(const std::string& exchange_id,
                          const std::string& market_id,
                          const std::vector<LOBEntry>& bids,
                          const std::vector<LOBEntry>& offers);
 
+    // Free a book's contents. The handle stays registered (so handles held
+    // elsewhere stay valid) and reads as uninitialized until the next
+    // init_order_book; it is also dropped from kalshi sequence tracking.
+    void remove_order_book(int handle);
+    void remove_order_book(const std::string& exchange_id,
+                           const std::string& market_id);
+
     // Update book levels (handles pred 'y'/'n' semantics)
-    void update_order_book(const std::string& exchange_id,
-                           const std::string& market_id,
+    void update_order_book(int handle,
                            char pred,           // 'y' or 'n'
                            char side,           // 'b' or 'o'
                            const LOBEntry& data,
                            bool is_delta = false);
-
+    void update_order_book(int handle,
+                           char pred,
+                           char side,
+                           const std::vector<LOBEntry>& entries,
+                           bool is_delta = false);
+    void update_order_book(const std::string& exchange_id,
+                           const std::string& market_id,
+                           char pred,
+                           char side,
+                           const LOBEntry& data,
+                           bool is_delta = false);
     void update_order_book(const std::string& exchange_id,
                            const std::string& market_id,
                            char pred,
@@ -30,20 +102,187 @@ public:
                            const std::vector<LOBEntry>& entries,
                            bool is_delta = false);
 
-    // Get nonzero bids/offers as price/qty pairs
+    // Integer tick API. The same as init_order_book / update_order_book, but
+    // levels are ladder indices (price = index * tick_size) rather than
+    // prices, so nothing is divided or rounded on the way in. A new book has
+    // the default 0.01 tick, where the index is the price in cents, as kalshi
+    // sends it. init takes a binary market's two bid ladders: yes levels are
+    // bids at their index, no levels are offers at N - index, where N is the
+    // top index (1 / tick_size). update flips pred 'n' the same way.
+    void init_order_book_ticks(int handle,
+                               const std::vector<TickLevel>& yes,
+                               const std::vector<TickLevel>& no);
+    void update_order_book_ticks(int handle,
+                                 char pred,
+                                 char side,
+                                 int tick,
+                                 double quantity,
+                                 bool is_delta = false);
+    void update_order_book_ticks(int handle,
+                                 char pred,
+                                 char side,
+                                 const std::vector<TickLevel>& levels,
+                                 bool is_delta = false);
+
+    // Apply n single-level updates in order with one call. records[i].book is
+    // a handle from register_book. Updates for handles that are unknown or not
+    // yet initialized are skipped, same as update_order_book.
+    void apply_batch(const BookUpdate* records, std::size_t n);
+
+    // Parse one raw websocket frame and apply it directly: kalshi snapshots
+    // and deltas; polymarket books, price changes and tick size changes.
+    // Returns the messages it did not apply, in order. Throws
+    // std::invalid_argument on malformed JSON. (feed_ingest.cpp)
+    // `stream` names the connection the kalshi frame came from (see
+    // kalshi_sequence).
+    std::vector<RawMessage> ingest_kalshi(const char* data, std::size_t n, int stream = 0);
+    std::vector<RawMessage> ingest_polymarket(const char* data, std::size_t n);
+
+    // Every live (nonzero) bid and offer as price/qty pairs, each side
+    // ascending by price.
+    std::pair<std::vector<LOBEntry>, std::vector<LOBEntry>>
+    get_market(int handle) const;
     std::pair<std::vector<LOBEntry>, std::vector<LOBEntry>>
     get_market(const std::string& exchange_id,
                const std::string& market_id) const;
 
+    // Up to `levels` levels of each side, best first, walking out from the
+    // best bid and offer. bids / offers receive n_bids / n_offers (price,
+    // quantity) pairs and must hold 2 * levels doubles. False if absent.
+    bool get_depth(int handle, int levels, double* bids, int& n_bids, double* offers, int& n_offers) const;
+
+    // Best bid and offer into out[0..4): bid price, bid qty, offer price,
+    // offer qty, NaN for an empty side. False (all NaN) if the book is absent.
+    bool get_bbo(int handle, double* out) const;
+    // get_bbo of n books in one call, into out[4 * n].
+    void get_bbo(const int* handles, std::size_t n, double* out) const;
+
+    // The ladders of a book: live storage for dense sides, a copy for sparse
+    // ones (see OrderBookCore::bid_ladder). Reads through live ones are not
+    // synchronized with writers; use get_market for a consistent copy.
+    // False if absent.
+    bool book_ladders(int handle,
+                      std::shared_ptr<const OrderBookCore::Ladder>& bids,
+                      std::shared_ptr<const OrderBookCore::Ladder>& offers,
+                      double& tick_size) const;
+
     // Change tick size of an existing book
+    void set_tick_size(int handle, double new_tick_size);
     void set_tick_size(const std::string& exchange_id,
                        const std::string& market_id,
                        double new_tick_size);
 
+    // Handles of books changed since the last call (init, level updates,
+    // tick size changes, removal), each once, in first-changed order. Meant for a
+    // single consumer that then reads those books (e.g. the client socket
+    // server); a change racing with the drain is reported now or next time.
+    std::vector<int> drain_dirty();
+
+    // Kalshi sequence tracking. seq counts messages per subscription (sid),
+    // so a jump means a lost message on that sid for one of its books. sids
+    // are per connection, so state is kept per (stream, sid), where stream
+    // identifies the connection.
+    // Call for every orderbook snapshot/delta, in arrival order; returns
+    // whether to apply it. A snapshot resets the sid's expected seq and
+    // clears its book's stale flag (via init_order_book). A delta is skipped
+    // if it is old (seq already seen) or its book is stale. On a gap, every
+    // book seen on the sid is marked stale and appended to `gapped`; they
+    // stay stale, ignoring deltas, until their next snapshot.
+    bool kalshi_sequence(int stream, int sid, long long seq, int handle, bool snapshot,
+                         std::vector<int>& gapped);
+    // Forget the sids of `stream`, e.g. when its connection is replaced.
+    void reset_kalshi_sequence(int stream);
+    // (gaps, stale marks, duplicate/old messages skipped) so far
+    void kalshi_sequence_stats(uint64_t& gaps, uint64_t& stale_marks, uint64_t& duplicates) const;
+
+    // A stale book's contents are known to be missing updates.
+    void mark_stale(int handle);
+    bool is_stale(int handle) const;
+
+    // Mirror every book into the POSIX shared memory object `name` for
+    // lock-free readers in other processes (ShmBookReader,
+    // server/shm_reader.py). Slots hold up to `ladder_capacity` levels per
+    // side (1/tick_size + 1); larger books are marked unmirrored. Call once,
+    // before the state is fed from other threads. The object is unlinked
+    // when the state is destroyed.
+    void enable_shm(const std::string& name,
+                    uint32_t max_books = 1024,
+                    uint32_t ladder_capacity = 10001);
+    // Name of the shared memory object, or "" if not enabled.
+    std::string shm_name() const;
+
+    // Cross-venue groups: equivalent markets on different exchanges merged
+    // into one consolidated GroupBook, kept current as their books change.
+    // add_to_group puts a book in group `group_id` (created on first use);
+    // pred 'n' means the book's yes is the group's no. A book is in at most
+    // one group: moving it elsewhere throws std::invalid_argument, call
+    // remove_from_group first. Membership outlives init / remove_order_book.
+    void add_to_group(int group_id, int handle, char pred = 'y');
+    void remove_from_group(int handle);
+    // Group of a book and its pred, or -1 if it is in none.
+    int book_group(int handle, char& pred) const;
+    // Members of a group as (handle, pred); empty if unknown.
+    std::vector<std::pair<int, char> > group_members(int group_id) const;
+    // Up to `levels` consolidated levels of each side, best first, with the
+    // quantity each member book contributes. False if the group is unknown.
+    bool get_group_depth(int group_id, int levels,
+                         std::vector<GroupBook::DepthLevel>& bids,
+                         std::vector<GroupBook::DepthLevel>& offers) const;
+    // Consolidated best bid and offer, as get_bbo. False (all NaN) if the
+    // group is unknown.
+    bool get_group_bbo(int group_id, double* out) const;
+    // get_group_bbo of n groups in one call, into out[4 * n].
+    void get_group_bbo(const int* group_ids, std::size_t n, double* out) const;
+
+    // Cross-venue spreads (GroupSpread): per group, the best bid of one member
+    // book against the best offer of another. Recomputed only when a member's
+    // best bid or offer moves, and kept ordered by edge. A group has one while
+    // two different books quote opposite sides.
+    // Up to k spreads, largest edge first.
+    std::vector<GroupSpread> top_spreads(int k) const;
+    bool get_spread(int group_id, GroupSpread& out) const;
+    std::size_t num_spreads() const;
+    // Groups whose spread changed or went away since the last call, each
+    // once; like drain_dirty, for a single consumer.
+    std::vector<int> drain_spread_changes();
+
 private:
-    static inline std::string make_key(const std::string& ex, const std::string& mar) {
-        return ex + "|" + mar;
+    ServerStateCPP(const ServerStateCPP&);
+    ServerStateCPP& operator=(const ServerStateCPP&);
+
+    struct BookSlot {
+        mutable RWSpinLock lock;
+        std::unique_ptr<OrderBookCore> book; // null until initialized
+        std::atomic<bool> dirty;             // queued in dirty_
+        std::atomic<bool> stale;             // missed updates; cleared by init
+        GroupBook* group;                    // null if in no group; set under lock
+        char group_pred;
+        BookSlot() : dirty(false), stale(false), group(nullptr), group_pred('y') {}
+    };
+
+    static const int kChunkBits = 10;
+    static const int kChunkSize = 1 << kChunkBits;
+    static const int kMaxChunks = 1024; // up to ~1M books
+
+    inline BookSlot* slot_at(int handle) const {
+        if (handle < 0 || handle >= num_books_.load(std::memory_order_acquire)) return nullptr;
+        return &chunks_[handle >> kChunkBits].load(std::memory_order_acquire)[handle & (kChunkSize - 1)];
     }
+    // Call after the write, outside the book lock.
+    inline void mark_dirty(int handle, BookSlot* slot) {
+        if (slot->dirty.load(std::memory_order_relaxed) || slot->dirty.exchange(true)) return;
+        ExclusiveLock guard(dirty_lock_);
+        dirty_.push_back(handle);
+    }
+    inline ShmBookWriter* shm() const { return shm_.load(std::memory_order_acquire); }
+    // Keep the book's group in step; call under the book's exclusive lock.
+    static inline void group_level(int handle, const BookSlot* slot, char side, int i) {
+        if (slot->group) slot->group->level_changed(handle, slot->group_pred, *slot->book, side, i);
+    }
+    static inline void group_reload(int handle, const BookSlot* slot) {
+        if (slot->group) slot->group->load(handle, slot->group_pred, slot->book.get());
+    }
+    GroupBook* find_group(int group_id) const;
     static inline void apply_pred_flip(char pred, char& side, double& price) {
         // Internally everything is from the "yes" perspective.
         if (pred == 'n') {
@@ -53,8 +292,50 @@ private:
         }
     }
 
+    static inline void apply_pred_flip(char pred, char& side, int& index, const OrderBookCore& book) {
+        if (pred == 'n') {
+            index = book.num_levels() - 1 - index;
+            if (side == 'b') side = 'o';
+            else             side = 'b';
+        }
+    }
+
     // Defaults to 1 cent tick unless changed by a tick_size_change message
     static constexpr double kDefaultTick = 0.01;
 
-    std::unordered_map<std::string, OrderBookCore> books_;
+    // Guards handles_ and keys_.
+    mutable RWSpinLock registry_lock_;
+    // exchange -> market -> handle. Nested so lookups hash the two ids as
+    // given instead of building an "exchange|market" key per call.
+    std::unordered_map<std::string, std::unordered_map<std::string, int>> handles_;
+    std::vector<std::pair<std::string, std::string>> keys_;
+    // Slots indexed by handle, allocated kChunkSize at a time. A chunk is
+    // published before num_books_ covers it.
+    std::atomic<BookSlot*> chunks_[kMaxChunks];
+    std::atomic<int> num_books_;
+
+    RWSpinLock dirty_lock_;
+    std::vector<int> dirty_;
+
+    // Kalshi sequence state per subscription id, under seq_lock_.
+    struct SidSequence {
+        long long last;
+        std::vector<int> books; // books seen on this sid
+        SidSequence() : last(0) {}
+    };
+    mutable RWSpinLock seq_lock_;
+    std::unordered_map<long long, SidSequence> sid_seq_; // (stream << 32) | sid
+    uint64_t seq_gaps_;
+    uint64_t seq_stale_marks_;
+    uint64_t seq_duplicates_;
+
+    // Shared memory mirror, written under each book's lock. Owned.
+    std::atomic<ShmBookWriter*> shm_;
+
+    // Written by the group books, so declared (and destroyed) around them.
+    SpreadIndex spreads_;
+    // group id -> consolidated book, under groups_lock_. Groups are never
+    // freed before the state, so BookSlot::group and found pointers stay valid.
+    mutable RWSpinLock groups_lock_;
+    std::unordered_map<int, std::unique_ptr<GroupBook> > groups_;
 };
\ No newline at end of file
@@ -0,0 +1,273 @@
+#include "shm_books.hpp"
+#include <chrono>
+#include <cstring>
+#include <stdexcept>
+#include <thread>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+namespace {
+
+std::string shm_path(const std::string& name) {
+    return name.empty() || name[0] != '/' ? "/" + name : name;
+}
+
+std::size_t slot_bytes_for(uint32_t capacity) {
+    const std::size_t raw = kShmSlotHeaderBytes + 2 * sizeof(double) * capacity;
+    return (raw + 63) & ~static_cast<std::size_t>(63);
+}
+
+// Seqlock write side: seq is odd while the slot is being written.
+struct SeqWrite {
+    explicit SeqWrite(ShmSlot* s) : s_(s) {
+        s_->seq.store(s_->seq.load(std::memory_order_relaxed) + 1, std::memory_order_relaxed);
+        std::atomic_thread_fence(std::memory_order_release);
+    }
+    ~SeqWrite() { s_->seq.store(s_->seq.load(std::memory_order_relaxed) + 1, std::memory_order_release); }
+    ShmSlot* s_;
+};
+
+} // namespace
+
+ShmBookWriter::ShmBookWriter(const std::string& name, uint32_t max_books, uint32_t ladder_capacity)
+    : name_(shm_path(name)), size_(0), base_(nullptr), header_(nullptr),
+      capacity_(ladder_capacity), slot_bytes_(static_cast<uint32_t>(slot_bytes_for(ladder_capacity))) {
+    size_ = kShmHeaderBytes + static_cast<std::size_t>(max_books) * slot_bytes_;
+    const int fd = shm_open(name_.c_str(), O_CREAT | O_RDWR | O_TRUNC, 0644);
+    if (fd < 0) throw std::runtime_error("shm_open failed for " + name_);
+    if (ftruncate(fd, static_cast<off_t>(size_)) != 0) {
+        close(fd);
+        shm_unlink(name_.c_str());
+        throw std::runtime_error("could not size shared memory " + name_);
+    }
+    void* p = mmap(nullptr, size_, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (p == MAP_FAILED) {
+        shm_unlink(name_.c_str());
+        throw std::runtime_error("mmap failed for " + name_);
+    }
+    // ftruncate zero-fills, so every slot starts at seq 0 with n_levels 0.
+    base_ = static_cast<char*>(p);
+    header_ = reinterpret_cast<ShmHeader*>(base_);
+    header_->version = kShmVersion;
+    header_->max_books = max_books;
+    header_->ladder_capacity = ladder_capacity;
+    header_->slot_bytes = slot_bytes_;
+    header_->num_books.store(0, std::memory_order_relaxed);
+    std::atomic_thread_fence(std::memory_order_release);
+    header_->magic = kShmMagic; // last: readers check it first
+    mirrored_.assign(max_books, 0);
+}
+
+ShmBookWriter::~ShmBookWriter() {
+    munmap(base_, size_);
+    shm_unlink(name_.c_str());
+}
+
+ShmSlot* ShmBookWriter::slot(int handle) {
+    if (handle < 0 || handle >= static_cast<int>(mirrored_.size()) || !mirrored_[handle]) return nullptr;
+    return reinterpret_cast<ShmSlot*>(base_ + kShmHeaderBytes + static_cast<std::size_t>(handle) * slot_bytes_);
+}
+
+void ShmBookWriter::add_book(int handle, const std::string& exchange_id, const std::string& market_id) {
+    if (handle < 0 || handle >= static_cast<int>(mirrored_.size())) return;
+    ShmSlot* s = reinterpret_cast<ShmSlot*>(base_ + kShmHeaderBytes + static_cast<std::size_t>(handle) * slot_bytes_);
+    if (exchange_id.size() + market_id.size() <= kShmKeyBytes) {
+        std::memcpy(s->key, exchange_id.data(), exchange_id.size());
+        std::memcpy(s->key + exchange_id.size(), market_id.data(), market_id.size());
+        s->exchange_len = static_cast<uint16_t>(exchange_id.size());
+        s->market_len = static_cast<uint16_t>(market_id.size());
+        mirrored_[handle] = 1;
+    }
+    header_->num_books.store(static_cast<uint32_t>(handle + 1), std::memory_order_release);
+}
+
+void ShmBookWriter::publish_book(int handle, const OrderBookCore& book) {
+    ShmSlot* s = slot(handle);
+    if (!s) return;
+    const int n = book.num_levels();
+    SeqWrite w(s);
+    s->tick_size = book.tick_size();
+    s->best_bid = book.best_bid_index();
+    s->best_offer = book.best_offer_index();
+    if (static_cast<uint32_t>(n) > capacity_) {
+        s->n_levels = -1;
+        return;
+    }
+    s->n_levels = static_cast<int32_t>(n);
+    book.bid_levels().copy_to(s->bids());
+    book.offer_levels().copy_to(s->bids() + capacity_);
+}
+
+void ShmBookWriter::publish_level(int handle, const OrderBookCore& book, char side, int i) {
+    ShmSlot* s = slot(handle);
+    if (!s || s->n_levels <= 0) return;
+    if (i < 0 || i >= s->n_levels) return;
+    const double qty = side == 'b' ? book.bid_quantity(i) : book.offer_quantity(i);
+    SeqWrite w(s);
+    if (side == 'b') s->bids()[i] = qty;
+    else s->bids()[capacity_ + i] = qty;
+    s->best_bid = book.best_bid_index();
+    s->best_offer = book.best_offer_index();
+}
+
+void ShmBookWriter::clear_book(int handle) {
+    ShmSlot* s = slot(handle);
+    if (!s) return;
+    SeqWrite w(s);
+    s->n_levels = 0;
+    s->best_bid = -1;
+    s->best_offer = -1;
+}
+
+ShmBookReader::ShmBookReader(const std::string& name, double timeout)
+    : size_(0), base_(nullptr), header_(nullptr), capacity_(0), slot_bytes_(0), timeout_(timeout), indexed_(0) {
+    const std::string path = shm_path(name);
+    const int fd = shm_open(path.c_str(), O_RDONLY, 0);
+    if (fd < 0) throw std::runtime_error("no shared memory named " + path);
+    struct stat st;
+    if (fstat(fd, &st) != 0 || static_cast<std::size_t>(st.st_size) < kShmHeaderBytes) {
+        close(fd);
+        throw std::runtime_error("shared memory " + path + " is not a book region");
+    }
+    size_ = static_cast<std::size_t>(st.st_size);
+    void* p = mmap(nullptr, size_, PROT_READ, MAP_SHARED, fd, 0);
+    close(fd);
+    if (p == MAP_FAILED) throw std::runtime_error("mmap failed for " + path);
+    base_ = static_cast<const char*>(p);
+    header_ = reinterpret_cast<const ShmHeader*>(base_);
+    if (header_->magic != kShmMagic || header_->version != kShmVersion) {
+        munmap(const_cast<char*>(base_), size_);
+        throw std::runtime_error("shared memory " + path + " is not a book region (or a different version)");
+    }
+    capacity_ = header_->ladder_capacity;
+    slot_bytes_ = header_->slot_bytes;
+}
+
+// Seqlock read side: run `copy` until it saw a stable, even seq. A write takes
+// microseconds, so past a few spins the writer is descheduled or gone: yield,
+// then sleep, and give up at the timeout rather than spin forever.
+template <class F>
+void ShmBookReader::seq_read(int handle, const ShmSlot* s, F copy) const {
+    std::chrono::steady_clock::time_point deadline;
+    for (unsigned spins = 0;; ++spins) {
+        const uint64_t before = s->seq.load(std::memory_order_acquire);
+        if ((before & 1) == 0) {
+            copy();
+            std::atomic_thread_fence(std::memory_order_acquire);
+            if (s->seq.load(std::memory_order_relaxed) == before) return;
+        }
+        if (spins < 64) continue;
+        const std::chrono::steady_clock::time_point now = std::chrono::steady_clock::now();
+        if (spins == 64) {
+            deadline = now + std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                std::chrono::duration<double>(timeout_));
+        } else if (now >= deadline) {
+            throw ShmReadTimeout("book " + std::to_string(handle) + " stayed mid-write past the read timeout "
+                                 "(did the writer die?)");
+        }
+        if (spins < 1024) std::this_thread::yield();
+        else std::this_thread::sleep_for(std::chrono::microseconds(50));
+    }
+}
+
+ShmBookReader::~ShmBookReader() { munmap(const_cast<char*>(base_), size_); }
+
+int ShmBookReader::num_books() const {
+    return static_cast<int>(header_->num_books.load(std::memory_order_acquire));
+}
+
+const ShmSlot* ShmBookReader::slot(int handle) const {
+    if (handle < 0 || handle >= num_books()) return nullptr;
+    return reinterpret_cast<const ShmSlot*>(base_ + kShmHeaderBytes + static_cast<std::size_t>(handle) * slot_bytes_);
+}
+
+std::pair<std::string, std::string> ShmBookReader::key(int handle) const {
+    const ShmSlot* s = slot(handle);
+    if (!s) throw std::out_of_range("unknown book handle");
+    return std::make_pair(std::string(s->key, s->exchange_len),
+                          std::string(s->key + s->exchange_len, s->market_len));
+}
+
+int ShmBookReader::find(const std::string& exchange_id, const std::string& market_id) {
+    std::lock_guard<std::mutex> guard(index_lock_);
+    const int n = num_books();
+    for (; indexed_ < n; ++indexed_) {
+        const ShmSlot* s = slot(indexed_);
+        if (s->exchange_len + s->market_len == 0) continue; // not mirrored
+        std::string k(s->key, s->exchange_len);
+        k.push_back('\0');
+        k.append(s->key + s->exchange_len, s->market_len);
+        index_[k] = indexed_;
+    }
+    std::string k = exchange_id;
+    k.push_back('\0');
+    k.append(market_id);
+    auto it = index_.find(k);
+    return it == index_.end() ? -1 : it->second;
+}
+
+uint64_t ShmBookReader::version(int handle) const {
+    const ShmSlot* s = slot(handle);
+    return s ? s->seq.load(std::memory_order_acquire) : 0;
+}
+
+bool ShmBookReader::top_of_book(int handle, bool& has_bid, double& bid_price, double& bid_qty,
+                                bool& has_offer, double& offer_price, double& offer_qty) const {
+    const ShmSlot* s = slot(handle);
+    if (!s) return false;
+    bool ok = false;
+    seq_read(handle, s, [&]() {
+        ok = s->n_levels > 0;
+        if (!ok) return;
+        const double tick = s->tick_size;
+        const int b = s->best_bid, o = s->best_offer;
+        const int n = s->n_levels;
+        has_bid = b >= 0 && b < n;
+        has_offer = o >= 0 && o < n;
+        bid_price = has_bid ? b * tick : 0.0;
+        bid_qty = has_bid ? s->bids()[b] : 0.0;
+        offer_price = has_offer ? o * tick : 0.0;
+        offer_qty = has_offer ? s->bids()[capacity_ + o] : 0.0;
+    });
+    return ok;
+}
+
+bool ShmBookReader::depth(int handle, int levels, std::vector<LOBEntry>& bids, std::vector<LOBEntry>& offers) const {
+    const ShmSlot* s = slot(handle);
+    if (!s) return false;
+    bool ok = false;
+    seq_read(handle, s, [&]() {
+        bids.clear();
+        offers.clear();
+        ok = s->n_levels > 0;
+        if (!ok) return;
+        const double tick = s->tick_size;
+        const int n = s->n_levels;
+        const double* b = s->bids();
+        const double* o = b + capacity_;
+        for (int i = std::min(s->best_bid, n - 1); i >= 0 && static_cast<int>(bids.size()) < levels; --i)
+            if (b[i] != 0.0) bids.push_back(LOBEntry(i * tick, b[i]));
+        if (s->best_offer >= 0)
+            for (int i = s->best_offer; i < n && static_cast<int>(offers.size()) < levels; ++i)
+                if (o[i] != 0.0) offers.push_back(LOBEntry(i * tick, o[i]));
+    });
+    return ok;
+}
+
+bool ShmBookReader::ladders(int handle, std::vector<double>& bids, std::vector<double>& offers, double& tick_size) const {
+    const ShmSlot* s = slot(handle);
+    if (!s) return false;
+    bool ok = false;
+    seq_read(handle, s, [&]() {
+        ok = s->n_levels > 0;
+        if (!ok) return;
+        const int n = s->n_levels;
+        tick_size = s->tick_size;
+        bids.assign(s->bids(), s->bids() + n);
+        offers.assign(s->bids() + capacity_, s->bids() + capacity_ + n);
+    });
+    return ok;
+}
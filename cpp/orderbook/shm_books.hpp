@@ -0,0 +1,154 @@
+#pragma once
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <mutex>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+#include "orderbook_core.hpp"
+
+// Shared-memory mirror of ServerState's books for same-host readers.
+//
+// One POSIX shared memory object holds a header and a fixed-size slot per
+// book handle. Each slot holds the book's tick ladders exactly as in
+// OrderBookCore (quantity per index, price = index * tick_size) behind a
+// seqlock: the writer makes `seq` odd, writes, then makes it even again;
+// readers copy what they need and retry if `seq` was odd or moved. Readers
+// never take a lock or make a syscall. server/shm_reader.py reads the same
+// layout from Python.
+//
+// Layout (little-endian, offsets in bytes):
+//
+//   header, 64 bytes
+//     0  u64 magic "PREDMEOB"     8  u32 version
+//    12  u32 max_books           16  u32 ladder_capacity (doubles per ladder)
+//    20  u32 slot_bytes          24  u32 num_books (registered handles)
+//   slot h at 64 + h * slot_bytes
+//     0  u64 seq                  8  f64 tick_size
+//    16  i32 n_levels (ladder length; 0 until initialized or once removed, -1 if it does not fit)
+//    20  i32 best_bid_index      24  i32 best_offer_index (-1 when empty)
+//    28  u16 exchange_len        30  u16 market_len
+//    32  exchange bytes then market bytes (kShmKeyBytes total)
+//   256  f64 bids[ladder_capacity], then f64 offers[ladder_capacity]
+
+static const uint64_t kShmMagic = 0x424f454d44455250ULL; // "PREDMEOB"
+static const uint32_t kShmVersion = 1;
+static const std::size_t kShmHeaderBytes = 64;
+static const std::size_t kShmSlotHeaderBytes = 256;
+static const std::size_t kShmKeyBytes = kShmSlotHeaderBytes - 32;
+
+struct ShmHeader {
+    uint64_t magic;
+    uint32_t version;
+    uint32_t max_books;
+    uint32_t ladder_capacity;
+    uint32_t slot_bytes;
+    std::atomic<uint32_t> num_books;
+};
+
+struct ShmSlot {
+    std::atomic<uint64_t> seq;
+    double tick_size;
+    int32_t n_levels;
+    int32_t best_bid;
+    int32_t best_offer;
+    uint16_t exchange_len;
+    uint16_t market_len;
+    char key[kShmKeyBytes];
+
+    double* bids() { return reinterpret_cast<double*>(reinterpret_cast<char*>(this) + kShmSlotHeaderBytes); }
+    const double* bids() const { return reinterpret_cast<const double*>(reinterpret_cast<const char*>(this) + kShmSlotHeaderBytes); }
+};
+
+// Owned by ServerStateCPP (see enable_shm). Every method for handle h must be
+// called with that book's lock held, so each slot has a single writer.
+class ShmBookWriter {
+public:
+    // Creates (or truncates) the shared memory object `name`; unlinks it on
+    // destruction. Throws std::runtime_error if it cannot be mapped.
+    ShmBookWriter(const std::string& name, uint32_t max_books, uint32_t ladder_capacity);
+    ~ShmBookWriter();
+
+    // Name a slot and count it in num_books. Called once per handle, in
+    // handle order, under the registry lock. Handles past max_books and
+    // keys longer than kShmKeyBytes are not mirrored.
+    void add_book(int handle, const std::string& exchange_id, const std::string& market_id);
+
+    // Copy the whole book (after init or a tick size change).
+    void publish_book(int handle, const OrderBookCore& book);
+    // Copy ladder level `index` on `side` and the top of book.
+    void publish_level(int handle, const OrderBookCore& book, char side, int index);
+    // Mark the slot uninitialized (the book was removed).
+    void clear_book(int handle);
+
+    const std::string& name() const { return name_; }
+
+private:
+    ShmBookWriter(const ShmBookWriter&);
+    ShmBookWriter& operator=(const ShmBookWriter&);
+
+    ShmSlot* slot(int handle);
+
+    std::string name_;
+    std::size_t size_;
+    char* base_;
+    ShmHeader* header_;
+    uint32_t capacity_;
+    uint32_t slot_bytes_;
+    std::vector<char> mirrored_; // per handle; written before the handle is published
+};
+
+// A slot stayed mid-write (or kept changing) for the reader's whole timeout,
+// e.g. because the writing process died inside a write.
+class ShmReadTimeout : public std::runtime_error {
+public:
+    explicit ShmReadTimeout(const std::string& what) : std::runtime_error(what) {}
+};
+
+// Read-only view of a region created by ShmBookWriter, usable from any
+// process. Reads are wait-free for the writer; a reader retries while a slot
+// is being written, spinning briefly, then yielding, then sleeping, and throws
+// ShmReadTimeout once `timeout` seconds pass without a consistent read.
+class ShmBookReader {
+public:
+    explicit ShmBookReader(const std::string& name, double timeout = 1.0);
+    ~ShmBookReader();
+
+    int num_books() const;
+    // Handle for (exchange, market), or -1 if it is not mirrored. Safe to
+    // call from several threads; the cache it fills is behind a mutex.
+    int find(const std::string& exchange_id, const std::string& market_id);
+    std::pair<std::string, std::string> key(int handle) const;
+    // The slot's seqlock counter; it changes whenever the book does.
+    uint64_t version(int handle) const;
+
+    // Consistent top of book. False if the book is not initialized (or not
+    // mirrored); a missing side reads as price and quantity 0 with has_* false.
+    bool top_of_book(int handle, bool& has_bid, double& bid_price, double& bid_qty,
+                     bool& has_offer, double& offer_price, double& offer_qty) const;
+    // Best `levels` non-empty levels per side, best first, as (price, qty).
+    bool depth(int handle, int levels, std::vector<LOBEntry>& bids, std::vector<LOBEntry>& offers) const;
+    // Copies of both ladders.
+    bool ladders(int handle, std::vector<double>& bids, std::vector<double>& offers, double& tick_size) const;
+
+private:
+    ShmBookReader(const ShmBookReader&);
+    ShmBookReader& operator=(const ShmBookReader&);
+
+    const ShmSlot* slot(int handle) const;
+    template <class F> void seq_read(int handle, const ShmSlot* s, F copy) const;
+
+    std::size_t size_;
+    const char* base_;
+    const ShmHeader* header_;
+    uint32_t capacity_;
+    uint32_t slot_bytes_;
+    double timeout_;
+    // (exchange + '\0' + market) -> handle, filled as find() scans new slots
+    std::mutex index_lock_;
+    std::unordered_map<std::string, int> index_;
+    int indexed_;
+};
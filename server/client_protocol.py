@@ -0,0 +1,284 @@
+"""
+Wire format of the local client-server socket (see client_server.py).
+
+Every message is a frame: a little-endian u32 body length, then the body. The
+body starts with a u8 message type; all integers and floats are little-endian,
+strings are utf-8 with a length prefix.
+
+client -> server
+    SUBSCRIBE    u8 ex_len, exchange, u16 mk_len, market
+    UNSUBSCRIBE  same as SUBSCRIBE
+    ADD_MARKET   same as SUBSCRIBE; subscribe the server to the market on the exchange
+    REMOVE_MARKET same as SUBSCRIBE; drop the market from the exchange feed and free its book
+
+server -> client
+    SNAPSHOT     u32 book, f64 tick_size, u64 ts_ns, u8 ex_len, exchange,
+                 u16 mk_len, market, u32 n_bids, u32 n_offers,
+                 (n_bids + n_offers) x (f64 price, f64 quantity)
+    DIFF         u32 book, u64 ts_ns, u32 n, n x (u8 side, f64 price, f64 quantity)
+    UNSUBSCRIBED u32 book
+    OK           u8 request type, u8 changed, u8 ex_len, exchange, u16 mk_len, market
+                 (answers ADD_MARKET / REMOVE_MARKET; changed is 0 if the market
+                 was already added / was not there)
+    ERROR        u16 len, message
+
+`book` is the server's handle for (exchange, market); a SNAPSHOT always
+precedes the first DIFF for a book and names it. Levels are from the 'yes'
+perspective, bids and offers each in ascending price order. DIFF levels carry
+the new absolute quantity (0 means the level is gone), so applying a diff twice
+is harmless. A SNAPSHOT replaces the client's copy of the book: one is sent on
+subscribe, whenever the book's tick size changes, and when the book first
+appears if it was subscribed before the exchange sent it (that first one has
+tick_size 0 and no levels, as is the one sent when the book is removed). `ts_ns` is time.time_ns() when the server built the
+message.
+
+Nothing here depends on orderbook_ext, so clients can use this module alone.
+"""
+import asyncio
+import struct
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+SUBSCRIBE = 1
+UNSUBSCRIBE = 2
+ADD_MARKET = 3
+REMOVE_MARKET = 4
+SNAPSHOT = 16
+DIFF = 17
+UNSUBSCRIBED = 18
+OK = 19
+ERROR = 127
+
+MAX_FRAME = 64 * 1024 * 1024
+
+_LEN = struct.Struct("<I")
+_SNAPSHOT_HEAD = struct.Struct("<BIdQ")
+_DIFF_HEAD = struct.Struct("<BIQI")
+_UNSUBSCRIBED = struct.Struct("<BI")
+_OK_HEAD = struct.Struct("<BBB")
+_COUNTS = struct.Struct("<II")
+
+# One (price, quantity) level of a SNAPSHOT, and one level of a DIFF.
+LEVEL_DTYPE = np.dtype([("price", "<f8"), ("quantity", "<f8")])
+DIFF_DTYPE = np.dtype([("side", "u1"), ("price", "<f8"), ("quantity", "<f8")])  # packed, 17 bytes
+BID, OFFER = ord("b"), ord("o")
+
+
+class Snapshot(NamedTuple):
+    book: int
+    exchange_id: str
+    market_id: str
+    tick_size: float
+    ts_ns: int
+    bids: np.ndarray    # LEVEL_DTYPE
+    offers: np.ndarray  # LEVEL_DTYPE
+
+
+class Diff(NamedTuple):
+    book: int
+    ts_ns: int
+    levels: np.ndarray  # DIFF_DTYPE
+
+
+class Unsubscribed(NamedTuple):
+    book: int
+
+
+class Ok(NamedTuple):
+    request: int  # ADD_MARKET or REMOVE_MARKET
+    changed: bool
+    exchange_id: str
+    market_id: str
+
+
+class Error(NamedTuple):
+    message: str
+
+
+def _frame(body: bytes) -> bytes:
+    return _LEN.pack(len(body)) + body
+
+
+def _key(exchange_id: str, market_id: str) -> bytes:
+    ex, mk = exchange_id.encode(), market_id.encode()
+    return struct.pack("<B", len(ex)) + ex + struct.pack("<H", len(mk)) + mk
+
+
+def _read_key(body: memoryview, off: int) -> Tuple[str, str, int]:
+    # lengths are checked against the body, so a bad frame can't be read as another key
+    if off + 1 > len(body) or off + 3 + body[off] > len(body):
+        raise ValueError("exchange id runs past the end of the frame")
+    n = body[off]
+    ex = bytes(body[off + 1:off + 1 + n]).decode()
+    off += 1 + n
+    (m,) = struct.unpack_from("<H", body, off)
+    if off + 2 + m > len(body):
+        raise ValueError("market id runs past the end of the frame")
+    mk = bytes(body[off + 2:off + 2 + m]).decode()
+    return ex, mk, off + 2 + m
+
+
+def encode_subscribe(exchange_id: str, market_id: str) -> bytes:
+    return _frame(bytes((SUBSCRIBE,)) + _key(exchange_id, market_id))
+
+
+def encode_unsubscribe(exchange_id: str, market_id: str) -> bytes:
+    return _frame(bytes((UNSUBSCRIBE,)) + _key(exchange_id, market_id))
+
+
+def encode_add_market(exchange_id: str, market_id: str) -> bytes:
+    return _frame(bytes((ADD_MARKET,)) + _key(exchange_id, market_id))
+
+
+def encode_remove_market(exchange_id: str, market_id: str) -> bytes:
+    return _frame(bytes((REMOVE_MARKET,)) + _key(exchange_id, market_id))
+
+
+def decode_request(body: bytes) -> Tuple[int, str, str]:
+    """ (request type, exchange_id, market_id) """
+    view = memoryview(body)
+    ex, mk, end = _read_key(view, 1)
+    if end != len(body):
+        raise ValueError("trailing bytes after the market id")
+    return body[0], ex, mk
+
+
+def encode_snapshot(book: int, exchange_id: str, market_id: str, tick_size: float,
+                    bids: np.ndarray, offers: np.ndarray) -> bytes:
+    """ bids/offers are LEVEL_DTYPE arrays """
+    body = b"".join((
+        _SNAPSHOT_HEAD.pack(SNAPSHOT, book, tick_size, time.time_ns()),
+        _key(exchange_id, market_id),
+        _COUNTS.pack(len(bids), len(offers)),
+        bids.tobytes(),
+        offers.tobytes(),
+    ))
+    return _frame(body)
+
+
+def encode_diff(book: int, levels: np.ndarray) -> bytes:
+    """ levels is a DIFF_DTYPE array """
+    return _frame(_DIFF_HEAD.pack(DIFF, book, time.time_ns(), len(levels)) + levels.tobytes())
+
+
+def encode_unsubscribed(book: int) -> bytes:
+    return _frame(_UNSUBSCRIBED.pack(UNSUBSCRIBED, book))
+
+
+def encode_ok(request: int, changed: bool, exchange_id: str, market_id: str) -> bytes:
+    return _frame(_OK_HEAD.pack(OK, request, changed) + _key(exchange_id, market_id))
+
+
+def encode_error(message: str) -> bytes:
+    msg = message.encode()
+    return _frame(struct.pack("<BH", ERROR, len(msg)) + msg)
+
+
+def decode_message(body: bytes) -> Snapshot | Diff | Unsubscribed | Ok | Error:
+    """ decode one server -> client frame body """
+    kind = body[0]
+    if kind == DIFF:
+        _, book, ts, n = _DIFF_HEAD.unpack_from(body)
+        levels = np.frombuffer(body, DIFF_DTYPE, n, _DIFF_HEAD.size)
+        return Diff(book, ts, levels)
+    if kind == SNAPSHOT:
+        _, book, tick, ts = _SNAPSHOT_HEAD.unpack_from(body)
+        ex, mk, off = _read_key(memoryview(body), _SNAPSHOT_HEAD.size)
+        n_bids, n_offers = _COUNTS.unpack_from(body, off)
+        off += _COUNTS.size
+        bids = np.frombuffer(body, LEVEL_DTYPE, n_bids, off)
+        offers = np.frombuffer(body, LEVEL_DTYPE, n_offers, off + bids.nbytes)
+        return Snapshot(book, ex, mk, tick, ts, bids, offers)
+    if kind == UNSUBSCRIBED:
+        return Unsubscribed(_UNSUBSCRIBED.unpack_from(body)[1])
+    if kind == OK:
+        _, request, changed = _OK_HEAD.unpack_from(body)
+        ex, mk, _ = _read_key(memoryview(body), _OK_HEAD.size)
+        return Ok(request, bool(changed), ex, mk)
+    if kind == ERROR:
+        (n,) = struct.unpack_from("<H", body, 1)
+        return Error(body[3:3 + n].decode())
+    raise ValueError(f"unknown message type {kind}")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """ the next frame body; raises asyncio.IncompleteReadError at EOF """
+    (n,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    if n == 0 or n > MAX_FRAME:
+        raise ValueError(f"bad frame length {n}")
+    return await reader.readexactly(n)
+
+
+class BookClient:
+    """
+    Minimal asyncio client: subscribe to (exchange, market) pairs and keep a
+    local copy of each book from the snapshots and diffs.
+
+        client = await BookClient.connect_unix("/tmp/predme.sock")
+        await client.subscribe("kalshi", "KXMAYORNYCNOMD-25-AC")
+        while True:
+            msg = await client.recv()   # already applied to client.books
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self.keys: Dict[int, Tuple[str, str]] = {}
+        # book -> ({price: qty} bids, {price: qty} offers)
+        self.books: Dict[int, Tuple[Dict[float, float], Dict[float, float]]] = {}
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> "BookClient":
+        return cls(*await asyncio.open_unix_connection(path))
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int) -> "BookClient":
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def subscribe(self, exchange_id: str, market_id: str):
+        self._writer.write(encode_subscribe(exchange_id, market_id))
+        await self._writer.drain()
+
+    async def unsubscribe(self, exchange_id: str, market_id: str):
+        self._writer.write(encode_unsubscribe(exchange_id, market_id))
+        await self._writer.drain()
+
+    async def add_market(self, exchange_id: str, market_id: str):
+        """ have the server start following a market (answered with Ok) """
+        self._writer.write(encode_add_market(exchange_id, market_id))
+        await self._writer.drain()
+
+    async def remove_market(self, exchange_id: str, market_id: str):
+        """ have the server stop following a market (answered with Ok) """
+        self._writer.write(encode_remove_market(exchange_id, market_id))
+        await self._writer.drain()
+
+    async def recv(self) -> Snapshot | Diff | Unsubscribed | Ok | Error:
+        """ next message from the server, after applying it to `books` """
+        msg = decode_message(await read_frame(self._reader))
+        if type(msg) is Diff:
+            book = self.books.get(msg.book)
+            if book is not None:
+                for side, price, qty in msg.levels.tolist():
+                    levels = book[0] if side == BID else book[1]
+                    if qty == 0.0:
+                        levels.pop(price, None)
+                    else:
+                        levels[price] = qty
+        elif type(msg) is Snapshot:
+            self.keys[msg.book] = (msg.exchange_id, msg.market_id)
+            self.books[msg.book] = (dict(msg.bids.tolist()), dict(msg.offers.tolist()))
+        elif type(msg) is Unsubscribed:
+            self.books.pop(msg.book, None)
+        return msg
+
+    def levels(self, book: int) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+        """ (bids, offers) as sorted (price, quantity) lists, like ServerState.get_market """
+        bids, offers = self.books[book]
+        return sorted(bids.items()), sorted(offers.items())
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
@@ -0,0 +1,342 @@
+"""
+The local client-server socket: clients subscribe to (exchange, market) pairs
+and receive a snapshot of each book, then incremental level diffs as the
+ServerState changes. Wire format in client_protocol.py.
+
+Changed books come from `ServerState.drain_dirty`. For each subscribed one the
+server compares the live ladders (get_book_arrays) against the copy it last
+published and sends only the levels that differ, encoded once and written to
+every subscriber of that book.
+
+Publishing runs on the event loop. `notify()` (pass it as a handler's
+`on_update`) schedules a publish with `loop.call_soon`, after any UpdateBatch
+flush already queued for the tick; `poll_interval` also publishes on a timer
+for updates applied from other threads.
+
+Publishing never waits on a client. A client whose socket buffer is over
+`high_water` bytes (on top of a kernel send buffer capped at `socket_buffer`)
+stops receiving frames: each book that changes meanwhile
+is remembered once, with the state the client last saw, and later changes to
+it are conflated. When the buffer drains, the client gets one diff per such
+book (from what it last saw to the latest published state) and is back in
+step. So a slow reader costs at most one pending entry per book, never an
+unbounded queue, and ingest runs at full rate regardless. `stats()` reports
+queue depth and conflation counts per client.
+
+Given `markets` (a connection_pool.ConnectionPool), clients can also add
+and remove markets on the running exchange feeds (ADD_MARKET /
+REMOVE_MARKET). A removed book's subscribers get an empty snapshot.
+"""
+import asyncio
+import os
+import socket
+import struct
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+from orderbook_ext import ServerState
+
+import client_protocol as proto
+
+
+class _Published:
+    """ the last state of a book sent to its subscribers """
+    __slots__ = ("tick_size", "bids", "offers")
+
+    def __init__(self, tick_size: float, bids: np.ndarray, offers: np.ndarray):
+        self.tick_size = tick_size
+        self.bids = bids.copy()
+        self.offers = offers.copy()
+
+
+class _Client:
+    __slots__ = ("writer", "books", "lagging", "catch_up", "frames_sent", "bytes_sent",
+                 "conflated", "catch_ups", "max_queue_bytes")
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.books: Set[int] = set()
+        # book -> what the client last saw of it (None: needs a snapshot),
+        # for books withheld while the client was backlogged
+        self.lagging: Dict[int, Optional[_Published]] = {}
+        self.catch_up: Optional[asyncio.Task] = None
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.conflated = 0  # book changes folded into a later diff
+        self.catch_ups = 0  # times the client fell behind
+        self.max_queue_bytes = 0
+
+    def queue_bytes(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+    def send(self, frame: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(frame)
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+            queued = self.queue_bytes()
+            if queued > self.max_queue_bytes:
+                self.max_queue_bytes = queued
+
+
+def _levels(ladder: np.ndarray, tick_size: float) -> np.ndarray:
+    idx = np.flatnonzero(ladder)
+    out = np.empty(len(idx), proto.LEVEL_DTYPE)
+    out["price"] = idx * tick_size
+    out["quantity"] = ladder[idx]
+    return out
+
+
+def _diff(prev: np.ndarray, cur: np.ndarray, side: int, tick_size: float) -> np.ndarray:
+    idx = np.flatnonzero(prev != cur)
+    out = np.empty(len(idx), proto.DIFF_DTYPE)
+    out["side"] = side
+    out["price"] = idx * tick_size
+    out["quantity"] = cur[idx]
+    return out
+
+
+class ClientServer:
+    """
+    Serves the books in `state` to local clients over a Unix domain socket
+    (`start(path=...)`) and/or TCP (`start(host=..., port=...)`).
+    `on_changed` gets the handles of the changed books on every publish, so
+    other consumers can share `drain_dirty` (market_store.MarketCapture).
+    """
+
+    def __init__(self, state: ServerState, poll_interval: float = 0.005, high_water: int = 64 * 1024,
+                 socket_buffer: int = 64 * 1024, markets: Any = None,
+                 on_changed: Optional[Callable[[List[int]], None]] = None):
+        self._state = state
+        self._markets = markets
+        self.on_changed = on_changed
+        self._poll_interval = poll_interval
+        self._high_water = high_water
+        self._socket_buffer = socket_buffer
+        self._servers: list = []
+        self._clients: Set[_Client] = set()
+        self._subscribers: Dict[int, Set[_Client]] = {}
+        self._published: Dict[int, _Published] = {}
+        self._publish_scheduled = False
+        self._poller: Optional[asyncio.Task] = None
+
+    async def start(self, path: Optional[str] = None, host: Optional[str] = None, port: Optional[int] = None):
+        if path is None and port is None:
+            raise ValueError("need a unix socket path and/or a tcp port")
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            self._servers.append(await asyncio.start_unix_server(self._serve_client, path=path))
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self._serve_client, host=host, port=port))
+        self._poller = asyncio.create_task(self._poll())
+
+    async def serve_forever(self, path: Optional[str] = None, host: Optional[str] = None, port: Optional[int] = None):
+        await self.start(path=path, host=host, port=port)
+        try:
+            await asyncio.gather(*(s.serve_forever() for s in self._servers))
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+        for s in self._servers:
+            s.close()
+        for c in list(self._clients):
+            c.writer.close()
+        self._servers.clear()
+
+    def notify(self):
+        """ the state changed; publish once the loop is free """
+        if not self._publish_scheduled:
+            self._publish_scheduled = True
+            asyncio.get_running_loop().call_soon(self.publish)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            self.publish()
+
+    def publish(self):
+        """ send diffs (or snapshots) for every changed book that has subscribers """
+        self._publish_scheduled = False
+        changed = self._state.drain_dirty().tolist()
+        if self.on_changed is not None and changed:
+            self.on_changed(changed)
+        for handle in changed:
+            subs = self._subscribers.get(handle)
+            if not subs:
+                continue
+            arrays = self._state.get_book_arrays(handle)
+            if arrays is None:
+                if handle in self._published:  # removed
+                    self._hold_back(handle, subs, self._published[handle])
+                    frame = self._snapshot(handle, None)
+                    for c in subs:
+                        if handle not in c.lagging:
+                            c.send(frame)
+                continue
+            bids, offers, tick = arrays
+            pub = self._published.get(handle)
+            if pub is None or pub.tick_size != tick or len(pub.bids) != len(bids) or len(pub.offers) != len(offers):
+                self._hold_back(handle, subs, None)
+                frame = self._snapshot(handle, arrays)
+            else:
+                levels = np.concatenate((_diff(pub.bids, bids, proto.BID, tick),
+                                         _diff(pub.offers, offers, proto.OFFER, tick)))
+                if len(levels) == 0:
+                    continue
+                self._hold_back(handle, subs, pub)
+                np.copyto(pub.bids, bids)
+                np.copyto(pub.offers, offers)
+                frame = proto.encode_diff(handle, levels)
+            for c in subs:
+                if handle not in c.lagging:
+                    c.send(frame)
+
+    def _hold_back(self, handle: int, subs: Set[_Client], pub: Optional[_Published]):
+        """
+        Before `pub` (the state subscribers last got) moves on: a backlogged
+        subscriber keeps a copy of it instead of getting this frame.
+        """
+        for c in subs:
+            if handle in c.lagging:
+                c.conflated += 1
+            elif c.queue_bytes() > self._high_water:
+                c.lagging[handle] = None if pub is None else _Published(pub.tick_size, pub.bids, pub.offers)
+                c.conflated += 1
+                if c.catch_up is None:
+                    c.catch_ups += 1
+                    c.catch_up = asyncio.get_running_loop().create_task(self._catch_up(c))
+
+    async def _catch_up(self, client: _Client):
+        """ once the client drains, send it one frame per withheld book """
+        try:
+            while client.lagging and not client.writer.is_closing():
+                await client.writer.drain()
+                # bring the published copies current, then diff against them
+                self.publish()
+                for handle in list(client.lagging):
+                    if client.queue_bytes() > self._high_water:
+                        break
+                    seen = client.lagging.pop(handle)
+                    frame = self._resync_frame(handle, seen)
+                    if frame is not None:
+                        client.send(frame)
+        except ConnectionError:
+            pass
+        finally:
+            client.catch_up = None
+
+    def _resync_frame(self, handle: int, seen: Optional[_Published]) -> Optional[bytes]:
+        """ a frame taking a client from `seen` to the published state """
+        pub = self._published.get(handle)
+        if pub is None:
+            if seen is not None:
+                return self._snapshot(handle, None)  # removed since the client saw it
+            return None  # not initialized yet; its first snapshot goes to everyone
+        tick = pub.tick_size
+        if seen is None or seen.tick_size != tick or len(seen.bids) != len(pub.bids):
+            ex, mk = self._state.book_key(handle)
+            return proto.encode_snapshot(handle, ex, mk, tick, _levels(pub.bids, tick), _levels(pub.offers, tick))
+        levels = np.concatenate((_diff(seen.bids, pub.bids, proto.BID, tick),
+                                 _diff(seen.offers, pub.offers, proto.OFFER, tick)))
+        return proto.encode_diff(handle, levels) if len(levels) else None
+
+    def stats(self) -> List[dict]:
+        """ per-client delivery counters """
+        return [{
+            "peer": c.writer.get_extra_info("peername") or c.writer.get_extra_info("sockname"),
+            "books": len(c.books),
+            "queue_bytes": c.queue_bytes(),
+            "max_queue_bytes": c.max_queue_bytes,
+            "lagging_books": len(c.lagging),
+            "frames_sent": c.frames_sent,
+            "bytes_sent": c.bytes_sent,
+            "conflated": c.conflated,
+            "catch_ups": c.catch_ups,
+        } for c in self._clients]
+
+    def _snapshot(self, handle: int, arrays) -> bytes:
+        """ encode a snapshot and make it the published state """
+        ex, mk = self._state.book_key(handle)
+        if arrays is None:
+            self._published.pop(handle, None)
+            empty = np.empty(0, proto.LEVEL_DTYPE)
+            return proto.encode_snapshot(handle, ex, mk, 0.0, empty, empty)
+        bids, offers, tick = arrays
+        self._published[handle] = _Published(tick, bids, offers)
+        return proto.encode_snapshot(handle, ex, mk, tick, _levels(bids, tick), _levels(offers, tick))
+
+    def _subscribe(self, client: _Client, exchange_id: str, market_id: str):
+        handle = self._state.register_book(exchange_id, market_id)
+        client.books.add(handle)
+        self._subscribers.setdefault(handle, set()).add(client)
+        # Re-publishing resets the shared published copy, so bring the other
+        # subscribers along with pending changes first. Diffs carry absolute
+        # quantities, so what they get is consistent with the new snapshot.
+        self.publish()
+        client.send(self._snapshot(handle, self._state.get_book_arrays(handle)))
+
+    def _unsubscribe(self, client: _Client, handle: int):
+        client.books.discard(handle)
+        client.lagging.pop(handle, None)
+        subs = self._subscribers.get(handle)
+        if subs is not None:
+            subs.discard(client)
+            if not subs:
+                del self._subscribers[handle]
+                self._published.pop(handle, None)
+
+    async def _change_markets(self, client: _Client, kind: int, exchange_id: str, market_id: str):
+        if self._markets is None:
+            client.send(proto.encode_error("this server does not manage exchange markets"))
+            return
+        change = self._markets.add_markets if kind == proto.ADD_MARKET else self._markets.remove_markets
+        try:
+            changed = await change(exchange_id, [market_id])
+        except ValueError as e:
+            client.send(proto.encode_error(str(e)))
+            return
+        client.send(proto.encode_ok(kind, bool(changed), exchange_id, market_id))
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(writer)
+        # drain() in _catch_up then waits for the buffer to fall well below high_water
+        writer.transport.set_write_buffer_limits(high=self._high_water)
+        # A small kernel buffer keeps the backlog where conflation can see it
+        sock = writer.get_extra_info("socket")
+        if sock is not None and self._socket_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self._socket_buffer)
+        self._clients.add(client)
+        try:
+            while True:
+                body = await proto.read_frame(reader)
+                try:
+                    kind, ex, mk = proto.decode_request(body)
+                except (ValueError, IndexError, struct.error, UnicodeDecodeError) as e:
+                    client.send(proto.encode_error(f"malformed request: {e}"))
+                    continue
+                if kind == proto.SUBSCRIBE:
+                    self._subscribe(client, ex, mk)
+                elif kind == proto.UNSUBSCRIBE:
+                    handle = self._state.find_handle(ex, mk)
+                    if handle in client.books:
+                        self._unsubscribe(client, handle)
+                        client.send(proto.encode_unsubscribed(handle))
+                    else:
+                        client.send(proto.encode_error(f"not subscribed to {ex} {mk}"))
+                elif kind in (proto.ADD_MARKET, proto.REMOVE_MARKET):
+                    await self._change_markets(client, kind, ex, mk)
+                else:
+                    client.send(proto.encode_error(f"unknown request type {kind}"))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            for handle in list(client.books):
+                self._unsubscribe(client, handle)
+            if client.catch_up is not None:
+                client.catch_up.cancel()
+            self._clients.discard(client)
+            writer.close()
@@ -0,0 +1,303 @@
+"""
+Sharded, reconnecting exchange connections feeding one ingest queue.
+
+A feed (one per exchange) splits its markets across shards, each its own
+websocket connection with at most `max_markets_per_connection` markets.
+Every connection only reads: frames go onto one shared asyncio queue, and a
+single consumer applies them to the ServerState in arrival order. A socket
+that stalls or drops holds up nothing but its own markets.
+
+When a connection ends (closed, errored, or failed to open) the shard
+reconnects after a jittered exponential backoff, and the new client
+subscribes to the shard's current markets again. The end of a connection
+is queued like a frame, so once everything it delivered has been applied
+the shard's books are marked stale (ServerState.is_stale) and its kalshi
+sequence state is dropped. Only those books are re-initialized, by the
+snapshots the exchange sends on resubscribing; other shards never notice.
+
+Markets can be added and removed while running (add_markets /
+remove_markets): they are subscribed or dropped on the live connections,
+new connections open when the existing ones are full, and a removed
+market's book is freed once the frames already queued for it are applied.
+
+    pool = ConnectionPool(state, on_update=clients.notify)
+    add_kalshi_feed(pool, endpoints, auth, max_markets_per_connection=200)
+    await pool.run()
+
+(add_kalshi_feed / add_polymarket_feed are in websocket_handlers.py.)
+"""
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import websockets
+from orderbook_ext import ServerState
+
+# a client with `async connect()` that returns or raises when the connection ends
+MakeClient = Callable[[List[str], Callable[[Any, Any], Any]], Any]
+
+
+class Shard:
+    """ one connection and the markets subscribed on it """
+
+    def __init__(self, feed: "Feed", index: int, stream: int, tickers: List[str]):
+        self.feed = feed
+        self.index = index
+        self.stream = stream  # unique in the pool; names the connection to ServerState
+        self.tickers = tickers  # shared with the live client, so a reconnect resubscribes them
+        self.client: Any = None
+        self.connected = False
+        self.connections = 0
+        self.messages = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+
+class Feed:
+    """ one exchange's shards, how to connect them and how to apply their frames """
+
+    def __init__(self, exchange_id: str, make_client: MakeClient, apply: Callable[[Shard, Any, Any, int], None],
+                 on_disconnect: Optional[Callable[[Shard], None]], max_markets_per_connection: int):
+        self.exchange_id = exchange_id
+        self.make_client = make_client
+        self.apply = apply
+        self.on_disconnect = on_disconnect
+        self.max_markets_per_connection = max_markets_per_connection
+        self.shards: List[Shard] = []
+
+
+_DISCONNECTED = object()
+
+
+class _Removed:
+    """ queued after a shard's markets are dropped, to free their books in order """
+    __slots__ = ("tickers",)
+
+    def __init__(self, tickers: List[str]):
+        self.tickers = tickers
+
+
+class ConnectionPool:
+
+    def __init__(self, state: ServerState, on_update: Optional[Callable[[], None]] = None,
+                 queue_size: int = 100_000, backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 stable_after: float = 30.0, recorder: Any = None, latency: Any = None, capture: Any = None):
+        """
+        queue_size: frames waiting to be applied before readers block (and the
+            exchanges see TCP backpressure)
+        backoff_base, backoff_cap: reconnect delays are uniform in
+            [0, min(cap, base * 2**attempt)]
+        stable_after: a connection that lasted this long resets the attempt count
+        recorder: a feed_recorder.FeedRecorder that gets every frame as received
+        latency: a latency_stats.FeedLatency the feeds record each frame's
+            exchange -> received -> decoded -> applied intervals in
+        capture: a market_store.MarketCapture the feeds record trades in
+        """
+        self.state = state
+        self.on_update = on_update
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+        self._stable_after = stable_after
+        self.recorder = recorder
+        self.latency = latency
+        self.capture = capture
+        self.feeds: List[Feed] = []
+        self._next_stream = 1
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self.max_queue_depth = 0
+
+    def add_feed(self, exchange_id: str, tickers: List[str], make_client: MakeClient,
+                 apply: Callable[[Shard, Any, Any, int], None], on_disconnect: Optional[Callable[[Shard], None]] = None,
+                 connections: int = 1, max_markets_per_connection: int = 250) -> Feed:
+        """
+        Shard `tickers` over at least `connections` connections, with no more
+        than `max_markets_per_connection` on any one. `make_client(tickers,
+        on_message)` builds a client that subscribes to `tickers` when it
+        connects; `apply(shard, client, frame, recv_ns)` runs for each frame,
+        with the time.time_ns() it was received.
+        """
+        feed = Feed(exchange_id, make_client, apply, on_disconnect, max_markets_per_connection)
+        n = max(connections, -(-len(tickers) // max_markets_per_connection), 1)
+        for i in range(n):
+            self._add_shard(feed, list(tickers[i::n]))
+        self.feeds.append(feed)
+        return feed
+
+    def _add_shard(self, feed: Feed, tickers: List[str]) -> Shard:
+        shard = Shard(feed, len(feed.shards), self._next_stream, tickers)
+        self._next_stream += 1
+        feed.shards.append(shard)
+        if self._running:
+            self._tasks.append(asyncio.create_task(self._connection(shard)))
+        return shard
+
+    def _feed(self, exchange_id: str) -> Feed:
+        for feed in self.feeds:
+            if feed.exchange_id == exchange_id:
+                return feed
+        raise ValueError(f"no {exchange_id} feed")
+
+    async def add_markets(self, exchange_id: str, tickers: List[str]) -> List[str]:
+        """
+        Subscribe `tickers` on the running connections, filling the ones
+        with the most room first and opening new ones past the cap. Returns
+        the tickers that were not already subscribed.
+        """
+        feed = self._feed(exchange_id)
+        cap = feed.max_markets_per_connection
+        have = {t for s in feed.shards for t in s.tickers}
+        rest = [t for t in dict.fromkeys(tickers) if t not in have]
+        added = list(rest)
+        additions: Dict[Shard, List[str]] = {}
+        for shard in sorted(feed.shards, key=lambda s: len(s.tickers)):
+            room = cap - len(shard.tickers)
+            if room <= 0 or not rest:
+                break
+            additions[shard], rest = rest[:room], rest[room:]
+        for i in range(0, len(rest), cap):
+            self._add_shard(feed, rest[i:i + cap])
+        for shard, new in additions.items():
+            if shard.client is None:
+                shard.tickers.extend(new)
+                continue
+            try:
+                # also adds them to shard.tickers, for the next connection
+                await shard.client.add_markets(new)
+            except websockets.ConnectionClosed:
+                pass  # the reconnect subscribes them
+        return added
+
+    async def remove_markets(self, exchange_id: str, tickers: List[str]) -> List[str]:
+        """
+        Unsubscribe `tickers` on their connections and free their books.
+        Returns the tickers that were subscribed.
+        """
+        feed = self._feed(exchange_id)
+        removed = []
+        for shard in feed.shards:
+            drop = [t for t in tickers if t in shard.tickers]
+            if not drop:
+                continue
+            removed.extend(drop)
+            if shard.client is None:
+                shard.tickers[:] = [t for t in shard.tickers if t not in drop]
+            else:
+                try:
+                    await shard.client.remove_markets(drop)
+                except websockets.ConnectionClosed:
+                    pass  # already off shard.tickers, so not resubscribed
+            if self._running:
+                await self._queue.put((shard, None, _Removed(drop), 0))
+            else:
+                self._free(feed, drop)
+        return removed
+
+    def _free(self, feed: Feed, tickers: List[str]):
+        for ticker in tickers:
+            self.state.remove_order_book(feed.exchange_id, ticker)
+
+    async def run(self):
+        """ connect every shard and apply frames until cancelled """
+        self._running = True
+        consumer = asyncio.create_task(self._consume())
+        self._tasks.extend(asyncio.create_task(self._connection(s)) for f in self.feeds for s in f.shards)
+        try:
+            await consumer
+        finally:
+            await self.close()
+
+    async def close(self):
+        self._running = False
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def backoff(self, attempt: int) -> float:
+        """ full jitter: reconnecting shards spread out instead of retrying in step """
+        return random.uniform(0, min(self._backoff_cap, self._backoff_base * 2 ** attempt))
+
+    async def _connection(self, shard: Shard):
+        attempt = 0
+
+        exchange_id = shard.feed.exchange_id
+
+        async def on_message(client, msg):
+            recv_ns = time.time_ns()
+            if self.recorder is not None:
+                self.recorder.record(exchange_id, shard.stream, msg, recv_ns)
+            await self._queue.put((shard, client, msg, recv_ns))
+
+        while self._running:
+            client = shard.feed.make_client(shard.tickers, on_message)
+            shard.client = client
+            shard.connections += 1
+            started = time.monotonic()
+            try:
+                await client.connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                shard.last_error = repr(e)
+                print(f"{shard.feed.exchange_id} connection {shard.index} failed: {e!r}")
+            await self._queue.put((shard, client, _DISCONNECTED, 0))
+            attempt = 0 if time.monotonic() - started >= self._stable_after else attempt + 1
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def _consume(self):
+        queue = self._queue
+        while True:
+            item = await queue.get()
+            depth = queue.qsize() + 1
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+            # apply whatever else is already queued before yielding
+            while True:
+                self._apply(*item)
+                if queue.empty():
+                    break
+                item = queue.get_nowait()
+            if self.on_update is not None:
+                self.on_update()
+
+    def _apply(self, shard: Shard, client, msg, recv_ns: int):
+        if msg is _DISCONNECTED:
+            self._disconnected(shard)
+            return
+        if type(msg) is _Removed:
+            self._free(shard.feed, msg.tickers)
+            return
+        shard.connected = True
+        shard.messages += 1
+        try:
+            shard.feed.apply(shard, client, msg, recv_ns)
+        except Exception as e:
+            shard.errors += 1
+            shard.last_error = repr(e)
+            print(f"{shard.feed.exchange_id} connection {shard.index}: could not apply frame: {e!r}")
+
+    def _disconnected(self, shard: Shard):
+        """ everything the connection delivered is applied; its books now wait for new snapshots """
+        shard.connected = False
+        for ticker in shard.tickers:
+            handle = self.state.find_handle(shard.feed.exchange_id, ticker)
+            if handle >= 0:
+                self.state.mark_stale(handle)
+        if shard.feed.on_disconnect is not None:
+            shard.feed.on_disconnect(shard)
+
+    def stats(self) -> List[dict]:
+        """ per-connection counters """
+        return [{
+            "exchange": f.exchange_id,
+            "shard": s.index,
+            "markets": len(s.tickers),
+            "connected": s.connected,
+            "connections": s.connections,
+            "messages": s.messages,
+            "errors": s.errors,
+            "last_error": s.last_error,
+        } for f in self.feeds for s in f.shards]
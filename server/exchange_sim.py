@@ -0,0 +1,634 @@
+"""
+Local exchange simulator for load tests: one websocket server that speaks
+the kalshi (kalshi_tickerv2_dtypes) and polymarket market channel
+(polymarket_wss_dtypes) feeds closely enough for the real clients.
+
+    kalshi      ws://host:port/trade-api/ws/v2
+                subscribe / unsubscribe / update_subscription commands;
+                "subscribed", "ok", "unsubscribed" and "error" replies;
+                orderbook_snapshot then orderbook_delta per sid with
+                contiguous seq, ticker messages on the ticker channel
+                and trades on the trade channel
+    polymarket  ws://host:port/ws/market
+                the initial subscribe message and later subscribe /
+                unsubscribe operations; a book event per asset, then
+                price_change events (batched several to a frame),
+                occasional tick_size_change, and last_trade_price
+
+Any ticker or asset id can be subscribed; `kalshi_tickers()` and
+`polymarket_assets()` name `markets` of them for convenience. Each
+connection keeps its own books, and every delta and price change is
+consistent with them, so a client that applies the feed ends up with
+exactly the simulator's book.
+
+Load: every subscribed market produces `rate` messages per second, times
+`burst_factor` for the first `burst_seconds` of every `burst_every`
+seconds. `kalshi_gap_rate` skips a seq now and then to exercise gap
+recovery. With `probe=True` polymarket sizes are the send time in
+microseconds (mod 1e9), so a client can measure end-to-end latency from a
+book's levels (see bench/bench_end_to_end.py).
+
+A second, plain HTTP/1.1 server (keep-alive, `rest_port`) is a stand-in for
+the kalshi REST API under /trade-api/v2. Reads: exchange/status,
+portfolio/balance, portfolio/orders, and markets/trades with kalshi's filters
+and cursor pagination over a deterministic trade history per ticker. Writes:
+POST portfolio/orders places an order, DELETE portfolio/orders/{order_id}
+cancels it. Requests must carry the KALSHI-ACCESS-* headers. Reads past
+`rest_rate` and writes past `rest_write_rate` per second are answered 429
+(with Retry-After), each limit counted separately like kalshi's.
+
+Point the clients at it with their base URL overrides:
+
+    sim = ExchangeSimulator(markets=500, rate=20)
+    await sim.start()
+    KalshiWebSocketClient(..., ws_base_url=sim.kalshi_url)
+    AsyncKalshiHttpClient(..., http_base_url=sim.kalshi_http_url)
+    PolymarketWebSocketClient(..., url=sim.polymarket_url)
+"""
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import websockets
+from websockets.asyncio.server import ServerConnection, serve
+
+KALSHI_PATH = "/trade-api/ws/v2"
+POLYMARKET_PATH = "/ws/market"
+REST_PREFIX = "/trade-api/v2"
+TRADES_START = 1_750_000_000
+
+_WRAP_US = 10 ** 9
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            429: "Too Many Requests"}
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000 % _WRAP_US
+
+
+class _KalshiSub:
+    __slots__ = ("channel", "tickers", "seq")
+
+    def __init__(self, channel: str, tickers: List[str]):
+        self.channel = channel
+        self.tickers = tickers
+        self.seq = 0
+
+
+class ExchangeSimulator:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, markets: int = 100, rate: float = 10.0,
+                 burst_every: float = 0.0, burst_seconds: float = 0.0, burst_factor: float = 1.0,
+                 max_changes: int = 4, batch: int = 3, tick_size_change_rate: float = 0.001,
+                 ticker_share: float = 0.1, kalshi_gap_rate: float = 0.0, probe: bool = False,
+                 interval: float = 0.005, seed: int = 0, trades_per_market: int = 1000,
+                 rest_rate: float = 0.0, trade_share: float = 0.0, rest_write_rate: float = 0.0,
+                 rest_port: int = 0):
+        """
+        rate: messages per second per subscribed market
+        burst_every, burst_seconds, burst_factor: periodic bursts of rate * burst_factor
+        max_changes: most levels in one polymarket price_change event
+        batch: most polymarket events in one frame
+        tick_size_change_rate, ticker_share, kalshi_gap_rate, trade_share: per-message probabilities
+            (trade_share: kalshi trade channel messages, polymarket last_trade_price events)
+        interval: how often each connection sends what is due
+        trades_per_market: kalshi trade history served per ticker over REST
+        rest_rate, rest_write_rate: REST reads / writes per second before answering 429 (0: no limit)
+        rest_port: port of the REST server (0: any free one)
+        """
+        self.host = host
+        self.port = port
+        self.markets = markets
+        self.rate = rate
+        self.burst_every = burst_every
+        self.burst_seconds = burst_seconds
+        self.burst_factor = burst_factor
+        self.max_changes = max_changes
+        self.batch = batch
+        self.tick_size_change_rate = tick_size_change_rate
+        self.ticker_share = ticker_share
+        self.trade_share = trade_share
+        self.kalshi_gap_rate = kalshi_gap_rate
+        self.probe = probe
+        self.interval = interval
+        self._rng = random.Random(seed)
+        self._server = None
+        self._started = 0.0
+        self.connections = 0
+        self.frames_sent = {"kalshi": 0, "polymarket": 0}
+        self.messages_sent = {"kalshi": 0, "polymarket": 0}
+        self.gaps = 0
+        self.trades_per_market = trades_per_market
+        self.rest_rate = rest_rate
+        self.rest_write_rate = rest_write_rate
+        self.rest_port = rest_port
+        self._rest_server = None
+        self._rest_windows = {"read": (0, 0), "write": (0, 0)}  # (second, requests in it)
+        self._trades: Dict[str, list] = {}
+        self.orders: Dict[str, dict] = {}
+        self.rest_requests = {"read": 0, "write": 0}
+        self.rest_throttled = {"read": 0, "write": 0}
+
+    @property
+    def kalshi_url(self) -> str:
+        """ base URL for KalshiWebSocketClient(ws_base_url=...) """
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def kalshi_http_url(self) -> str:
+        """ base URL for KalshiHttpClient / AsyncKalshiHttpClient(http_base_url=...) """
+        return f"http://{self.host}:{self.rest_port}"
+
+    @property
+    def polymarket_url(self) -> str:
+        """ URL prefix for PolymarketWebSocketClient(url=...); the channel is appended """
+        return f"ws://{self.host}:{self.port}/ws/"
+
+    def kalshi_tickers(self) -> List[str]:
+        return [f"SIM-K{i:05d}" for i in range(self.markets)]
+
+    def polymarket_assets(self) -> List[str]:
+        return [f"{9_000_000 + i}" for i in range(self.markets)]
+
+    async def start(self):
+        self._server = await serve(self._serve, self.host, self.port, max_size=None, compression=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._rest_server = await asyncio.start_server(self._serve_rest, self.host, self.rest_port)
+        self.rest_port = self._rest_server.sockets[0].getsockname()[1]
+        self._started = time.monotonic()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._rest_server is not None:
+            self._rest_server.close()
+            # idle keep-alive connections would otherwise hold wait_closed open
+            self._rest_server.close_clients()
+            await self._rest_server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        await self._server.serve_forever()
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "frames_sent": dict(self.frames_sent),
+            "messages_sent": dict(self.messages_sent),
+            "kalshi_gaps": self.gaps,
+            "rest_requests": dict(self.rest_requests),
+            "rest_throttled": dict(self.rest_throttled),
+        }
+
+    async def _serve_rest(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ one keep-alive HTTP/1.1 connection: requests with Content-Length bodies, answered in order """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if line:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, body, extra = self._rest(method, target, headers, raw)
+                payload = json.dumps(body).encode()
+                reason = _REASONS.get(status, "")
+                out = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json",
+                       f"Content-Length: {len(payload)}"] + [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _throttle(self, kind: str) -> Optional[float]:
+        """ seconds until the next window if this request is over its class's limit """
+        limit = self.rest_rate if kind == "read" else self.rest_write_rate
+        self.rest_requests[kind] += 1
+        if limit <= 0:
+            return None
+        now = time.monotonic()
+        second = int(now)
+        start, used = self._rest_windows[kind]
+        used = used + 1 if start == second else 1
+        self._rest_windows[kind] = (second, used)
+        if used <= limit:
+            return None
+        self.rest_throttled[kind] += 1
+        return second + 1 - now
+
+    def _rest(self, method: str, target: str, headers: Dict[str, str], raw: bytes):
+        """ (status, json body, extra headers) for one REST request """
+        url = urlsplit(target)
+        if not url.path.startswith(REST_PREFIX):
+            return 404, {"error": {"code": "not_found"}}, {}
+        if not all(f"kalshi-access-{h}" in headers for h in ("key", "signature", "timestamp")):
+            return 401, {"error": {"code": "unauthorized"}}, {}
+        kind = "read" if method == "GET" else "write"
+        retry_after = self._throttle(kind)
+        if retry_after is not None:
+            return 429, {"error": {"code": "too_many_requests"}}, {"Retry-After": f"{retry_after:.3f}"}
+        route = url.path[len(REST_PREFIX):]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if method == "GET" and route == "/exchange/status":
+                return 200, {"exchange_active": True, "trading_active": True}, {}
+            if method == "GET" and route == "/portfolio/balance":
+                return 200, {"balance": 100_000}, {}
+            if method == "GET" and route == "/markets/trades":
+                return 200, self._trade_page(query), {}
+            if method == "GET" and route == "/portfolio/orders":
+                orders = [o for o in self.orders.values()
+                          if query.get("ticker", o["ticker"]) == o["ticker"]
+                          and query.get("status", o["status"]) == o["status"]]
+                return 200, {"orders": orders, "cursor": ""}, {}
+            if method == "POST" and route == "/portfolio/orders":
+                return 201, {"order": self._place_order(json.loads(raw or b"{}"))}, {}
+            if method == "DELETE" and route.startswith("/portfolio/orders/"):
+                order = self.orders.get(route[len("/portfolio/orders/"):])
+                if order is None:
+                    return 404, {"error": {"code": "not_found", "message": "order not found"}}, {}
+                reduced, order["remaining_count"], order["status"] = order["remaining_count"], 0, "canceled"
+                return 200, {"order": order, "reduced_by": reduced}, {}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": {"code": "bad_request", "message": str(e)}}, {}
+        return 404, {"error": {"code": "not_found"}}, {}
+
+    def _place_order(self, body: dict) -> dict:
+        """ POST /portfolio/orders: ticker, action, side, count, type, yes_price or no_price; orders just rest """
+        if body["action"] not in ("buy", "sell") or body["side"] not in ("yes", "no"):
+            raise ValueError("action must be buy or sell and side yes or no")
+        count = int(body["count"])
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        yes_price = body.get("yes_price", 100 - body["no_price"] if "no_price" in body else None)
+        order_id = f"sim-{len(self.orders) + 1:08d}"
+        order = self.orders[order_id] = {
+            "order_id": order_id, "client_order_id": body.get("client_order_id", ""), "ticker": body["ticker"],
+            "action": body["action"], "side": body["side"], "type": body.get("type", "limit"),
+            "yes_price": yes_price, "no_price": None if yes_price is None else 100 - yes_price,
+            "initial_count": count, "remaining_count": count, "status": "resting",
+            "created_time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+        return order
+
+    def kalshi_trades(self, ticker: str) -> list:
+        """ the simulated trade history of a kalshi ticker, newest first """
+        return [t for _, t in self._kalshi_trades(ticker)]
+
+    def _kalshi_trades(self, ticker: str) -> list:
+        """ (created ts, trade) pairs """
+        trades = self._trades.get(ticker)
+        if trades is None:
+            r = random.Random(f"{ticker}")
+            ts = TRADES_START
+            trades = []
+            for i in range(self.trades_per_market):
+                ts += r.randint(1, 600)
+                yes = r.randint(1, 99)
+                trades.append((ts, {
+                    "trade_id": f"{ticker}-{i:08d}", "ticker": ticker, "count": r.randint(1, 500),
+                    "yes_price": yes, "no_price": 100 - yes, "taker_side": r.choice(("yes", "no")),
+                    "created_time": datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}))
+            trades.reverse()
+            self._trades[ticker] = trades
+        return trades
+
+    def _trade_page(self, query: Dict[str, str]) -> dict:
+        """ GET /markets/trades: ticker, min_ts, max_ts, limit (1-1000), cursor """
+        tickers = [query["ticker"]] if "ticker" in query else self.kalshi_tickers()
+        limit = int(query.get("limit", 100))
+        if not 1 <= limit <= 1000:
+            raise ValueError("limit must be between 1 and 1000")
+        min_ts, max_ts = int(query.get("min_ts", 0)), int(query.get("max_ts", 2 ** 62))
+        trades = [t for ticker in tickers for ts, t in self._kalshi_trades(ticker) if min_ts <= ts <= max_ts]
+        offset = int(query["cursor"]) if query.get("cursor") else 0
+        page = trades[offset:offset + limit]
+        more = offset + limit < len(trades)
+        return {"trades": page, "cursor": str(offset + limit) if more else ""}
+
+    def _rate_now(self) -> float:
+        if self.burst_every > 0 and (time.monotonic() - self._started) % self.burst_every < self.burst_seconds:
+            return self.rate * self.burst_factor
+        return self.rate
+
+    async def _serve(self, ws: ServerConnection):
+        self.connections += 1
+        path = ws.request.path if ws.request is not None else ""
+        if path.startswith(KALSHI_PATH):
+            session = _KalshiSession(self, ws)
+        elif path.startswith(POLYMARKET_PATH):
+            session = _PolymarketSession(self, ws)
+        else:
+            await ws.close(1008, f"unknown path {path}")
+            return
+        pump = asyncio.create_task(self._pump(session))
+        try:
+            async for message in ws:
+                await session.on_command(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pump.cancel()
+
+    async def _pump(self, session):
+        """ send what the connection's markets owe every `interval` """
+        loop = asyncio.get_running_loop()
+        owed = 0.0
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            owed += session.num_markets() * self._rate_now() * (now - last)
+            last = now
+            while owed >= 1:
+                sent = await session.send_updates(int(owed))
+                if sent == 0:
+                    owed = 0.0
+                    break
+                owed -= sent
+
+
+class _KalshiSession:
+    def __init__(self, sim: ExchangeSimulator, ws: ServerConnection):
+        self.sim = sim
+        self.ws = ws
+        self.rng = random.Random(sim._rng.random())
+        self.subs: Dict[int, _KalshiSub] = {}
+        self.next_sid = 1
+        # ticker -> (yes {price: qty}, no {price: qty})
+        self.books: Dict[str, tuple] = {}
+        self.book_sids: List[tuple] = []  # (sid, ticker) on orderbook_delta
+
+    def num_markets(self) -> int:
+        return len(self.book_sids)
+
+    async def _send(self, msg: dict):
+        await self.ws.send(json.dumps(msg))
+        self.sim.frames_sent["kalshi"] += 1
+        self.sim.messages_sent["kalshi"] += 1
+
+    def _reindex(self):
+        self.book_sids = [(sid, t) for sid, s in self.subs.items() if s.channel == "orderbook_delta" for t in s.tickers]
+
+    def _book(self, ticker: str) -> tuple:
+        book = self.books.get(ticker)
+        if book is None:
+            r = self.rng
+            book = self.books[ticker] = ({p: r.randint(1, 500) for p in range(1, 50) if r.random() < 0.5},
+                                         {p: r.randint(1, 500) for p in range(1, 50) if r.random() < 0.5})
+        return book
+
+    async def _snapshot(self, sid: int, ticker: str):
+        sub = self.subs[sid]
+        sub.seq += 1
+        yes, no = self._book(ticker)
+        await self._send({"type": "orderbook_snapshot", "sid": sid, "seq": sub.seq, "msg": {
+            "market_ticker": ticker,
+            "yes": [[p, q] for p, q in sorted(yes.items())] or None,
+            "no": [[p, q] for p, q in sorted(no.items())] or None}})
+
+    async def _error(self, cmd_id, code: int, text: str):
+        await self._send({"id": cmd_id, "type": "error", "msg": {"code": code, "msg": text}})
+
+    async def on_command(self, message):
+        try:
+            cmd = json.loads(message)
+            cmd_id, name, params = cmd["id"], cmd["cmd"], cmd.get("params", {})
+        except (ValueError, KeyError, TypeError):
+            await self._error(None, 1, "Unable to process message")
+            return
+        tickers = params.get("market_tickers") or ([params["market_ticker"]] if params.get("market_ticker") else [])
+        if name == "subscribe":
+            for channel in params.get("channels", []):
+                sid = self.next_sid
+                self.next_sid += 1
+                self.subs[sid] = _KalshiSub(channel, list(tickers))
+                await self._send({"id": cmd_id, "type": "subscribed", "msg": {"channel": channel, "sid": sid}})
+                if channel == "orderbook_delta":
+                    for t in tickers:
+                        await self._snapshot(sid, t)
+            self._reindex()
+        elif name == "unsubscribe":
+            for sid in params.get("sids", []):
+                if self.subs.pop(sid, None) is not None:
+                    await self._send({"sid": sid, "type": "unsubscribed"})
+            self._reindex()
+        elif name == "update_subscription":
+            sids = params.get("sids", [])
+            sub = self.subs.get(sids[0]) if len(sids) == 1 else None
+            if sub is None:
+                await self._error(cmd_id, 15, "Unknown subscription")
+                return
+            if params.get("action") == "add_markets":
+                new = [t for t in tickers if t not in sub.tickers]
+                sub.tickers.extend(new)
+                if sub.channel == "orderbook_delta":
+                    for t in new:
+                        await self._snapshot(sids[0], t)
+            else:
+                sub.tickers = [t for t in sub.tickers if t not in tickers]
+            self._reindex()
+            await self._send({"id": cmd_id, "sid": sids[0], "seq": sub.seq, "type": "ok",
+                              "market_tickers": sub.tickers})
+        else:
+            await self._error(cmd_id, 5, "Unknown command")
+
+    async def send_updates(self, n: int) -> int:
+        if not self.book_sids:
+            return 0
+        r = self.rng
+        ticker_sids = [sid for sid, s in self.subs.items() if s.channel == "ticker" and s.tickers]
+        trade_sids = [sid for sid, s in self.subs.items() if s.channel == "trade" and s.tickers]
+        for _ in range(n):
+            if trade_sids and r.random() < self.sim.trade_share:
+                sid = r.choice(trade_sids)
+                yes = r.randint(1, 99)
+                await self._send({"type": "trade", "sid": sid, "msg": {
+                    "market_ticker": r.choice(self.subs[sid].tickers), "yes_price": yes, "no_price": 100 - yes,
+                    "count": r.randint(1, 500), "taker_side": r.choice(("yes", "no")), "ts": int(time.time())}})
+                continue
+            if ticker_sids and r.random() < self.sim.ticker_share:
+                sid = r.choice(ticker_sids)
+                t = r.choice(self.subs[sid].tickers)
+                yes, no = self._book(t)
+                bid = max(yes, default=0)
+                await self._send({"type": "ticker", "sid": sid, "msg": {
+                    "market_ticker": t, "price": bid, "yes_bid": bid, "yes_ask": 100 - max(no, default=0),
+                    "volume": r.randint(0, 10 ** 6), "open_interest": r.randint(0, 10 ** 6),
+                    "dollar_volume": r.randint(0, 10 ** 6), "dollar_open_interest": r.randint(0, 10 ** 6),
+                    "ts": int(time.time())}})
+                continue
+            sid, t = r.choice(self.book_sids)
+            sub = self.subs[sid]
+            yes, no = self._book(t)
+            side = r.choice(("yes", "no"))
+            levels = yes if side == "yes" else no
+            price = r.randint(1, 49)  # yes and no bids never cross
+            have = levels.get(price, 0)
+            delta = r.randint(-have, 200) if have else r.randint(1, 200)
+            if delta == 0:
+                delta = 1
+            if have + delta:
+                levels[price] = have + delta
+            else:
+                levels.pop(price, None)
+            sub.seq += 1
+            if self.sim.kalshi_gap_rate and r.random() < self.sim.kalshi_gap_rate:
+                self.sim.gaps += 1
+                continue  # "lost": the book moved but the client never hears of it
+            await self._send({"type": "orderbook_delta", "sid": sid, "seq": sub.seq, "msg": {
+                "market_ticker": t, "price": price, "delta": delta, "side": side}})
+        return n
+
+
+class _PolymarketSession:
+    def __init__(self, sim: ExchangeSimulator, ws: ServerConnection):
+        self.sim = sim
+        self.ws = ws
+        self.rng = random.Random(sim._rng.random())
+        self.assets: List[str] = []
+        # asset -> [tick, bids {price: size}, asks {price: size}]
+        self.books: Dict[str, list] = {}
+
+    def num_markets(self) -> int:
+        return len(self.assets)
+
+    async def _send(self, events: list):
+        await self.ws.send(json.dumps(events))
+        self.sim.frames_sent["polymarket"] += 1
+        self.sim.messages_sent["polymarket"] += len(events)
+
+    def _size(self) -> float:
+        return float(_now_us()) if self.sim.probe else float(self.rng.randint(1, 5000))
+
+    def _book(self, asset: str) -> list:
+        book = self.books.get(asset)
+        if book is None:
+            r = self.rng
+            book = self.books[asset] = [0.01,
+                                        {p / 100: self._size() for p in range(1, 50) if r.random() < 0.5},
+                                        {p / 100: self._size() for p in range(51, 100) if r.random() < 0.5}]
+        return book
+
+    def _book_event(self, asset: str) -> dict:
+        _, bids, asks = self._book(asset)
+        return {"event_type": "book", "asset_id": asset, "market": f"0x{asset}",
+                "bids": [{"price": f"{p:g}", "size": f"{s:g}"} for p, s in sorted(bids.items())],
+                "asks": [{"price": f"{p:g}", "size": f"{s:g}"} for p, s in sorted(asks.items())],
+                "timestamp": str(time.time_ns() // 10 ** 6), "hash": f"{self.rng.getrandbits(64):016x}"}
+
+    async def _subscribe(self, assets: List[str]):
+        new = [a for a in assets if a not in self.assets]
+        self.assets.extend(new)
+        if new:
+            await self._send([self._book_event(a) for a in new])
+
+    async def on_command(self, message):
+        try:
+            cmd = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(cmd, dict):
+            return
+        assets = cmd.get("assets_ids") or []
+        if cmd.get("operation") == "unsubscribe":
+            self.assets = [a for a in self.assets if a not in assets]
+        else:  # the initial subscribe message, or operation "subscribe"
+            await self._subscribe(assets)
+
+    def _events(self, asset: str) -> List[dict]:
+        r = self.rng
+        book = self._book(asset)
+        now_ms = str(time.time_ns() // 10 ** 6)
+        if r.random() < self.sim.tick_size_change_rate:
+            old = book[0]
+            book[0] = 0.001 if old == 0.01 else 0.01
+            events = []
+            if book[0] > old:
+                # resting orders off the coarser grid are cancelled first
+                off = [(side, p) for side, levels in (("BUY", book[1]), ("SELL", book[2]))
+                       for p in levels if round(p * 1000) % 10]
+                for side, p in off:
+                    (book[1] if side == "BUY" else book[2]).pop(p)
+                if off:
+                    events.append({"event_type": "price_change", "asset_id": asset, "market": f"0x{asset}",
+                                   "changes": [{"price": f"{p:g}", "side": side, "size": "0"} for side, p in off],
+                                   "timestamp": now_ms, "hash": f"{r.getrandbits(64):016x}"})
+            events.append({"event_type": "tick_size_change", "asset_id": asset, "market": f"0x{asset}",
+                           "old_tick_size": f"{old:g}", "new_tick_size": f"{book[0]:g}", "timestamp": now_ms})
+            return events
+        tick = book[0]
+        steps = round(1 / tick)
+        if r.random() < self.sim.trade_share:
+            return [{"event_type": "last_trade_price", "asset_id": asset, "market": f"0x{asset}",
+                     "price": f"{round(r.randint(1, steps - 1) * tick, 3):g}", "size": f"{self._size():g}",
+                     "side": r.choice(("BUY", "SELL")), "fee_rate_bps": "0", "timestamp": now_ms}]
+        changes = []
+        for _ in range(r.randint(1, self.sim.max_changes)):
+            buy = r.random() < 0.5
+            i = r.randint(1, steps // 2 - 1) if buy else r.randint(steps // 2 + 1, steps - 1)
+            price = round(i * tick, 3)
+            levels = book[1] if buy else book[2]
+            size = 0.0 if price in levels and r.random() < 0.3 else self._size()
+            if size:
+                levels[price] = size
+            else:
+                levels.pop(price, None)
+            changes.append({"price": f"{price:g}", "side": "BUY" if buy else "SELL", "size": f"{size:g}"})
+        return [{"event_type": "price_change", "asset_id": asset, "market": f"0x{asset}", "changes": changes,
+                 "timestamp": now_ms, "hash": f"{r.getrandbits(64):016x}"}]
+
+    async def send_updates(self, n: int) -> int:
+        if not self.assets:
+            return 0
+        r = self.rng
+        sent = 0
+        while sent < n:
+            k = min(n - sent, r.randint(1, self.sim.batch))
+            await self._send([e for _ in range(k) for e in self._events(r.choice(self.assets))])
+            sent += k
+        return sent
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="local kalshi / polymarket feed simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--markets", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10.0, help="messages per second per subscribed market")
+    parser.add_argument("--burst-every", type=float, default=0.0)
+    parser.add_argument("--burst-seconds", type=float, default=0.0)
+    parser.add_argument("--burst-factor", type=float, default=1.0)
+    parser.add_argument("--kalshi-gap-rate", type=float, default=0.0)
+    parser.add_argument("--probe", action="store_true", help="polymarket sizes carry the send time in us")
+    parser.add_argument("--trade-share", type=float, default=0.0, help="share of messages that are trades")
+    parser.add_argument("--rest-port", type=int, default=9101)
+    parser.add_argument("--rest-rate", type=float, default=0.0, help="REST reads per second before 429s")
+    parser.add_argument("--rest-write-rate", type=float, default=0.0, help="REST writes per second before 429s")
+    args = parser.parse_args()
+    sim = ExchangeSimulator(args.host, args.port, markets=args.markets, rate=args.rate,
+                            burst_every=args.burst_every, burst_seconds=args.burst_seconds,
+                            burst_factor=args.burst_factor, kalshi_gap_rate=args.kalshi_gap_rate, probe=args.probe,
+                            trade_share=args.trade_share, rest_rate=args.rest_rate,
+                            rest_write_rate=args.rest_write_rate, rest_port=args.rest_port)
+    print(f"kalshi at {sim.kalshi_url} (REST {sim.kalshi_http_url}), polymarket at {sim.polymarket_url}")
+    asyncio.run(sim.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Fast, schema-aware decoding of exchange frames.
+
+Every server -> client pydantic model in kalshi_tickerv2_dtypes and
+polymarket_wss_dtypes gets a namedtuple "struct" with the same field names,
+built once at import time from the model's fields. Decoding a frame is
+json.loads plus positional tuple construction: no validation, no Decimal,
+no pydantic machinery. Nested models decode to nested structs, Decimal and
+float fields decode to float, int fields accept the stringified ints
+polymarket sends. Lists of scalars are passed through as parsed.
+
+The pydantic models remain the reference schema; use them when you want
+validation or are debugging a feed.
+"""
+import json
+import types
+from collections import namedtuple
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+import kalshi_tickerv2_dtypes as ktypes
+import polymarket_wss_dtypes as ptypes
+
+try:
+    import orjson
+    _loads: Callable[[Any], Any] = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+Converter = Optional[Callable[[Any], Any]]
+
+_DECODERS: Dict[type, Tuple[type, Callable[[dict], tuple]]] = {}
+
+
+def _as_int(v):
+    return v if type(v) is int else int(v)
+
+
+def _as_float(v):
+    return v if type(v) is float else float(v)
+
+
+def _converter(annotation) -> Converter:
+    """ per-field conversion; None means the parsed JSON value is used as is """
+    origin = get_origin(annotation)
+    if origin is Union or origin is types.UnionType:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        inner = _converter(args[0]) if len(args) == 1 else None
+        if inner is None:
+            return None
+        return lambda v: None if v is None else inner(v)
+    if origin is list:
+        inner = _converter(get_args(annotation)[0])
+        if inner is None or not _is_model(get_args(annotation)[0]):
+            return None
+        return lambda v: [inner(x) for x in v]
+    if _is_model(annotation):
+        return _decoder_for(annotation)[1]
+    if annotation is float or annotation is Decimal:
+        return _as_float
+    if annotation is int:
+        return _as_int
+    return None
+
+
+def _is_model(annotation) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _decoder_for(model: type[BaseModel]) -> Tuple[type, Callable[[dict], tuple]]:
+    if model in _DECODERS:
+        return _DECODERS[model]
+    names, args = [], []
+    namespace: Dict[str, Any] = {}
+    for i, (name, field) in enumerate(model.model_fields.items()):
+        names.append(name)
+        key = repr(field.alias or name)
+        conv = _converter(field.annotation)
+        if conv is None:
+            args.append(f"d.get({key})")
+        else:
+            namespace[f"_c{i}"] = conv
+            args.append(f"(None if (v := d.get({key})) is None else _c{i}(v))")
+    struct = namedtuple(model.__name__.removesuffix('Message'), names)
+    struct.__doc__ = f"Unvalidated struct mirroring {model.__module__}.{model.__name__}"
+
+    # Generated straight-line decoder (the same trick namedtuple uses): one
+    # dict lookup per field and a direct tuple.__new__, no per-field loop.
+    namespace["_new"] = tuple.__new__
+    namespace["_struct"] = struct
+    src = f"def decode(d):\n    return _new(_struct, ({', '.join(args)},))\n"
+    exec(src, namespace)
+    decode = namespace["decode"]
+
+    _DECODERS[model] = (struct, decode)
+    return struct, decode
+
+
+def struct_for(model: type[BaseModel]) -> type:
+    """ the namedtuple type that `model` decodes to """
+    return _decoder_for(model)[0]
+
+
+def _by_discriminator(module, field: str) -> Dict[str, Callable[[dict], tuple]]:
+    table = {}
+    for obj in vars(module).values():
+        if not _is_model(obj) or obj.__module__ != module.__name__ or field not in obj.model_fields:
+            continue
+        annotation = obj.model_fields[field].annotation
+        if get_origin(annotation) is Literal and len(get_args(annotation)) == 1:
+            table[get_args(annotation)[0]] = _decoder_for(obj)[1]
+    return table
+
+
+_KALSHI = _by_discriminator(ktypes, 'type')
+_POLYMARKET = _by_discriminator(ptypes, 'event_type')
+
+# Structs the websocket handlers match on
+OrderbookSnapshot = struct_for(ktypes.OrderbookSnapshotMessage)
+OrderbookDelta = struct_for(ktypes.OrderbookDeltaMessage)
+Subscribed = struct_for(ktypes.SubscribedMessage)
+TickerV2 = struct_for(ktypes.TickerV2Message)
+Book = struct_for(ptypes.BookMessage)
+PriceChange = struct_for(ptypes.PriceChangeMessage)
+TickSizeChange = struct_for(ptypes.TickSizeChangeMessage)
+LastTradePrice = struct_for(ptypes.LastTradePriceMessage)
+
+
+def decode_kalshi(msg: str | bytes) -> tuple | dict:
+    """ decode one kalshi frame; unknown message types come back as the parsed dict """
+    d = _loads(msg)
+    decode = _KALSHI.get(d.get('type'))
+    return decode(d) if decode is not None else d
+
+
+def decode_polymarket(msg: str | bytes) -> List[tuple | dict]:
+    """ decode one polymarket frame (a list of events, or a single event) """
+    parsed = _loads(msg)
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    out = []
+    for d in parsed:
+        decode = _POLYMARKET.get(d.get('event_type'))
+        out.append(decode(d) if decode is not None else d)
+    return out
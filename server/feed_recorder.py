@@ -0,0 +1,267 @@
+"""
+Record raw exchange frames to disk and replay them into a ServerState.
+
+A recording is a directory of append-only segments, each at most
+`segment_bytes` of records:
+
+    segment  16-byte header: magic "PREDREC\\x01", u32 version, u32 flags
+             (bit 0: the records that follow are one zlib stream), then records
+    record   u64 recv_ns (time.time_ns() when the frame was received),
+             u8 exchange (1 kalshi, 2 polymarket), u16 stream (the
+             connection; see ConnectionPool), u8 kind (0 text, 1 binary),
+             u32 length, then the frame exactly as received
+
+Segments are named <n>.rec in order. The recorder buffers in memory and
+writes every `buffer_bytes` or `flush_interval` seconds (`run` keeps the
+timer going while the feeds are quiet), so recording costs the feed a bytes
+join, not a syscall, per frame. A compressed segment is
+sync-flushed on each write, so a crash loses at most the unwritten buffer;
+readers stop cleanly at a truncated tail.
+
+`replay` pushes a recording through the same apply functions the live
+handlers use (pydantic, fast_decode or native ingest), in recorded order,
+with the recorded connection of each frame, at recorded speed, scaled, or
+as fast as possible. bench/bench_replay.py drives it from the command line.
+
+    with FeedRecorder("recordings/2025-06-01", compress=True) as rec:
+        pool = ConnectionPool(state, recorder=rec)
+        await asyncio.gather(pool.run(), rec.run(), ...)
+    stats = replay("recordings/2025-06-01", ServerState(), ingest="native")
+"""
+import asyncio
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+MAGIC = b"PREDREC\x01"
+VERSION = 1
+FLAG_ZLIB = 1
+
+EXCHANGES = ("kalshi", "polymarket")
+_EXCHANGE_CODES = {ex: i + 1 for i, ex in enumerate(EXCHANGES)}
+
+_SEGMENT = struct.Struct("<8sII")
+_RECORD = struct.Struct("<QBHBI")
+
+
+class Frame(NamedTuple):
+    recv_ns: int
+    exchange_id: str
+    stream: int
+    data: str | bytes
+
+
+class FeedRecorder:
+    """ appends raw frames to a segmented log in `directory` """
+
+    def __init__(self, directory: str | os.PathLike, compress: bool = False, segment_bytes: int = 256 << 20,
+                 buffer_bytes: int = 1 << 20, flush_interval: float = 1.0, compress_level: int = 3):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._compress = compress
+        self._compress_level = compress_level
+        self._segment_bytes = segment_bytes
+        self._buffer_bytes = buffer_bytes
+        self._flush_interval = flush_interval
+        self._buffer: list = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._zlib = None
+        self._segment_used = 0
+        existing = [int(p.stem) for p in self.directory.glob("*.rec") if p.stem.isdigit()]
+        self._next_segment = max(existing, default=0) + 1
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_written = 0
+        self.segments = 0
+
+    def record(self, exchange_id: str, stream: int, frame: str | bytes, recv_ns: Optional[int] = None):
+        """ append one frame as received from `exchange_id` on connection `stream` """
+        if recv_ns is None:
+            recv_ns = time.time_ns()
+        if type(frame) is str:
+            data, kind = frame.encode(), 0
+        else:
+            data, kind = bytes(frame), 1
+        head = _RECORD.pack(recv_ns, _EXCHANGE_CODES[exchange_id], stream, kind, len(data))
+        self._buffer.append(head)
+        self._buffer.append(data)
+        self._buffered += len(head) + len(data)
+        self.frames += 1
+        self.bytes_in += len(data)
+        if self._buffered >= self._buffer_bytes or time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    async def run(self):
+        """ flush at least every `flush_interval` seconds, frames or not """
+        while True:
+            wait = self._last_flush + self._flush_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            else:
+                self.flush()
+
+    def flush(self):
+        """ write buffered frames to the current segment """
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is None or self._segment_used >= self._segment_bytes:
+            self._open_segment()
+        chunk = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        self._segment_used += len(chunk)
+        if self._zlib is not None:
+            chunk = self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        self._file.write(chunk)
+        self._file.flush()
+        self.bytes_written += len(chunk)
+
+    def _open_segment(self):
+        self._close_segment()
+        path = self.directory / f"{self._next_segment:06d}.rec"
+        self._next_segment += 1
+        self._file = open(path, "wb")
+        self._file.write(_SEGMENT.pack(MAGIC, VERSION, FLAG_ZLIB if self._compress else 0))
+        self._zlib = zlib.compressobj(self._compress_level) if self._compress else None
+        self._segment_used = 0
+        self.segments += 1
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        if self._zlib is not None:
+            self._file.write(self._zlib.flush(zlib.Z_FINISH))
+            self._zlib = None
+        self._file.close()
+        self._file = None
+
+    def close(self):
+        self.flush()
+        self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "bytes_in": self.bytes_in,
+            "bytes_written": self.bytes_written,
+            "segments": self.segments,
+        }
+
+
+def _segment_chunks(path: Path, chunk_bytes: int = 1 << 20) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        head = f.read(_SEGMENT.size)
+        if len(head) < _SEGMENT.size:
+            return
+        magic, version, flags = _SEGMENT.unpack(head)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a feed recording segment (or a different version)")
+        z = zlib.decompressobj() if flags & FLAG_ZLIB else None
+        while chunk := f.read(chunk_bytes):
+            yield z.decompress(chunk) if z is not None else chunk
+
+
+def read_recording(path: str | os.PathLike) -> Iterator[Frame]:
+    """ every frame in a recording directory (or a single segment), in recorded order """
+    path = Path(path)
+    segments = sorted(path.glob("*.rec")) if path.is_dir() else [path]
+    for segment in segments:
+        buf = b""
+        for chunk in _segment_chunks(segment):
+            buf = buf + chunk if buf else chunk
+            off, n = 0, len(buf)
+            while off + _RECORD.size <= n:
+                recv_ns, code, stream, kind, length = _RECORD.unpack_from(buf, off)
+                end = off + _RECORD.size + length
+                if end > n:
+                    break
+                data = buf[off + _RECORD.size:end]
+                yield Frame(recv_ns, EXCHANGES[code - 1], stream, data.decode() if kind == 0 else data)
+                off = end
+            buf = buf[off:]
+        # anything left in buf is a record cut short by a crash
+
+
+class ReplayStats(NamedTuple):
+    frames: int
+    bytes: int
+    errors: int
+    seconds: float            # wall time spent replaying
+    recorded_seconds: float   # span of the recording
+    max_lag_ms: float         # worst time behind schedule (paced replays)
+    per_exchange: Dict[str, int]
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+
+def _appliers(state, ingest: str) -> Dict[str, Callable[[str | bytes, int], None]]:
+    # imported here so recording needs nothing but the standard library
+    import websocket_handlers as wh
+    fast = ingest != "pydantic"
+    if ingest == "native":
+        return {
+            "kalshi": lambda msg, stream: wh._ingest_kalshi_native(state, msg, fast, None, stream),
+            "polymarket": lambda msg, stream: wh._ingest_polymarket_native(state, msg, fast),
+        }
+    if ingest not in ("pydantic", "fast"):
+        raise ValueError(f"unknown ingest path {ingest!r}")
+    return {
+        "kalshi": lambda msg, stream: wh._update_serverstate_from_kalshi(state, msg, None, fast, None, stream),
+        "polymarket": lambda msg, stream: wh._update_serverstate_from_polymarket(state, msg, None, fast),
+    }
+
+
+def replay(path: str | os.PathLike, state, ingest: str = "native", speed: float = 0.0,
+           apply: Optional[Callable[[Frame], None]] = None, limit: Optional[int] = None) -> ReplayStats:
+    """
+    Apply a recording to `state`. `ingest` is "pydantic", "fast" or "native"
+    (the handlers' decode paths), or pass `apply(frame)` to use your own.
+    `speed` 1.0 replays at recorded pace, 10.0 ten times faster, 0 as fast as
+    possible. Frames that fail to apply are counted, not raised.
+    """
+    appliers = None if apply is not None else _appliers(state, ingest)
+    frames = nbytes = errors = 0
+    per_exchange: Dict[str, int] = {}
+    first_ns = last_ns = None
+    max_lag = 0
+    start = time.perf_counter_ns()
+    for frame in read_recording(path):
+        if limit is not None and frames >= limit:
+            break
+        if first_ns is None:
+            first_ns = frame.recv_ns
+        last_ns = frame.recv_ns
+        if speed > 0:
+            due = start + (frame.recv_ns - first_ns) / speed
+            ahead = due - time.perf_counter_ns()
+            if ahead > 0:
+                time.sleep(ahead / 1e9)
+            else:
+                max_lag = max(max_lag, -ahead)
+        try:
+            if apply is not None:
+                apply(frame)
+            else:
+                appliers[frame.exchange_id](frame.data, frame.stream)
+        except Exception:
+            errors += 1
+        frames += 1
+        nbytes += len(frame.data)
+        per_exchange[frame.exchange_id] = per_exchange.get(frame.exchange_id, 0) + 1
+    seconds = (time.perf_counter_ns() - start) / 1e9
+    recorded = (last_ns - first_ns) / 1e9 if first_ns is not None else 0.0
+    return ReplayStats(frames, nbytes, errors, seconds, recorded, max_lag / 1e6, per_exchange)
@@ -5,19 +5,22 @@ from types import FunctionType
 import requests
 import base64
 import time
-from typing import Any, Awaitable, Coroutine, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Coroutine, Dict, Iterator, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
 import json
 import websockets
 from websockets import Data
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+from concurrent.futures import ThreadPoolExecutor
 
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding, rsa
 from cryptography.exceptions import InvalidSignature
 
-from kalshi_tickerv2_dtypes import SubscribeCommand, SubscribeParams
+from kalshi_tickerv2_dtypes import (SubscribeCommand, SubscribeParams, UnsubscribeCommand, UnsubscribeParams,
+                                    UpdateSubscriptionCommand, UpdateSubscriptionParams)
 
 
 class Environment(Enum):
@@ -31,6 +34,8 @@ class KalshiBaseClient:
         key_id: str,
         private_key: rsa.RSAPrivateKey,
         environment: Environment = Environment.DEMO,
+        http_base_url: Optional[str] = None,
+        ws_base_url: Optional[str] = None,
     ):
         """Initializes the client with the provided API key and private key.
 
@@ -38,6 +43,8 @@ class KalshiBaseClient:
             key_id (str): Your Kalshi API key ID.
             private_key (rsa.RSAPrivateKey): Your RSA private key.
             environment (Environment): The API environment to use (DEMO or PROD).
+            http_base_url, ws_base_url (str): override the environment's hosts,
+                e.g. to point at a local exchange simulator (exchange_sim.py).
         """
         self.key_id = key_id
         self.private_key = private_key
@@ -52,6 +59,10 @@ class KalshiBaseClient:
             self.WS_BASE_URL = "wss://api.elections.kalshi.com"
         else:
             raise ValueError("Invalid environment")
+        if http_base_url:
+            self.HTTP_BASE_URL = http_base_url.rstrip("/")
+        if ws_base_url:
+            self.WS_BASE_URL = ws_base_url.rstrip("/")
 
     def request_headers(self, method: str, path: str) -> Dict[str, Any]:
         """Generates the required authentication headers for API requests."""
@@ -95,9 +106,11 @@ class KalshiHttpClient(KalshiBaseClient):
         key_id: str,
         private_key: rsa.RSAPrivateKey,
         environment: Environment = Environment.DEMO,
+        http_base_url: Optional[str] = None,
     ):
-        super().__init__(key_id, private_key, environment)
+        super().__init__(key_id, private_key, environment, http_base_url=http_base_url)
         self.host = self.HTTP_BASE_URL
+        self.session = requests.Session()  # keeps connections alive between calls
         self.exchange_url = "/trade-api/v2/exchange"
         self.markets_url = "/trade-api/v2/markets"
         self.portfolio_url = "/trade-api/v2/portfolio"
@@ -120,7 +133,7 @@ class KalshiHttpClient(KalshiBaseClient):
     def post(self, path: str, body: dict) -> Any:
         """Performs an authenticated POST request to the Kalshi API."""
         self.rate_limit()
-        response = requests.post(
+        response = self.session.post(
             self.host + path,
             json=body,
             headers=self.request_headers("POST", path)
@@ -131,7 +144,7 @@ class KalshiHttpClient(KalshiBaseClient):
     def get(self, path: str, params: Dict[str, Any] = {}) -> Any:
         """Performs an authenticated GET request to the Kalshi API."""
         self.rate_limit()
-        response = requests.get(
+        response = self.session.get(
             self.host + path,
             headers=self.request_headers("GET", path),
             params=params
@@ -142,7 +155,7 @@ class KalshiHttpClient(KalshiBaseClient):
     def delete(self, path: str, params: Dict[str, Any] = {}) -> Any:
         """Performs an authenticated DELETE request to the Kalshi API."""
         self.rate_limit()
-        response = requests.delete(
+        response = self.session.delete(
             self.host + path,
             headers=self.request_headers("DELETE", path),
             params=params
@@ -178,6 +191,211 @@ class KalshiHttpClient(KalshiBaseClient):
         params = {k: v for k, v in params.items() if v is not None}
         return self.get(self.markets_url + '/trades', params=params)
 
+    def iter_trades(
+        self,
+        ticker: Optional[str] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+        max_ts: Optional[int] = None,
+        min_ts: Optional[int] = None,
+    ) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+        """Yields (trades, next cursor) page by page, newest first, until the cursor runs out."""
+        while True:
+            page = self.get_trades(ticker=ticker, limit=limit, cursor=cursor or None, max_ts=max_ts, min_ts=min_ts)
+            cursor = page.get('cursor') or ''
+            yield page.get('trades') or [], cursor
+            if not cursor:
+                return
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, at most `burst` banked.
+    Waiters are served in arrival order and sleep instead of blocking the loop.
+
+    `backoff(seconds)` is for a 429: nothing is handed out until the
+    Retry-After has passed, the bucket refills from empty, and the rate (and
+    burst) are halved, at most once per backoff and not below `min_rate`.
+    Each `recover()` (a successful request) wins back 1/32 of the configured
+    rate, so the bucket settles just under the server's real limit.
+    """
+    def __init__(self, rate: float, burst: Optional[float] = None, min_rate: Optional[float] = None):
+        self.max_rate = self.rate = rate
+        self.max_burst = self.burst = burst if burst is not None else rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waits = 0
+        self.backoffs = 0
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self.waits += 1
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                self.waits += 1
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def backoff(self, seconds: float) -> None:
+        now = time.monotonic()
+        if now >= self._paused_until:
+            # the first 429 since the last pause ended; ones from requests
+            # already in flight only extend the pause
+            self.backoffs += 1
+            self._set_rate(self.rate / 2)
+        until = now + seconds
+        if until > self._paused_until:
+            self._paused_until = self._last = until
+            self._tokens = 0.0
+
+    def recover(self) -> None:
+        if self.rate < self.max_rate:
+            self._set_rate(self.rate + self.max_rate / 32)
+
+    def _set_rate(self, rate: float) -> None:
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.burst = max(1.0, self.max_burst * self.rate / self.max_rate)
+        self._tokens = min(self._tokens, self.burst)
+
+# Kalshi's basic tier: 20 reads and 10 writes per second
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {"read": (20.0, 20.0), "write": (10.0, 10.0)}
+
+class AsyncKalshiHttpClient(KalshiBaseClient):
+    """
+    Non-blocking client for the Kalshi REST API, safe to share an event loop
+    with the websocket ingest. Requests wait on an async token bucket per
+    endpoint class (`limits`: class -> (rate per second, burst); by default
+    GETs are "read" and everything else "write", see `endpoint_class`), then
+    sign (RSA-PSS) and send on a worker thread over a pooled requests.Session
+    of up to `max_connections` keep-alive connections. A 429 backs off the
+    whole endpoint class, not just the request that got it: its bucket pauses
+    for the Retry-After and slows down (see TokenBucket.backoff). The request
+    is then retried, up to `max_retries` times.
+    """
+    def __init__(
+        self,
+        key_id: str,
+        private_key: rsa.RSAPrivateKey,
+        environment: Environment = Environment.DEMO,
+        http_base_url: Optional[str] = None,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_connections: int = 8,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+    ):
+        super().__init__(key_id, private_key, environment, http_base_url=http_base_url)
+        self.host = self.HTTP_BASE_URL
+        self.exchange_url = "/trade-api/v2/exchange"
+        self.markets_url = "/trade-api/v2/markets"
+        self.portfolio_url = "/trade-api/v2/portfolio"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="kalshi-http")
+        self.limiters = {name: TokenBucket(rate, burst) for name, (rate, burst) in (limits or DEFAULT_RATE_LIMITS).items()}
+        self.retries = 0
+
+    def endpoint_class(self, method: str, path: str) -> str:
+        """ which rate limit a request counts against """
+        return "read" if method == "GET" else "write"
+
+    def _send(self, method: str, path: str, params: Optional[Dict[str, Any]], body: Optional[dict]) -> requests.Response:
+        # on a worker thread: signing and the blocking I/O stay off the event loop
+        return self.session.request(method, self.host + path, params=params, json=body, timeout=self.timeout,
+                                    headers=self.request_headers(method, path))
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                      body: Optional[dict] = None) -> Any:
+        """Performs an authenticated, rate limited request to the Kalshi API."""
+        limiter = self.limiters[self.endpoint_class(method, path)]
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            response = await loop.run_in_executor(self._executor, self._send, method, path, params, body)
+            if response.status_code != 429:
+                limiter.recover()
+                break
+            try:
+                delay = float(response.headers.get("Retry-After", 1.0))
+            except ValueError:  # an HTTP date
+                delay = 1.0
+            # every caller waiting on this bucket holds off, so the retries
+            # don't all land in the next window together
+            limiter.backoff(delay)
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+        if response.status_code not in range(200, 299):
+            response.raise_for_status()
+        return response.json()
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return await self.request("GET", path, params=params)
+
+    async def post(self, path: str, body: dict) -> Any:
+        return await self.request("POST", path, body=body)
+
+    async def delete(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return await self.request("DELETE", path, params=params)
+
+    async def get_balance(self) -> Dict[str, Any]:
+        """Retrieves the account balance."""
+        return await self.get(self.portfolio_url + '/balance')
+
+    async def get_exchange_status(self) -> Dict[str, Any]:
+        """Retrieves the exchange status."""
+        return await self.get(self.exchange_url + "/status")
+
+    async def get_trades(
+        self,
+        ticker: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        max_ts: Optional[int] = None,
+        min_ts: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Retrieves one page of trades based on provided filters."""
+        params = {'ticker': ticker, 'limit': limit, 'cursor': cursor, 'max_ts': max_ts, 'min_ts': min_ts}
+        return await self.get(self.markets_url + '/trades', {k: v for k, v in params.items() if v is not None})
+
+    async def iter_trades(
+        self,
+        ticker: Optional[str] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+        max_ts: Optional[int] = None,
+        min_ts: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], str]]:
+        """Yields (trades, next cursor) page by page, newest first, until the cursor runs out."""
+        while True:
+            page = await self.get_trades(ticker=ticker, limit=limit, cursor=cursor or None, max_ts=max_ts, min_ts=min_ts)
+            cursor = page.get('cursor') or ''
+            yield page.get('trades') or [], cursor
+            if not cursor:
+                return
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
 class KalshiWebSocketClient(KalshiBaseClient):
     """Client for handling WebSocket connections to the Kalshi API."""
     def __init__(
@@ -189,9 +407,19 @@ class KalshiWebSocketClient(KalshiBaseClient):
         on_error_callback: FunctionType = lambda self, err: None,
         on_close_callback: FunctionType = lambda self, status_code, msg: None,
         on_open_callback: FunctionType = lambda self: None,
-        tickers: List[str] | None = None
+        tickers: List[str] | None = None,
+        orderbook_sid_per_market: bool = True,
+        ws_base_url: Optional[str] = None,
+        trades: bool = False,
     ):
-        super().__init__(key_id, private_key, environment)
+        """
+        orderbook_sid_per_market: subscribe to orderbook_delta once per market,
+        so each market gets its own sid and a seq gap pins down the one book
+        that missed a message (see websocket_handlers.KalshiResync).
+        ws_base_url: connect here instead of the environment's host.
+        trades: also subscribe the markets to the trade channel.
+        """
+        super().__init__(key_id, private_key, environment, ws_base_url=ws_base_url)
         self.ws: websockets.ClientConnection = None # type: ignore
         self.url_suffix = "/trade-api/ws/v2"
         self.message_id = 1  # Add counter for message IDs
@@ -200,6 +428,13 @@ class KalshiWebSocketClient(KalshiBaseClient):
         self.on_close_callback = on_close_callback
         self.on_open_callback = on_open_callback
         self.tickers = tickers
+        self.orderbook_sid_per_market = orderbook_sid_per_market
+        # channels with one subscription shared by all the connection's markets
+        self.market_channels = ["ticker", "trade"] if trades else ["ticker"]
+        # sid -> (channel, tickers) from the server's "subscribed" replies
+        self.subscriptions: Dict[int, Tuple[str, List[str]]] = {}
+        # subscribe command id -> (tickers, channels not yet acknowledged)
+        self._requested: Dict[int, Tuple[List[str], Set[str]]] = {}
 
     async def connect(self):
         """Establishes a WebSocket connection using authentication."""
@@ -218,18 +453,118 @@ class KalshiWebSocketClient(KalshiBaseClient):
 
     async def subscribe_to_tickers(self, tickers: List[str] | None):
         """Subscribe to ticker updates for all markets."""
+        if tickers is not None and not tickers:
+            return  # every market was removed; add_markets subscribes new ones
+        if self.orderbook_sid_per_market and tickers:
+            await self.subscribe(self.market_channels, tickers)
+            for ticker in tickers:
+                await self.subscribe(["orderbook_delta"], [ticker])
+        else:
+            await self.subscribe(self.market_channels + ["orderbook_delta"], tickers)
+
+    async def subscribe(self, channels: List[str], tickers: List[str] | None):
+        """Send one subscribe command."""
         subscription_message = SubscribeCommand(
             id = self.message_id,
             cmd = "subscribe",
             params = SubscribeParams(
-                channels = ["ticker", "orderbook_delta"],
+                channels = channels,
                 market_tickers = tickers
             )
         )
-        print(subscription_message.model_dump_json(exclude_none=True))
+        self._requested[self.message_id] = (list(tickers or []), set(channels))
         await self.ws.send(subscription_message.model_dump_json(exclude_none=True), text=True)
         self.message_id += 1
 
+    async def unsubscribe(self, sids: List[int]):
+        """Drop whole subscriptions."""
+        command = UnsubscribeCommand(id = self.message_id, cmd = "unsubscribe", params = UnsubscribeParams(sids = sids))
+        for sid in sids:
+            self.subscriptions.pop(sid, None)
+        await self.ws.send(command.model_dump_json(exclude_none=True), text=True)
+        self.message_id += 1
+
+    async def update_subscription(self, sid: int, tickers: List[str], action: str):
+        """Add markets to or delete markets from subscription `sid`."""
+        command = UpdateSubscriptionCommand(
+            id = self.message_id,
+            cmd = "update_subscription",
+            params = UpdateSubscriptionParams(
+                sids = [sid],
+                market_tickers = tickers,
+                action = action, # type: ignore
+            )
+        )
+        await self.ws.send(command.model_dump_json(exclude_none=True), text=True)
+        self.message_id += 1
+
+    def _sids(self, channel: str, ticker: str | None = None) -> List[int]:
+        return [sid for sid, (ch, ts) in self.subscriptions.items()
+                if ch == channel and (ticker is None or ts == [ticker])]
+
+    async def add_markets(self, tickers: List[str]):
+        """Start receiving markets on the open connection; later connections subscribe them too."""
+        if self.tickers is None:
+            raise ValueError("subscribed to every market, cannot add or remove markets")
+        tickers = [t for t in tickers if t not in self.tickers]
+        self.tickers.extend(tickers)
+        if self.ws is None or not tickers:
+            return
+        for channel in self.market_channels:
+            shared = self._sids(channel)
+            if shared:
+                await self.update_subscription(shared[0], tickers, "add_markets")
+                self.subscriptions[shared[0]][1].extend(tickers)
+            else:
+                await self.subscribe([channel], tickers)
+        if self.orderbook_sid_per_market:
+            for ticker in tickers:
+                await self.subscribe(["orderbook_delta"], [ticker])
+        else:
+            for sid in self._sids("orderbook_delta"):
+                await self.update_subscription(sid, tickers, "add_markets")
+                self.subscriptions[sid][1].extend(tickers)
+
+    async def remove_markets(self, tickers: List[str]):
+        """Stop receiving markets, without touching the rest of the connection."""
+        if self.tickers is None:
+            raise ValueError("subscribed to every market, cannot add or remove markets")
+        tickers = [t for t in tickers if t in self.tickers]
+        for t in tickers:
+            self.tickers.remove(t)
+        if self.ws is None or not tickers:
+            return
+        shared = [sid for channel in self.market_channels for sid in self._sids(channel)]
+        if self.orderbook_sid_per_market:
+            own = [sid for t in tickers for sid in self._sids("orderbook_delta", t)]
+            if own:
+                await self.unsubscribe(own)
+        else:
+            shared += self._sids("orderbook_delta")
+        for sid in shared:
+            await self.update_subscription(sid, tickers, "delete_markets")
+            channel_tickers = self.subscriptions[sid][1]
+            channel_tickers[:] = [t for t in channel_tickers if t not in tickers]
+
+    def _track_subscribed(self, message: str):
+        reply = json.loads(message)
+        if reply.get("type") == "subscribed":
+            # one reply per channel of the command; forget the command after the last
+            requested = self._requested.get(reply.get("id"))
+            channel = reply["msg"]["channel"]
+            self.subscriptions[reply["msg"]["sid"]] = (channel, list(requested[0]) if requested else [])
+            if requested is not None:
+                requested[1].discard(channel)
+                if not requested[1]:
+                    del self._requested[reply["id"]]
+        elif reply.get("type") == "error":
+            self._requested.pop(reply.get("id"), None)
+
+    async def resnapshot(self, sid: int, tickers: List[str]):
+        """Re-add markets to their orderbook subscription; kalshi answers with fresh snapshots."""
+        await self.update_subscription(sid, tickers, "delete_markets")
+        await self.update_subscription(sid, tickers, "add_markets")
+
     async def handler(self):
         """Handle incoming messages."""
         try:
@@ -243,6 +578,8 @@ class KalshiWebSocketClient(KalshiBaseClient):
     async def on_message(self, message):
         """Callback for handling incoming messages."""
         # print("Received message:", message)
+        if '"subscribed"' in message or '"error"' in message:
+            self._track_subscribed(message)
         res = self.on_message_callback(self, message) # type: ignore
         if isinstance(res, Coroutine):
             await res
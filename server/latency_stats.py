@@ -0,0 +1,203 @@
+"""
+Feed latency histograms: how stale the books are, and where the time goes.
+
+For every frame, per exchange and message type, three intervals:
+
+    exchange  the exchange's own timestamp -> frame received (polymarket
+              `timestamp` in ms; kalshi only stamps ticker messages, `ts` in
+              whole seconds, so its resolution is a second). Includes clock
+              skew; negative values count as 0.
+    decode    received -> decoded: time in the ingest queue (event-loop
+              stalls show up here) plus parsing. With native ingest parsing
+              happens inside the apply call, so this is the queue wait.
+    apply     decoded -> applied to the ServerState; for batched updates,
+              until the batch is flushed.
+
+Histograms are HDR-style: exact below 32 us, then 16 buckets per power of
+two (about 3% relative error), up to about 19 hours. Recording is a few
+integer ops and a list increment. Read them with `FeedLatency.snapshot()`,
+or scrape `FeedLatency.prometheus()` over HTTP with `serve_metrics`.
+
+    latency = FeedLatency()
+    pool = ConnectionPool(state, latency=latency)
+    asyncio.create_task(serve_metrics(latency, port=9464))
+"""
+import asyncio
+import re
+from typing import Dict, List, Optional, Tuple
+
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS        # exact values below this
+_HALF = _SUB >> 1
+_MAX_EXP = 32                # bucket lower bounds up to 2**36 us
+_BUCKETS = _SUB + _MAX_EXP * _HALF
+
+INTERVALS = ("exchange", "decode", "apply")
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _bucket(v: int) -> int:
+    if v < _SUB:
+        return v if v > 0 else 0
+    e = v.bit_length() - _SUB_BITS
+    if e > _MAX_EXP:
+        return _BUCKETS - 1
+    return _SUB + (e - 1) * _HALF + (v >> e) - _HALF
+
+
+def _bucket_value(i: int) -> float:
+    """ midpoint of bucket i, in us """
+    if i < _SUB:
+        return float(i)
+    e = (i - _SUB) // _HALF + 1
+    low = ((i - _SUB) % _HALF + _HALF) << e
+    return low + (1 << e) / 2
+
+
+class LatencyHistogram:
+    """ counts of microsecond latencies in log-linear buckets """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, us: int):
+        if us < 0:
+            us = 0
+        self.counts[_bucket(us)] += 1
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                return min(_bucket_value(i), float(self.max))
+        return float(self.max)
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            **{f"p{q * 100:g}_us": self.quantile(q) for q in QUANTILES},
+            "max_us": float(self.max),
+        }
+
+
+# exchange id -> (message type, exchange timestamp, timestamp units in ns)
+_SNIFF = {
+    "polymarket": (re.compile(r'"event_type"\s*:\s*"(\w+)"'), re.compile(r'"timestamp"\s*:\s*"?(\d+)'), 1_000_000),
+    "kalshi": (re.compile(r'"type"\s*:\s*"(\w+)"'), re.compile(r'"ts"\s*:\s*(\d+)'), 1_000_000_000),
+}
+
+
+def sniff(exchange_id: str, frame) -> Tuple[str, int]:
+    """
+    (message type, exchange timestamp in ns or 0) of a raw frame, from its
+    first message; read from the text so it costs the same on every ingest path
+    """
+    if type(frame) is not str:
+        frame = bytes(frame).decode(errors="replace")
+    kind_re, ts_re, unit = _SNIFF[exchange_id]
+    m = kind_re.search(frame)
+    t = ts_re.search(frame)
+    return (m.group(1) if m else "unknown"), (int(t.group(1)) * unit if t else 0)
+
+
+class FeedLatency:
+    """ a LatencyHistogram per (exchange, message type, interval) """
+
+    def __init__(self):
+        self._hists: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+
+    def record(self, exchange_id: str, kind: str, interval: str, ns: int):
+        key = (exchange_id, kind, interval)
+        hist = self._hists.get(key)
+        if hist is None:
+            hist = self._hists[key] = LatencyHistogram()
+        hist.record(ns // 1000)
+
+    def frame(self, exchange_id: str, frame, recv_ns: int, decoded_ns: int, applied_ns: Optional[int]) -> str:
+        """
+        Record a frame's intervals; `applied_ns` None leaves "apply" to the
+        caller (a batch that has not flushed yet). Returns the message type.
+        """
+        kind, exchange_ns = sniff(exchange_id, frame)
+        if exchange_ns:
+            self.record(exchange_id, kind, "exchange", recv_ns - exchange_ns)
+        self.record(exchange_id, kind, "decode", decoded_ns - recv_ns)
+        if applied_ns is not None:
+            self.record(exchange_id, kind, "apply", applied_ns - decoded_ns)
+        return kind
+
+    def histogram(self, exchange_id: str, kind: Optional[str], interval: str) -> LatencyHistogram:
+        """ one histogram, or every message type of the exchange merged when `kind` is None """
+        if kind is not None:
+            return self._hists.get((exchange_id, kind, interval)) or LatencyHistogram()
+        merged = LatencyHistogram()
+        for (ex, _, iv), h in self._hists.items():
+            if ex == exchange_id and iv == interval:
+                merged.merge(h)
+        return merged
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, dict]]]:
+        """ {exchange: {message type: {interval: summary}}} """
+        out: Dict[str, Dict[str, Dict[str, dict]]] = {}
+        for (ex, kind, interval), h in sorted(self._hists.items()):
+            out.setdefault(ex, {}).setdefault(kind, {})[interval] = h.summary()
+        return out
+
+    def reset(self):
+        self._hists.clear()
+
+    def prometheus(self) -> str:
+        """ the histograms as Prometheus summaries (text exposition format) """
+        lines: List[str] = [
+            "# HELP predme_feed_latency_us Feed latency by exchange, message type and interval.",
+            "# TYPE predme_feed_latency_us summary",
+        ]
+        for (ex, kind, interval), h in sorted(self._hists.items()):
+            labels = f'exchange="{ex}",type="{kind}",interval="{interval}"'
+            for q in QUANTILES:
+                lines.append(f'predme_feed_latency_us{{{labels},quantile="{q:g}"}} {h.quantile(q):g}')
+            lines.append(f"predme_feed_latency_us_sum{{{labels}}} {h.total}")
+            lines.append(f"predme_feed_latency_us_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(latency: FeedLatency, host: str = "127.0.0.1", port: int = 9464):
+    """ answer every HTTP request with latency.prometheus() until cancelled """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # request line and headers; every path gets the metrics
+            body = latency.prometheus().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
@@ -5,15 +5,15 @@ import asyncio
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from socketserver import (
-    BaseRequestHandler,
-    StreamRequestHandler,
-    ThreadingTCPServer,
-    ThreadingMixIn
-)
 from kalshi_client import Environment
 from server_internal_dtypes import Auth_Kalshi, Endpoint
-from websocket_handlers import kalshi_ws_handler, polymarket_ws_handler
+from websocket_handlers import add_groups, add_kalshi_feed, add_polymarket_feed
+from connection_pool import ConnectionPool
+from feed_recorder import FeedRecorder
+from latency_stats import FeedLatency, serve_metrics
+from market_store import MarketCapture, MarketStore
+from client_server import ClientServer
+from spread_scanner import SpreadScanner
 from threading import Thread
 import json
 from orderbook_ext import ServerState
@@ -56,29 +56,92 @@ async def main():
         env=env
     )
     marks = []
-    if len(sys.argv) <= 1:
+    # 'group' anywhere in the arguments: the markets given are the same question on each exchange
+    argv = [a for a in sys.argv if a != 'group']
+    group_id = 0 if len(argv) < len(sys.argv) else None
+    if len(argv) <= 1:
         print("invalid arguments to main, must be > 1 cmd arugment ex: 'kalshi <id>' or 'poly <id>'")
         return
-    if 'poly' in sys.argv:
-        to_idx = sys.argv.index('kalshi') if 'kalshi' in sys.argv else len(sys.argv)
-        ids = sys.argv[sys.argv.index('poly')+1:to_idx]
-        marks.extend([Endpoint(description=None,group_id=None,market_name=None,token_id=None, exchange_id='polymarket', market_id=m) for m in ids])
-    if 'kalshi' in sys.argv:
-        to_idx = sys.argv.index('poly') if 'poly' in sys.argv else len(sys.argv)
-        ids = sys.argv[sys.argv.index('kalshi')+1:to_idx]
-        marks.extend([Endpoint(description=None,group_id=None,market_name=None,token_id=None, exchange_id='kalshi', market_id=m) for m in ids])
-    # Connect via WebSocket
+    if 'poly' in argv:
+        to_idx = argv.index('kalshi') if 'kalshi' in argv else len(argv)
+        ids = argv[argv.index('poly')+1:to_idx]
+        marks.extend([Endpoint(description=None,group_id=group_id,market_name=None,token_id=None, exchange_id='polymarket', market_id=m) for m in ids])
+    if 'kalshi' in argv:
+        to_idx = argv.index('poly') if 'poly' in argv else len(argv)
+        ids = argv[argv.index('kalshi')+1:to_idx]
+        marks.extend([Endpoint(description=None,group_id=group_id,market_name=None,token_id=None, exchange_id='kalshi', market_id=m) for m in ids])
+    # One state shared by the exchange handlers, the client socket and the display
+    state = ServerState()
+    # markets sharing a group_id are merged into one cross-venue book (state.get_group_depth)
+    groups = add_groups(state, marks)
+    # PREDME_RECORD_DIR: record every raw frame there (replay with bench/bench_replay.py)
+    record_dir = os.getenv('PREDME_RECORD_DIR')
+    recorder = FeedRecorder(record_dir, compress=True) if record_dir else None
+    # PREDME_METRICS_PORT: feed latency histograms, scraped over HTTP (Prometheus text)
+    metrics_port = os.getenv('PREDME_METRICS_PORT')
+    latency = FeedLatency() if metrics_port else None
+    # PREDME_STORE_DIR: keep trades and top-of-book changes there (read with market_store.MarketStore)
+    store_dir = os.getenv('PREDME_STORE_DIR')
+    store = MarketStore(store_dir) if store_dir else None
+    capture = MarketCapture(store, state) if store is not None else None
+    pool = ConnectionPool(state, recorder=recorder, latency=latency, capture=capture)
+    clients = ClientServer(state, markets=pool,  # clients can also add/remove markets
+                           on_changed=capture.books_changed if capture is not None else None)
+    # grouped markets: show the best cross-venue spreads, scanned only when a member's top of book moves
+    scanner = SpreadScanner(state) if groups else None
+
+    def on_update():
+        clients.notify()
+        if scanner is not None:
+            scanner.notify()
+    pool.on_update = on_update
+    socket_path = os.getenv('PREDME_SOCKET', '/tmp/predme.sock')
+    print(f"Serving clients on {socket_path}")
+
+    # Connect via WebSocket: markets are sharded over reconnecting connections
+    per_connection = int(os.getenv('PREDME_MARKETS_PER_CONNECTION', '250'))
+    # point these at a local exchange simulator (python server/exchange_sim.py) for load tests
+    kalshi_ws_url = os.getenv('KALSHI_WS_URL')
+    polymarket_ws_url = os.getenv('POLYMARKET_WS_URL')
+    add_kalshi_feed(pool, marks, auth=ws_client_auth, max_markets_per_connection=per_connection,
+                    ws_base_url=kalshi_ws_url)
+    # add_polymarket_feed(pool, marks, max_markets_per_connection=per_connection, url=polymarket_ws_url)
     stuff = [
-        kalshi_ws_handler(auth=ws_client_auth, market_tickers=marks),
-        # polymarket_ws_handler(market_tickers=marks),
-        _showstate(marks)
+        pool.run(),
+        clients.serve_forever(path=socket_path),
         ]
+    if scanner is not None:
+        stuff += [scanner.run(), _showspreads(scanner)]
+    else:
+        stuff.append(_showstate(state, marks))
+    if recorder is not None:
+        stuff.append(recorder.run())
+    if store is not None:
+        stuff.append(store.run())
+    if latency is not None:
+        stuff.append(serve_metrics(latency, port=int(metrics_port)))
 
-    await asyncio.gather(*stuff)
+    try:
+        await asyncio.gather(*stuff)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if store is not None:
+            store.close()
     # print("Server Done, Cleaning up")
 
-async def _showstate(markets):
-    s = ServerState()
+async def _showspreads(scanner: SpreadScanner):
+    shown = None
+    while True:
+        await asyncio.sleep(1)
+        if scanner.scans == shown:  # no spread moved
+            continue
+        shown = scanner.scans
+        os.system("clear")
+        sys.stdout.write("\n".join(scanner.describe()) + "\n")
+        sys.stdout.flush()
+
+async def _showstate(s: ServerState, markets):
     while True:
         await asyncio.sleep(1)
         os.system("clear")
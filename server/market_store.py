@@ -0,0 +1,309 @@
+"""
+Columnar on-disk store of what the feeds see: trades and top-of-book
+changes, partitioned by table, exchange, market and UTC day.
+
+    <root>/<table>/<exchange>/<market>/<YYYY-MM-DD>/<column>.bin   one file per column
+                                                   /index.bin      (min ts_ns, max ts_ns) per block
+
+Columns are fixed-width little-endian integers (TABLES): times in ns since
+the epoch, prices in millionths of a dollar (PRICE_SCALE), quantities in
+millionths of a contract or share (QTY_SCALE). A partition's index has the
+time range of every BLOCK_ROWS rows, so a range query memory-maps the
+columns and only looks at the blocks that overlap it. Rows need not be
+appended in time order (REST backfills arrive newest first); `read`
+returns them sorted.
+
+Appends are buffered per market and written every `flush_rows` rows or
+`flush_interval` seconds (`run` keeps the timer going while the feeds are
+quiet), columns first and the index last. A reader takes
+the shortest column as the row count and always scans the last block, so
+a crash between the two writes loses nothing it had already written.
+
+`MarketCapture` fills a store from the live feeds: polymarket
+`last_trade_price` and kalshi `trade` messages (the handlers pass them
+on), and each changed book's best bid and offer, checked every time the
+ClientServer publishes (`ClientServer(on_changed=capture.books_changed)`).
+
+    store = MarketStore("data/market")
+    capture = MarketCapture(store, state)
+    pool = ConnectionPool(state, capture=capture)
+    await asyncio.gather(pool.run(), store.run(), ...)
+    trades = store.read("trades", "polymarket", asset_id, start_ns, end_ns)  # {column: ndarray}
+"""
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+PRICE_SCALE = 1_000_000
+QTY_SCALE = 1_000_000
+BLOCK_ROWS = 4096
+DAY_NS = 86_400 * 10 ** 9
+
+# side of a trade: the taker's; 1 bought (yes), 2 sold (no)
+BUY, SELL = 1, 2
+
+TABLES: Dict[str, np.dtype] = {
+    "trades": np.dtype([("ts_ns", "<i8"), ("price", "<i4"), ("qty", "<i8"), ("side", "u1")]),
+    "quotes": np.dtype([("ts_ns", "<i8"), ("bid", "<i4"), ("bid_qty", "<i8"), ("ask", "<i4"), ("ask_qty", "<i8")]),
+}
+
+_INDEX = np.dtype([("min_ts", "<i8"), ("max_ts", "<i8")])
+
+
+def _day(day_index: int) -> str:
+    return datetime.fromtimestamp(day_index * 86_400, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _day_index(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()) // 86_400
+
+
+class MarketStore:
+    """ reads and appends TABLES rows under `root` """
+
+    def __init__(self, root: str | os.PathLike, flush_rows: int = 65_536, flush_interval: float = 1.0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._flush_rows = flush_rows
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        # (table, exchange, market) -> buffered rows, as tuples or arrays
+        self._rows: Dict[Tuple[str, str, str], list] = {}
+        self._arrays: Dict[Tuple[str, str, str], List[np.ndarray]] = {}
+        self._buffered = 0
+        self.rows_written = 0
+
+    def _market_dir(self, table: str, exchange_id: str, market_id: str) -> Path:
+        if table not in TABLES:
+            raise KeyError(f"unknown table {table!r}, expected one of {sorted(TABLES)}")
+        return self.root / table / exchange_id / market_id
+
+    # ---- writing
+
+    def append(self, table: str, exchange_id: str, market_id: str, rows: np.ndarray):
+        """ queue rows of TABLES[table] """
+        if rows.dtype != TABLES[table]:
+            raise TypeError(f"{table} rows must have dtype {TABLES[table]}, got {rows.dtype}")
+        self._arrays.setdefault((table, exchange_id, market_id), []).append(rows)
+        self._queued(len(rows))
+
+    def append_row(self, table: str, exchange_id: str, market_id: str, row: tuple):
+        """ queue one row, a tuple in TABLES[table] field order """
+        self._rows.setdefault((table, exchange_id, market_id), []).append(row)
+        self._queued(1)
+
+    def _queued(self, n: int):
+        self._buffered += n
+        if self._buffered >= self._flush_rows or time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    async def run(self):
+        """ flush at least every `flush_interval` seconds, rows or not """
+        while True:
+            wait = self._last_flush + self._flush_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            else:
+                self.flush()
+
+    def flush(self):
+        """ write everything queued """
+        keys = set(self._rows) | set(self._arrays)
+        for key in keys:
+            parts = self._arrays.pop(key, [])
+            rows = self._rows.pop(key, None)
+            if rows:
+                parts.append(np.array(rows, dtype=TABLES[key[0]]))
+            self._write(*key, np.concatenate(parts) if len(parts) > 1 else parts[0])
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+    def _write(self, table: str, exchange_id: str, market_id: str, rows: np.ndarray):
+        if not len(rows):
+            return
+        days = rows["ts_ns"] // DAY_NS
+        unique = np.unique(days)
+        for day in unique:
+            part = rows if len(unique) == 1 else rows[days == day]
+            path = self._market_dir(table, exchange_id, market_id) / _day(int(day))
+            path.mkdir(parents=True, exist_ok=True)
+            before = _rows(path, table)
+            for name in part.dtype.names:
+                with open(path / f"{name}.bin", "ab") as f:
+                    if f.tell() != before * part.dtype[name].itemsize:  # a write cut short by a crash
+                        f.truncate(before * part.dtype[name].itemsize)
+                    f.write(np.ascontiguousarray(part[name]).tobytes())
+            _reindex(path, before, before + len(part))
+        self.rows_written += len(rows)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- truncation, for resumable writers (trade_history)
+
+    def mark(self, table: str, exchange_id: str, market_id: str) -> Dict[str, int]:
+        """ rows per day written so far for a market, after a flush """
+        market = self._market_dir(table, exchange_id, market_id)
+        if not market.exists():
+            return {}
+        return {p.name: _rows(p, table) for p in sorted(market.iterdir()) if p.is_dir()}
+
+    def rollback(self, table: str, exchange_id: str, market_id: str, mark: Dict[str, int]):
+        """ drop the market's rows written after `mark`, queued ones included """
+        self._rows.pop((table, exchange_id, market_id), None)
+        self._arrays.pop((table, exchange_id, market_id), None)
+        for day, rows in self.mark(table, exchange_id, market_id).items():
+            path = self._market_dir(table, exchange_id, market_id) / day
+            keep = mark.get(day, 0)
+            if keep == 0:
+                shutil.rmtree(path)
+            elif keep < rows or any((path / f"{n}.bin").stat().st_size != keep * TABLES[table][n].itemsize
+                                    for n in TABLES[table].names):
+                for name in TABLES[table].names:
+                    os.truncate(path / f"{name}.bin", keep * TABLES[table][name].itemsize)
+                _reindex(path, 0, keep)
+
+    # ---- reading
+
+    def exchanges(self, table: str) -> List[str]:
+        return sorted(p.name for p in (self.root / table).glob("*") if p.is_dir())
+
+    def markets(self, table: str, exchange_id: str) -> List[str]:
+        return sorted(p.name for p in (self.root / table / exchange_id).glob("*") if p.is_dir())
+
+    def days(self, table: str, exchange_id: str, market_id: str) -> List[str]:
+        return sorted(p.name for p in self._market_dir(table, exchange_id, market_id).glob("*") if p.is_dir())
+
+    def read(self, table: str, exchange_id: str, market_id: str, start_ns: Optional[int] = None,
+             end_ns: Optional[int] = None, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """ a market's rows with start_ns <= ts_ns <= end_ns, oldest first, as {column: array} """
+        dtype = TABLES[table]
+        columns = list(columns) if columns is not None else list(dtype.names)
+        lo = start_ns if start_ns is not None else -2 ** 63
+        hi = end_ns if end_ns is not None else 2 ** 63 - 1
+        chunks: Dict[str, List[np.ndarray]] = {c: [] for c in set(columns) | {"ts_ns"}}
+        for day in self.days(table, exchange_id, market_id):
+            first = _day_index(day) * DAY_NS
+            if first > hi or first + DAY_NS <= lo:
+                continue
+            path = self._market_dir(table, exchange_id, market_id) / day
+            rows = _rows(path, table)
+            if not rows:
+                continue
+            selected = None  # the whole day
+            if first < lo or first + DAY_NS - 1 > hi:
+                selected = _prune(path, _column(path, "ts_ns", dtype, rows), lo, hi, rows)
+                if not len(selected):
+                    continue
+            for c in chunks:
+                col = _column(path, c, dtype, rows)
+                chunks[c].append(np.array(col if selected is None else col[selected]))
+        out = {c: np.concatenate(v) if v else np.empty(0, dtype=dtype[c]) for c, v in chunks.items()}
+        ts = out["ts_ns"]
+        if len(ts) > 1 and (np.diff(ts) < 0).any():
+            order = np.argsort(ts, kind="stable")
+            out = {c: v[order] for c, v in out.items()}
+        return {c: out[c] for c in columns}
+
+
+def _rows(path: Path, table: str) -> int:
+    """ complete rows of a partition: the shortest column """
+    dtype = TABLES[table]
+    sizes = []
+    for name in dtype.names:
+        f = path / f"{name}.bin"
+        sizes.append(f.stat().st_size // dtype[name].itemsize if f.exists() else 0)
+    return min(sizes)
+
+
+def _column(path: Path, name: str, dtype: np.dtype, rows: int) -> np.ndarray:
+    return np.memmap(path / f"{name}.bin", dtype=dtype[name], mode="r", shape=(rows,))
+
+
+def _reindex(path: Path, start: int, rows: int):
+    """ recompute the index blocks covering rows [start, rows) """
+    ts = np.fromfile(path / "ts_ns.bin", dtype="<i8", count=rows)
+    first = start // BLOCK_ROWS
+    blocks = np.array([(ts[b:b + BLOCK_ROWS].min(), ts[b:b + BLOCK_ROWS].max())
+                       for b in range(first * BLOCK_ROWS, rows, BLOCK_ROWS)], dtype=_INDEX)
+    with open(path / "index.bin", "r+b" if (path / "index.bin").exists() else "wb") as f:
+        f.truncate(first * _INDEX.itemsize)
+        f.seek(first * _INDEX.itemsize)
+        f.write(blocks.tobytes())
+
+
+def _prune(path: Path, ts: np.ndarray, lo: int, hi: int, rows: int) -> np.ndarray:
+    """ row numbers with lo <= ts <= hi, looking only at index blocks that overlap """
+    index = np.fromfile(path / "index.bin", dtype=_INDEX) if (path / "index.bin").exists() else np.empty(0, _INDEX)
+    indexed = min(len(index), rows // BLOCK_ROWS)  # the last (maybe partial or unindexed) blocks are always scanned
+    hit = np.flatnonzero((index["max_ts"][:indexed] >= lo) & (index["min_ts"][:indexed] <= hi))
+    starts = [b * BLOCK_ROWS for b in hit] + list(range(indexed * BLOCK_ROWS, rows, BLOCK_ROWS))
+    out = []
+    for s in starts:
+        block = ts[s:s + BLOCK_ROWS]
+        out.append(np.flatnonzero((block >= lo) & (block <= hi)) + s)
+    return np.concatenate(out) if out else np.empty(0, dtype=np.int64)
+
+
+# get_bbos columns (bid price, bid qty, offer price, offer qty) to store units
+_TOP_SCALE = np.array([PRICE_SCALE, QTY_SCALE, PRICE_SCALE, QTY_SCALE], dtype=np.float64)
+
+
+def price_units(price: float) -> int:
+    return int(round(price * PRICE_SCALE))
+
+
+def qty_units(qty: float) -> int:
+    return int(round(qty * QTY_SCALE))
+
+
+class MarketCapture:
+    """
+    Records live trades and top-of-book changes of `state`'s books into a
+    MarketStore.
+    """
+
+    def __init__(self, store: MarketStore, state=None):
+        self.store = store
+        self.state = state
+        self._tops: Dict[int, tuple] = {}
+        self.trades = 0
+        self.quotes = 0
+
+    def trade(self, exchange_id: str, market_id: str, ts_ns: int, price: float, qty: float, side: int):
+        self.store.append_row("trades", exchange_id, market_id, (ts_ns, price_units(price), qty_units(qty), side))
+        self.trades += 1
+
+    def books_changed(self, handles: Iterable[int]):
+        """ record the best bid and offer of each changed book whose top moved """
+        now = time.time_ns()
+        handles = np.fromiter(handles, dtype=np.int32)
+        tops = self.state.get_bbos(handles)
+        empty = np.isnan(tops)
+        units = np.rint(np.where(empty, 0.0, tops) * _TOP_SCALE).astype(np.int64).tolist()
+        for handle, top, blank in zip(handles.tolist(), units, empty.all(axis=1).tolist()):
+            if blank and self.state.get_bbo(handle) is None:  # removed
+                self._tops.pop(handle, None)
+                continue
+            top = tuple(top)
+            if self._tops.get(handle) == top:
+                continue
+            self._tops[handle] = top
+            exchange_id, market_id = self.state.book_key(handle)
+            self.store.append_row("quotes", exchange_id, market_id, (now, *top))
+            self.quotes += 1
+
+    def flush(self):
+        self.store.flush()
@@ -2,7 +2,7 @@ import asyncio
 import websockets
 from pydantic import BaseModel
 from typing import Any, Coroutine, List, Literal, Optional, Callable, Awaitable, Union
-from polymarket_wss_dtypes import SubscribeMessage, Auth
+from polymarket_wss_dtypes import SubscribeMessage, SubscriptionUpdateMessage, Auth
 
 class PolymarketWebSocketClient:
     """Client for Polymarket CLOB WebSocket (USER or MARKET channels)."""
@@ -22,6 +22,7 @@ class PolymarketWebSocketClient:
         on_error: Callable[[Exception], None] = lambda err: None,
         on_close: Callable[[int, str], None] = lambda code, reason: None,
         on_open: Callable[[], None] = lambda: None,
+        url: Optional[str] = None,
     ):
         """
         - apikey/secret/(passphrase):
@@ -29,6 +30,8 @@ class PolymarketWebSocketClient:
         - markets: list of market IDs (required if channel=='USER')
         - asset_ids: list of asset IDs (required if channel=='MARKET')
         - callback hooks for messages, errors, close, and open.
+        - url: websocket URL prefix the channel is appended to (default WSS_URL),
+          e.g. a local exchange simulator's (exchange_sim.py).
         """
         if all((apikey, secret, passphrase)):
             self.auth = Auth(apikey=apikey, secret=secret, passphrase=passphrase)
@@ -41,17 +44,20 @@ class PolymarketWebSocketClient:
         self.on_error = on_error
         self.on_close = on_close
         self.on_open = on_open
+        self.ws = None
+        self.url = url or self.WSS_URL
 
     async def connect(self) -> None:
         """Open WebSocket, perform subscription, and start message loop."""
         try:
             async with websockets.connect(
-                uri=self.WSS_URL + self.channel.lower(),
+                uri=self.url + self.channel.lower(),
                 ping_interval=30, ping_timeout=10,
                 origin='https://polymarket.com' # type: ignore
             ) as ws:
                 self.ws = ws
-                await self._send_subscribe()
+                if self.asset_ids or self.markets:
+                    await self._send_subscribe()
                 self.on_open()
                 await self._receive_loop()
         except Exception as e:
@@ -71,6 +77,23 @@ class PolymarketWebSocketClient:
         print(sub_msg)
         await self.ws.send(sub_msg)
 
+    async def add_markets(self, asset_ids: List[str]) -> None:
+        """Subscribe to more assets on the open connection (or on the next one)."""
+        asset_ids = [a for a in asset_ids if a not in (self.asset_ids or [])]
+        if self.asset_ids is None:
+            self.asset_ids = []
+        self.asset_ids.extend(asset_ids)
+        if self.ws is not None and asset_ids:
+            await self.ws.send(SubscriptionUpdateMessage(assets_ids=asset_ids, operation='subscribe').model_dump_json())
+
+    async def remove_markets(self, asset_ids: List[str]) -> None:
+        """Stop receiving updates for these assets."""
+        asset_ids = [a for a in asset_ids if a in (self.asset_ids or [])]
+        for a in asset_ids:
+            self.asset_ids.remove(a) # type: ignore
+        if self.ws is not None and asset_ids:
+            await self.ws.send(SubscriptionUpdateMessage(assets_ids=asset_ids, operation='unsubscribe').model_dump_json())
+
     async def _receive_loop(self) -> None:
         """Continuously read from WS and dispatch messages or handle close."""
         async for raw in self.ws:
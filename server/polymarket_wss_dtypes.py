@@ -14,6 +14,11 @@ class SubscribeMessage(BaseModel):
     markets: Optional[List[str]] = None
     assets_ids: Optional[List[str]] = None
 
+class SubscriptionUpdateMessage(BaseModel):
+    """ add or drop assets on an open market channel connection """
+    assets_ids: List[str]
+    operation: Literal["subscribe", "unsubscribe"]
+
 
 # === Market Data Messages ===
 class OrderSummary(BaseModel):
@@ -1,5 +1,5 @@
 from collections.abc import Hashable
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 from pydantic import BaseModel
 from kalshi_client import Environment as KEnv
 
@@ -10,9 +10,11 @@ class Endpoint(BaseModel):
     market_id   : the hash or token pointing to a market on the exchange
     market_name : the name of the market or event, which is predicted
     token_ids   : the hash or token pointing to a prediction [y, n]
-    direction   : the literal for the prediction [y, n]
+    direction   : the literal for the prediction [y, n]; in a group, 'n' means
+                  this market's yes is the group's no
     group_id    : if there is a pair of markets that are essentially the same
                   across multiple exchanges, use this to categorize that
+                  (merged into one ServerState group book, see add_groups)
     desctiption : other info
     """
     exchange_id: str
@@ -21,6 +23,7 @@ class Endpoint(BaseModel):
     token_id:    Optional[str]
     group_id   : Optional[int]
     description: Optional[str]
+    direction  : Literal['y', 'n'] = 'y'
 
 class OrderBook_Key(BaseModel, Hashable):
     """
@@ -0,0 +1,153 @@
+"""
+Pure-Python reader for the shared-memory book mirror (ServerState.enable_shm).
+
+Maps the region read-only and reads each book's slot behind its seqlock, the
+same protocol as orderbook_ext.ShmReader (layout documented in
+cpp/orderbook/shm_books.hpp). Needs only numpy, so strategy processes can read
+books without the extension. Prefer orderbook_ext.ShmReader where it is
+available: Python cannot issue memory fences, so this reader relies on the
+loads staying in program order, which holds on x86 but not on every CPU.
+
+    books = ShmBooks("predme_books")
+    h = books.find("kalshi", "KXMAYORNYCNOMD-25-AC")
+    (bid, offer) = books.top_of_book(h)
+
+A read retries while the book is being written, sleeping after the first
+few tries, and raises TimeoutError if it is still mid-write after `timeout`
+seconds (the writer died inside a write), like orderbook_ext.ShmReader.
+"""
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+MAGIC = 0x424f454d44455250  # "PREDMEOB"
+VERSION = 1
+HEADER_BYTES = 64
+SLOT_HEADER_BYTES = 256
+
+_HEADER = struct.Struct("<QIIIII")
+_SLOT = struct.Struct("<QdiiiHH")
+
+Level = Tuple[float, float]
+
+
+class ShmBooks:
+    """ read-only view of a ServerState shared memory mirror """
+
+    def __init__(self, name: str, timeout: float = 1.0):
+        self._shm = shared_memory.SharedMemory(name=name.lstrip("/"), create=False, track=False)
+        buf = self._shm.buf
+        magic, version, self.max_books, self.ladder_capacity, self._slot_bytes, _ = _HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            self._shm.close()
+            raise ValueError(f"shared memory {name} is not a book region (or a different version)")
+        self._num_books = np.frombuffer(buf, np.uint32, 1, 24)
+        n = self.max_books
+        # u64 words of every slot, for the seq counter at word 0 of each slot
+        self._words = np.frombuffer(buf, np.uint64, n * self._slot_bytes // 8, HEADER_BYTES)
+        self._slot_words = self._slot_bytes // 8
+        self.timeout = timeout
+        self._index: Dict[Tuple[str, str], int] = {}
+        self._indexed = 0
+        self._index_lock = threading.Lock()
+
+    def close(self):
+        if getattr(self, "_words", None) is None:
+            return
+        # numpy views must go before the mapping can be closed
+        self._num_books = self._words = None
+        self._shm.close()
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def num_books(self) -> int:
+        return int(self._num_books[0])
+
+    def _offset(self, handle: int) -> int:
+        if not 0 <= handle < self.num_books():
+            raise IndexError(f"unknown book handle {handle}")
+        return HEADER_BYTES + handle * self._slot_bytes
+
+    def key(self, handle: int) -> Tuple[str, str]:
+        off = self._offset(handle)
+        _, _, _, _, _, ex_len, mk_len = _SLOT.unpack_from(self._shm.buf, off)
+        raw = bytes(self._shm.buf[off + 32:off + 32 + ex_len + mk_len])
+        return raw[:ex_len].decode(), raw[ex_len:].decode()
+
+    def find(self, exchange_id: str, market_id: str) -> int:
+        """ handle for (exchange, market), or -1 if it is not (yet) mirrored """
+        n = self.num_books()
+        with self._index_lock:
+            while self._indexed < n:
+                key = self.key(self._indexed)
+                if key != ("", ""):
+                    self._index[key] = self._indexed
+                self._indexed += 1
+            return self._index.get((exchange_id, market_id), -1)
+
+    def version(self, handle: int) -> int:
+        """ the slot's seqlock counter; it changes whenever the book does """
+        self._offset(handle)
+        return int(self._words[handle * self._slot_words])
+
+    def _read(self, handle: int, copy):
+        off = self._offset(handle)
+        seq = self._words[handle * self._slot_words:handle * self._slot_words + 1]
+        buf = self._shm.buf
+        deadline = None
+        tries = 0
+        while True:
+            before = int(seq[0])
+            if not before & 1:
+                _, tick, n, best_bid, best_offer, _, _ = _SLOT.unpack_from(buf, off)
+                out = copy(off, tick, n, best_bid, best_offer) if n > 0 else None
+                if int(seq[0]) == before:
+                    return out
+            tries += 1
+            if tries < 16:
+                continue
+            # a write takes microseconds; the writer is descheduled or dead
+            if deadline is None:
+                deadline = time.monotonic() + self.timeout
+            elif time.monotonic() >= deadline:
+                raise TimeoutError(f"book {handle} stayed mid-write for {self.timeout}s (did the writer die?)")
+            time.sleep(0.0001)
+
+    def _ladder(self, off: int, side: int, n: int) -> np.ndarray:
+        start = off + SLOT_HEADER_BYTES + side * self.ladder_capacity * 8
+        return np.frombuffer(self._shm.buf, np.float64, n, start)
+
+    def top_of_book(self, handle: int) -> Optional[Tuple[Optional[Level], Optional[Level]]]:
+        """ ((bid_price, bid_qty) | None, (offer_price, offer_qty) | None), or None if the book is absent """
+        def copy(off, tick, n, b, o):
+            bid = (b * tick, float(self._ladder(off, 0, n)[b])) if 0 <= b < n else None
+            offer = (o * tick, float(self._ladder(off, 1, n)[o])) if 0 <= o < n else None
+            return bid, offer
+        return self._read(handle, copy)
+
+    def depth(self, handle: int, levels: int = 10) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """ (bids, offers) as (n, 2) [price, qty] arrays, best level first, or None """
+        def copy(off, tick, n, b, o):
+            bids = self._ladder(off, 0, n)[:max(b, -1) + 1].copy()
+            offers = self._ladder(off, 1, n)[max(o, 0):].copy() if o >= 0 else np.empty(0)
+            bi = np.flatnonzero(bids)[::-1][:levels]
+            oi = np.flatnonzero(offers)[:levels]
+            return (np.column_stack((bi * tick, bids[bi])),
+                    np.column_stack(((oi + max(o, 0)) * tick, offers[oi])))
+        return self._read(handle, copy)
+
+    def ladders(self, handle: int) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+        """ (bids, offers, tick_size) copies of the ladders, or None """
+        return self._read(handle, lambda off, tick, n, b, o:
+                          (self._ladder(off, 0, n).copy(), self._ladder(off, 1, n).copy(), tick))
@@ -0,0 +1,81 @@
+"""
+Cross-venue spread scanner over the ServerState's market groups
+(`add_to_group` / websocket_handlers.add_groups).
+
+For every group the state keeps the best bid of one member book against the
+best offer of another, in the group's yes terms (see `top_spreads`). It
+recomputes a group's spread only when a member's best bid or offer moves,
+and keeps all of them ordered by edge (bid - offer; positive is an
+arbitrage). So a scan costs the number of groups that changed, not the
+number of books.
+
+    scanner = SpreadScanner(state, k=10, on_change=show)
+    pool.on_update = scanner.notify  # or chain it with ClientServer.notify
+    await scanner.run()
+
+`on_change(top, changed)` gets the top `k` spreads (a SPREAD_DTYPE array,
+largest edge first) and the ids of the groups whose spread changed, and is
+only called when some group's spread did. `notify()` schedules a scan on the
+event loop; `poll_interval` also scans on a timer for updates applied from
+other threads. Scans drain `ServerState.drain_spread_changes`, so use one
+scanner per state.
+"""
+import asyncio
+from typing import Callable, List, Optional
+
+import numpy as np
+from orderbook_ext import ServerState, SPREAD_DTYPE
+
+
+class SpreadScanner:
+    """ keeps `top`, the `k` largest cross-venue spreads, current as groups change """
+
+    def __init__(self, state: ServerState, k: int = 10,
+                 on_change: Optional[Callable[[np.ndarray, np.ndarray], None]] = None,
+                 poll_interval: float = 0.05):
+        self._state = state
+        self.k = k
+        self.on_change = on_change
+        self._poll_interval = poll_interval
+        self._scan_scheduled = False
+        self.top = np.empty(0, dtype=SPREAD_DTYPE)
+        self.scans = 0      # scans that found a change
+        self.changes = 0    # group spread changes seen
+
+    def notify(self):
+        """ the state changed; scan once the loop is free """
+        if not self._scan_scheduled:
+            self._scan_scheduled = True
+            asyncio.get_running_loop().call_soon(self.scan)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            self.scan()
+
+    def scan(self) -> bool:
+        """ refresh `top` if any group's spread changed; returns whether one did """
+        self._scan_scheduled = False
+        changed = self._state.drain_spread_changes()
+        if not len(changed):
+            return False
+        self.top = self._state.top_spreads(self.k)
+        self.scans += 1
+        self.changes += len(changed)
+        if self.on_change is not None:
+            self.on_change(self.top, changed)
+        return True
+
+    def describe(self, top: Optional[np.ndarray] = None) -> List[str]:
+        """ one line per spread: group, edge, and where to sell and buy """
+        lines = []
+        for s in self.top if top is None else top:
+            bid_ex, bid_market = self._state.book_key(int(s["bid_handle"]))
+            offer_ex, offer_market = self._state.book_key(int(s["offer_handle"]))
+            lines.append(f"group {s['group']:>6} edge {s['edge']:+.4f}  "
+                         f"bid {s['bid_price']:.4f} x {s['bid_qty']:g} {bid_ex}:{bid_market}  "
+                         f"offer {s['offer_price']:.4f} x {s['offer_qty']:g} {offer_ex}:{offer_market}")
+        return lines
+
+    def stats(self) -> dict:
+        return {"groups_with_spread": self._state.num_spreads(), "scans": self.scans, "changes": self.changes}
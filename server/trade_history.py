@@ -0,0 +1,289 @@
+"""
+Bulk kalshi trade history: stream every trade of a set of tickers over a
+time range straight to disk, with bounded memory, and resume after an
+interruption.
+
+    async with AsyncKalshiHttpClient(key_id, private_key) as client:
+        with TradeFileStore("data/kalshi_trades") as store:
+            stats = await download_trades(client, tickers, store, "data/kalshi_trades/checkpoint.json",
+                                          min_ts=1_750_000_000, max_ts=1_751_000_000)
+    trades = store.read("KXMAYORNYCNOMD-25-AC")  # numpy, TRADE_DTYPE, oldest first
+
+`iter_trade_pages` walks each ticker's cursor with `concurrency` tickers in
+flight at once, all sharing the client's read token bucket, so requests
+go out as fast as the rate limit allows while earlier pages are written.
+Pages are converted to fixed-width TRADE_DTYPE records as they arrive and
+at most `max_pending` of them wait for the writer, so memory does not grow
+with the history.
+
+`download_trades` appends each page to the ticker's file (TradeFileStore)
+or to a MarketStore's kalshi trades table (MarketStoreTrades) and, every
+`checkpoint_interval` seconds, flushes the store and saves every ticker's
+next cursor and how far its rows go to the checkpoint (written to a
+temporary file, then renamed). Run it again with the same checkpoint after
+a crash: the store is cut back to the checkpoint and each ticker carries
+on from its cursor, so no trade is lost or written twice. Cursors belong to a
+query, so the tickers' time range and page size must match the checkpoint.
+"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from kalshi_client import AsyncKalshiHttpClient
+from market_store import PRICE_SCALE, QTY_SCALE, TABLES, MarketStore
+
+TRADE_DTYPE = np.dtype([
+    ("ts_ns", "<i8"),         # created_time, ns since the epoch
+    ("yes_price", "<i2"),     # cents
+    ("count", "<i4"),         # contracts
+    ("taker_side", "u1"),     # 1 yes, 2 no
+    ("trade_id", "S36"),
+])
+TAKER_SIDES = {"yes": 1, "no": 2}
+
+CHECKPOINT_VERSION = 2
+
+
+def trade_records(trades: List[dict]) -> np.ndarray:
+    """ a page of kalshi trade dicts as TRADE_DTYPE records """
+    records = np.empty(len(trades), dtype=TRADE_DTYPE)
+    if trades:
+        records["ts_ns"] = np.array([t["created_time"].rstrip("Z") for t in trades],
+                                    dtype="datetime64[ns]").view(np.int64)
+        records["yes_price"] = [t["yes_price"] for t in trades]
+        records["count"] = [t["count"] for t in trades]
+        records["taker_side"] = [TAKER_SIDES.get(t.get("taker_side"), 0) for t in trades]
+        records["trade_id"] = [t["trade_id"] for t in trades]
+    return records
+
+
+class TradePage(NamedTuple):
+    ticker: str
+    records: np.ndarray
+    cursor: str  # of the next page, "" after the ticker's last
+
+
+class TradeFileStore:
+    """
+    One append-only file of TRADE_DTYPE records per ticker, `<ticker>.trades`
+    in `directory`, in download order (the API's, newest first).
+    """
+
+    def __init__(self, directory: str | os.PathLike, fsync: bool = True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._fsync = fsync
+        self._files: Dict[str, object] = {}
+
+    def path(self, ticker: str) -> Path:
+        return self.directory / f"{ticker}.trades"
+
+    def append(self, ticker: str, records: np.ndarray):
+        f = self._files.get(ticker)
+        if f is None:
+            f = self._files[ticker] = open(self.path(ticker), "ab")
+        f.write(records.tobytes())
+
+    def flush(self):
+        """ make everything appended so far durable """
+        for f in self._files.values():
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+
+    def rows(self, ticker: str) -> int:
+        f = self._files.get(ticker)
+        if f is not None:
+            f.flush()
+        path = self.path(ticker)
+        return path.stat().st_size // TRADE_DTYPE.itemsize if path.exists() else 0
+
+    def mark(self, ticker: str) -> int:
+        """ where the ticker's file ends now, for `rollback` """
+        return self.rows(ticker)
+
+    def rollback(self, ticker: str, mark: Optional[int]):
+        self.truncate(ticker, mark or 0)
+
+    def truncate(self, ticker: str, rows: int):
+        """ drop everything after the first `rows` records (and any partial record) """
+        f = self._files.pop(ticker, None)
+        if f is not None:
+            f.close()
+        path = self.path(ticker)
+        if path.exists():
+            os.truncate(path, rows * TRADE_DTYPE.itemsize)
+
+    def read(self, ticker: str, min_ns: Optional[int] = None, max_ns: Optional[int] = None) -> np.ndarray:
+        """ a ticker's trades with min_ns <= ts_ns <= max_ns, oldest first """
+        rows = self.rows(ticker)
+        if not rows:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        records = np.memmap(self.path(ticker), dtype=TRADE_DTYPE, mode="r", shape=(rows,))
+        ts = records["ts_ns"]
+        keep = np.ones(rows, dtype=bool)
+        if min_ns is not None:
+            keep &= ts >= min_ns
+        if max_ns is not None:
+            keep &= ts <= max_ns
+        selected = records[keep]
+        return selected[np.argsort(selected["ts_ns"], kind="stable")]
+
+    def tickers(self) -> List[str]:
+        return sorted(p.stem for p in self.directory.glob("*.trades"))
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MarketStoreTrades:
+    """
+    Downloads into the kalshi trades table of a market_store.MarketStore.
+    A resumed download rolls the table back to its checkpoint, so give it a
+    store that live capture is not writing the same tickers to.
+    """
+
+    def __init__(self, store: MarketStore):
+        self.store = store
+
+    def append(self, ticker: str, records: np.ndarray):
+        rows = np.empty(len(records), dtype=TABLES["trades"])
+        rows["ts_ns"] = records["ts_ns"]
+        rows["price"] = records["yes_price"].astype(np.int32) * (PRICE_SCALE // 100)
+        rows["qty"] = records["count"].astype(np.int64) * QTY_SCALE
+        rows["side"] = records["taker_side"]  # 1 yes / 2 no, as BUY / SELL
+        self.store.append("trades", "kalshi", ticker, rows)
+
+    def flush(self):
+        self.store.flush()
+
+    def mark(self, ticker: str) -> Dict[str, int]:
+        return self.store.mark("trades", "kalshi", ticker)
+
+    def rollback(self, ticker: str, mark: Optional[Dict[str, int]]):
+        self.store.rollback("trades", "kalshi", ticker, mark or {})
+
+
+async def iter_trade_pages(client: AsyncKalshiHttpClient, tickers: Iterable[str], min_ts: Optional[int] = None,
+                           max_ts: Optional[int] = None, limit: int = 1000, cursors: Optional[Dict[str, str]] = None,
+                           concurrency: int = 4, max_pending: int = 8) -> AsyncIterator[TradePage]:
+    """
+    Every trade of `tickers` with min_ts <= created <= max_ts (seconds), as
+    TradePages in arrival order: a ticker's pages in order, tickers
+    interleaved. `cursors` starts tickers from a saved cursor.
+    """
+    todo = list(tickers)
+    cursors = cursors or {}
+    pages: asyncio.Queue = asyncio.Queue(max_pending)
+    done = object()
+
+    async def worker():
+        try:
+            while todo:
+                ticker = todo.pop(0)
+                async for trades, cursor in client.iter_trades(ticker=ticker, limit=limit, cursor=cursors.get(ticker),
+                                                               min_ts=min_ts, max_ts=max_ts):
+                    await pages.put(TradePage(ticker, trade_records(trades), cursor))
+        except Exception as e:
+            await pages.put(e)
+            return
+        await pages.put(done)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(todo))))]
+    running = len(workers)
+    try:
+        while running:
+            page = await pages.get()
+            if page is done:
+                running -= 1
+            elif isinstance(page, BaseException):
+                raise page
+            else:
+                yield page
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def _load_checkpoint(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path: Path, checkpoint: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+async def download_trades(client: AsyncKalshiHttpClient, tickers: Iterable[str], store: "TradeFileStore | MarketStoreTrades",
+                          checkpoint: str | os.PathLike, min_ts: Optional[int] = None, max_ts: Optional[int] = None,
+                          limit: int = 1000, concurrency: int = 4, max_pending: int = 8,
+                          checkpoint_interval: float = 1.0) -> dict:
+    """
+    Download every trade of `tickers` into `store`, resuming from
+    `checkpoint` if it exists. Returns counts for this run.
+    """
+    path = Path(checkpoint)
+    tickers = list(dict.fromkeys(tickers))
+    query = {"min_ts": min_ts, "max_ts": max_ts, "limit": limit}
+    saved = _load_checkpoint(path)
+    if saved is None:
+        saved = {"version": CHECKPOINT_VERSION, **query, "tickers": {}}
+    elif saved.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"checkpoint {path} has version {saved.get('version')}, expected {CHECKPOINT_VERSION}")
+    elif {k: saved.get(k) for k in query} != query:
+        raise ValueError(f"checkpoint {path} is for {({k: saved.get(k) for k in query})}, not {query}")
+    progress: Dict[str, dict] = saved["tickers"]
+    for ticker in tickers:
+        entry = progress.setdefault(ticker, {"cursor": "", "mark": None, "done": False})
+        # anything written after the checkpoint is fetched again; a ticker new to it starts empty
+        store.rollback(ticker, entry["mark"])
+    _save_checkpoint(path, saved)
+
+    def save():
+        store.flush()
+        for ticker in written:
+            progress[ticker]["mark"] = store.mark(ticker)
+        written.clear()
+        _save_checkpoint(path, saved)
+
+    todo = [t for t in tickers if not progress[t]["done"]]
+    cursors = {t: progress[t]["cursor"] for t in todo if progress[t]["cursor"]}
+    stats = {"tickers": len(tickers), "resumed": len(cursors), "pages": 0, "trades": 0, "seconds": 0.0}
+    written = set()
+    start = last_save = time.monotonic()
+    async for page in iter_trade_pages(client, todo, min_ts, max_ts, limit, cursors, concurrency, max_pending):
+        store.append(page.ticker, page.records)
+        written.add(page.ticker)
+        entry = progress[page.ticker]
+        entry["cursor"] = page.cursor
+        entry["done"] = not page.cursor
+        stats["pages"] += 1
+        stats["trades"] += len(page.records)
+        if time.monotonic() - last_save >= checkpoint_interval:
+            save()
+            last_save = time.monotonic()
+    save()
+    stats["seconds"] = time.monotonic() - start
+    return stats
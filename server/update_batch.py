@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Dict, List, Literal, Tuple
+
+import numpy as np
+from orderbook_ext import ServerState, BOOK_UPDATE_DTYPE
+
+
+class UpdateBatch:
+    """
+    Collects single-level book updates and applies them to the ServerState
+    with one `apply_batch` call.
+
+    The first `add` in an event-loop tick schedules a `flush` with
+    `loop.call_soon`, so every update that arrives before the loop regains
+    control goes to C++ together. Anything that must observe the book in order
+    (snapshots, tick size changes, reads) should call `flush` first.
+    """
+
+    def __init__(self, state: ServerState, max_pending: int = 4096):
+        self._state = state
+        self._max_pending = max_pending
+        self._handles: Dict[Tuple[str, str], int] = {}
+        self._pending: List[tuple] = []
+        self._flush_scheduled = False
+        self._after_flush: List[tuple] = []
+
+    def add(self, exchange_id: str, market_id: str, pred: Literal['y', 'n'], side: Literal['b', 'o'],
+            price: float, quantity: float, is_delta: bool = False):
+        """ queue one level update, same semantics as ServerState.update_order_book """
+        self._add(exchange_id, market_id, pred, side, is_delta, False, price, quantity)
+
+    def add_ticks(self, exchange_id: str, market_id: str, pred: Literal['y', 'n'], side: Literal['b', 'o'],
+                  tick: int, quantity: float, is_delta: bool = False):
+        """ queue one level update by ladder index, same semantics as ServerState.update_order_book_ticks """
+        self._add(exchange_id, market_id, pred, side, is_delta, True, tick, quantity)
+
+    def _add(self, exchange_id: str, market_id: str, pred: str, side: str, is_delta: bool, in_ticks: bool,
+             price: float, quantity: float):
+        key = (exchange_id, market_id)
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = self._handles[key] = self._state.register_book(exchange_id, market_id)
+        self._pending.append((handle, pred, side, is_delta, in_ticks, price, quantity))
+
+        if len(self._pending) >= self._max_pending:
+            self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def after_flush(self, latency, exchange_id: str, kind: str, decoded_ns: int):
+        """ record the "apply" latency of updates queued so far once they are flushed (latency_stats) """
+        self._after_flush.append((latency, exchange_id, kind, decoded_ns))
+
+    def flush(self):
+        """ apply everything queued so far """
+        self._flush_scheduled = False
+        if self._pending:
+            records = np.array(self._pending, dtype=BOOK_UPDATE_DTYPE)
+            self._state.apply_batch(records)
+            self._pending.clear()
+        if self._after_flush:
+            now = time.time_ns()
+            for latency, exchange_id, kind, decoded_ns in self._after_flush:
+                latency.record(exchange_id, kind, "apply", now - decoded_ns)
+            self._after_flush.clear()
+
+    def __len__(self):
+        return len(self._pending)
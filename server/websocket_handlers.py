@@ -1,23 +1,36 @@
 import asyncio
 import json
+import time
 import websockets as ws
-from typing import Any, Coroutine, List
+from typing import Any, Callable, Coroutine, List, Optional
 
 from polymarket_client import PolymarketWebSocketClient
 import polymarket_wss_dtypes as ptypes
 from server_internal_dtypes import Auth_Kalshi, Endpoint, LOB_Entry, OrderBook_Key
 from kalshi_client import KalshiWebSocketClient
-from kalshi_tickerv2_dtypes import OrderbookDeltaMessage, OrderbookSnapshotMessage, SubscribedMessage, TickerV2Message
+from kalshi_tickerv2_dtypes import OrderbookDeltaMessage, OrderbookSnapshotMessage, SubscribedMessage, TickerV2Message, TradeMessage
 from orderbook_ext import ServerState, LOBEntry as _LOBEntry
+from update_batch import UpdateBatch
+from connection_pool import ConnectionPool, Feed, Shard
+from feed_recorder import FeedRecorder
+from latency_stats import FeedLatency
+from market_store import BUY, SELL, MarketCapture
+import fast_decode as fd
 
 def _lob(price: float, quantity: float) -> _LOBEntry:
     return _LOBEntry(price, quantity)
 
-async def spawn_extern_listener(endpoints: List[Endpoint], auths: List[Any] = [], verbose=False):
+async def spawn_extern_listener(endpoints: List[Endpoint], auths: List[Any] = [], verbose=False, fast_decode=False, native_ingest=False,
+                                state: ServerState | None = None, on_update: Callable[[], None] | None = None,
+                                recorder: FeedRecorder | None = None):
     """
     Start the external endpoint listener, which spawns new threads
-    for each endpoint and updates the list of threads externs
+    for each endpoint and updates the list of threads externs.
+    All handlers write to `state` (a new one if not given) and call
+    `on_update` after each frame they apply. `recorder` gets every raw frame.
     """
+    if state is None:
+        state = ServerState()
     polymarket_markets = []
     kalshi_markets = []
     for ep in endpoints:
@@ -27,28 +40,78 @@ async def spawn_extern_listener(endpoints: List[Endpoint], auths: List[Any] = []
             kalshi_markets.append(ep)
     tasks = []
     if polymarket_markets:
-        tasks.append(asyncio.create_task(polymarket_ws_handler(polymarket_markets, verbose=verbose)))
+        tasks.append(asyncio.create_task(polymarket_ws_handler(polymarket_markets, verbose=verbose, fast_decode=fast_decode, native_ingest=native_ingest, state=state, on_update=on_update, recorder=recorder)))
     if kalshi_markets:
         try:
             auth_kalshi = [ah for ah in auths if isinstance(ah, Auth_Kalshi)][0]
         except Exception as e:
             raise Exception(f"Needed kalshi private key, got {auths}")
-        tasks.append(asyncio.create_task(kalshi_ws_handler(kalshi_markets, auth=auth_kalshi, verbose=verbose)))
+        tasks.append(asyncio.create_task(kalshi_ws_handler(kalshi_markets, auth=auth_kalshi, verbose=verbose, fast_decode=fast_decode, native_ingest=native_ingest, state=state, on_update=on_update, recorder=recorder)))
     await asyncio.gather(*tasks)
 
-def _update_serverstate_from_polymarket(state: ServerState, msg: ws.Data):
+def _with_update_hook(apply: Callable[[Any, ws.Data], None], on_update: Callable[[], None] | None,
+                      recorder: FeedRecorder | None = None, exchange_id: str = ''):
+    """ the client on_message callback: record the frame, apply(client, frame), then tell on_update """
+    if on_update is None and recorder is None:
+        return apply
+    def on_message(client, msg):
+        if recorder is not None:
+            recorder.record(exchange_id, 0, msg)
+        apply(client, msg)
+        if on_update is not None:
+            on_update()
+    return on_message
+
+# Models the validated (pydantic) decode path constructs per message type.
+# The fast path decodes every type to fast_decode structs instead; both expose
+# the same attribute names, so the apply code below is shared.
+_POLYMARKET_MODELS = {
+    "book": ptypes.BookMessage,
+    "price_change": ptypes.PriceChangeMessage,
+    "tick_size_change": ptypes.TickSizeChangeMessage,
+    "last_trade_price": ptypes.LastTradePriceMessage,
+}
+
+def _decode_polymarket_validated(msg: ws.Data) -> list:
+    events = []
     __m_ = json.loads(msg)
-    for __m in __m_:
-        match __m["event_type"]:
+    for __m in ([__m_] if isinstance(__m_, dict) else __m_):
+        model = _POLYMARKET_MODELS.get(__m["event_type"])
+        events.append(model(**__m) if model is not None else __m)
+    return events
+
+def _decode_polymarket(msg: ws.Data, fast: bool = False) -> list:
+    return fd.decode_polymarket(msg) if fast else _decode_polymarket_validated(msg)
+
+def _update_serverstate_from_polymarket(state: ServerState, msg: ws.Data, batch: UpdateBatch | None = None, fast: bool = False,
+                                        capture: MarketCapture | None = None):
+    """
+    Apply one polymarket frame to the state. With a batch, level updates are
+    queued and applied once per event-loop tick; snapshots and tick size
+    changes flush the batch first so ordering is preserved. `fast` decodes
+    with fast_decode instead of building pydantic models. Trades
+    (last_trade_price) go to `capture`, if given.
+    """
+    _apply_polymarket(state, _decode_polymarket(msg, fast), batch, capture)
+
+def _apply_polymarket(state: ServerState, events: list, batch: UpdateBatch | None = None, capture: MarketCapture | None = None):
+    """ apply decoded polymarket events (see _update_serverstate_from_polymarket) """
+    for _m in events:
+        event_type = _m["event_type"] if isinstance(_m, dict) else _m.event_type
+        match event_type:
             case "book":
-                _m = ptypes.BookMessage(**__m)
+                if batch is not None:
+                    batch.flush()
                 key_exchange = 'polymarket'
                 bids = [_lob(b.price, b.size) for b in _m.bids]
                 offers = [_lob(o.price, o.size) for o in _m.asks]
                 state.init_order_book(key_exchange, _m.asset_id, bids, offers)
             case "price_change":
-                _m = ptypes.PriceChangeMessage(**__m)
                 token_id = _m.asset_id
+                if batch is not None:
+                    for change in _m.changes:
+                        batch.add('polymarket', token_id, 'y', 'b' if change.side == 'BUY' else 'o', change.price, change.size, False)
+                    continue
                 bid_updates = []
                 offer_updates = []
                 for change in _m.changes:
@@ -61,55 +124,312 @@ def _update_serverstate_from_polymarket(state: ServerState, msg: ws.Data):
                 if offer_updates:
                     state.update_order_book('polymarket', token_id, 'y', 'o', offer_updates, False)
             case "tick_size_change":
-                _m = ptypes.TickSizeChangeMessage(**__m)
-                state.set_tick_size('polymarket', _m.asset_id, _m.new_tick_size)
+                if batch is not None:
+                    batch.flush()
+                state.set_tick_size('polymarket', _m.asset_id, float(_m.new_tick_size))
             case "last_trade_price":
-                pass
+                if capture is not None:
+                    capture.trade('polymarket', _m.asset_id, _m.timestamp * 1_000_000, float(_m.price), float(_m.size),
+                                  BUY if _m.side == 'BUY' else SELL)
             case _:
-                raise Exception("got unrecognized type from message", msg)
+                raise Exception("got unrecognized type from message", _m)
+
+def _ingest_polymarket_native(state: ServerState, msg: ws.Data, fast: bool = False, capture: MarketCapture | None = None):
+    """
+    Parse and apply the frame in C++ (GIL released). Only the events the
+    native parser does not apply come back, and go through the Python path.
+    """
+    for _, raw in state.ingest_polymarket(msg):
+        _update_serverstate_from_polymarket(state, raw, None, fast, capture)
 
-async def polymarket_ws_handler(market_tickers: List[Endpoint], verbose=False):
-    state: ServerState = ServerState() # type: ignore
+async def polymarket_ws_handler(market_tickers: List[Endpoint], verbose=False, fast_decode=False, native_ingest=False,
+                                state: ServerState | None = None, on_update: Callable[[], None] | None = None,
+                                recorder: FeedRecorder | None = None):
+    if state is None:
+        state = ServerState()
+    batch = UpdateBatch(state)
 
+    if native_ingest:
+        apply = lambda _, msg: _ingest_polymarket_native(state, msg, fast_decode)
+    else:
+        apply = lambda _, msg: _update_serverstate_from_polymarket(state, msg, batch, fast_decode)
+    on_message = _with_update_hook(apply, on_update, recorder, 'polymarket')
     client = PolymarketWebSocketClient(
         asset_ids=[m.market_id for m in market_tickers if m.exchange_id=='polymarket'],
         channel='market',
-        on_message=lambda _, msg: _update_serverstate_from_polymarket(state, msg),
+        on_message=on_message,
     )
 
     await client.connect()
 
-def _update_serverstate_from_kalshi(state: ServerState, msg: ws.Data):
+_KALSHI_MODELS = {
+    "ticker_v2": TickerV2Message,
+    "subscribed": SubscribedMessage,
+    "orderbook_snapshot": OrderbookSnapshotMessage,
+    "orderbook_delta": OrderbookDeltaMessage,
+    "trade": TradeMessage,
+}
+
+def _decode_kalshi_validated(msg: ws.Data):
     __m = json.loads(msg)
-    match __m['type']:
-        case "ticker_v2":
-            _m = TickerV2Message(**__m)
-        case "subscribed":
-            _m = SubscribedMessage(**__m)
+    model = _KALSHI_MODELS.get(__m['type'])
+    return model(**__m) if model is not None else __m
+
+OnGap = Callable[[int, List[str]], None]
+
+def _update_serverstate_from_kalshi(state: ServerState, msg: ws.Data, batch: UpdateBatch | None = None, fast: bool = False,
+                                    on_gap: OnGap | None = None, stream: int = 0, capture: MarketCapture | None = None):
+    """
+    Apply one kalshi frame to the state. With a batch, deltas are queued and
+    applied once per event-loop tick; snapshots flush the batch first.
+    `fast` decodes with fast_decode instead of building pydantic models.
+    Orderbook messages are checked against their subscription's seq
+    (ServerState.kalshi_sequence): on a gap the sid's books go stale, their
+    deltas are dropped until the next snapshot, and `on_gap(sid, tickers)`
+    is called to ask for one. `stream` identifies the connection, since
+    sids are only unique per connection. Trades go to `capture`, if given.
+    """
+    _apply_kalshi(state, _decode_kalshi(msg, fast), batch, on_gap, stream, capture)
+
+def _decode_kalshi(msg: ws.Data, fast: bool = False):
+    return fd.decode_kalshi(msg) if fast else _decode_kalshi_validated(msg)
+
+def _apply_kalshi(state: ServerState, _m, batch: UpdateBatch | None = None, on_gap: OnGap | None = None, stream: int = 0,
+                  capture: MarketCapture | None = None):
+    """ apply one decoded kalshi message (see _update_serverstate_from_kalshi) """
+    if isinstance(_m, dict):
+        # reported by the native parser, which already marked the books stale
+        if _m.get('type') == 'seq_gap' and on_gap is not None:
+            on_gap(_m['sid'], [state.book_key(h)[1] for h in _m['books']])
+        return
+    match _m.type:
         case "orderbook_snapshot":
-            _m = OrderbookSnapshotMessage(**__m)
-            bids = []
-            offers = []
-            if _m.msg.yes:
-                bids = [_lob(round(d[0] / 100, 3), d[1]) for d in _m.msg.yes]
-            if _m.msg.no:
-                offers = [_lob(round(1 - (d[0] / 100), 3), d[1]) for d in _m.msg.no]
-            state.init_order_book('kalshi', _m.msg.market_ticker, bids, offers)
+            if batch is not None:
+                batch.flush()
+            handle = state.register_book('kalshi', _m.msg.market_ticker)
+            state.kalshi_sequence(_m.sid, _m.seq, handle, True, stream)
+            # prices are integer cents, the ladder indices at a new book's 0.01 tick
+            state.init_order_book_ticks(handle, _m.msg.yes or [], _m.msg.no or [])
         case "orderbook_delta":
-            _m = OrderbookDeltaMessage(**__m)
+            handle = state.find_handle('kalshi', _m.msg.market_ticker)
+            apply, gapped = state.kalshi_sequence(_m.sid, _m.seq, handle, False, stream)
+            if gapped and on_gap is not None:
+                on_gap(_m.sid, [state.book_key(h)[1] for h in gapped])
+            if not apply:
+                return
             pred = 'y' if _m.msg.side == "yes" else 'n'
-            state.update_order_book('kalshi', _m.msg.market_ticker, pred, 'b', _lob(_m.msg.price / 100, _m.msg.delta), True)
+            if batch is not None:
+                batch.add_ticks('kalshi', _m.msg.market_ticker, pred, 'b', _m.msg.price, _m.msg.delta, True)
+            else:
+                state.update_order_book_ticks(handle, pred, 'b', _m.msg.price, _m.msg.delta, True)
+        case "trade":
+            if capture is not None:
+                capture.trade('kalshi', _m.msg.market_ticker, _m.msg.ts * 1_000_000_000, _m.msg.yes_price / 100,
+                              _m.msg.count, BUY if _m.msg.taker_side == 'yes' else SELL)
+
+def _ingest_kalshi_native(state: ServerState, msg: ws.Data, fast: bool = False, on_gap: OnGap | None = None, stream: int = 0,
+                         capture: MarketCapture | None = None):
+    """
+    Parse and apply the frame in C++ (GIL released). Only the messages the
+    native parser does not apply come back, and go through the Python path.
+    """
+    for _, raw in state.ingest_kalshi(msg, stream):
+        _update_serverstate_from_kalshi(state, raw, None, fast, on_gap, stream, capture)
+
+class KalshiResync:
+    """
+    Recovers books that missed a kalshi orderbook message. On a gap, the
+    affected markets are removed from and re-added to their subscription
+    (KalshiWebSocketClient.resnapshot), which makes kalshi send a fresh
+    snapshot of just those markets; the connection and every other book are
+    untouched. A market whose snapshot has not arrived after `timeout`
+    seconds is asked for again, up to `max_attempts` times.
+    """
+
+    def __init__(self, state: ServerState, timeout: float = 5.0, max_attempts: int = 3):
+        self.state = state
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.requests = 0
+        self.recovered = 0
+        self.failed = 0
+        self._pending: set = set()
+        self._tasks: set = set()
 
-async def kalshi_ws_handler(market_tickers: List[Endpoint], auth: Auth_Kalshi, verbose=False):
-    state: ServerState = ServerState() # type: ignore
+    def on_gap(self, client: KalshiWebSocketClient, sid: int, tickers: List[str]):
+        tickers = [t for t in tickers if t not in self._pending]
+        if not tickers:
+            return
+        self._pending.update(tickers)
+        task = asyncio.get_running_loop().create_task(self._resnapshot(client, sid, tickers))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
+    async def _resnapshot(self, client: KalshiWebSocketClient, sid: int, tickers: List[str]):
+        handles = {t: self.state.find_handle('kalshi', t) for t in tickers}
+        try:
+            for _ in range(self.max_attempts):
+                self.requests += 1
+                try:
+                    await client.resnapshot(sid, tickers)
+                except ws.ConnectionClosed:
+                    return  # the reconnect resubscribes, which snapshots every book
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + self.timeout
+                while tickers and loop.time() < deadline:
+                    await asyncio.sleep(0.05)
+                    still_stale = [t for t in tickers if self.state.is_stale(handles[t])]
+                    self.recovered += len(tickers) - len(still_stale)
+                    tickers = still_stale
+                if not tickers:
+                    return
+            self.failed += len(tickers)
+        finally:
+            self._pending.difference_update(handles)
+
+    def stats(self) -> dict:
+        """ resnapshot counters plus ServerState's sequence counters """
+        return {
+            **self.state.kalshi_sequence_stats(),
+            "resnapshot_requests": self.requests,
+            "recovered": self.recovered,
+            "failed": self.failed,
+            "pending": len(self._pending),
+        }
+
+async def kalshi_ws_handler(market_tickers: List[Endpoint], auth: Auth_Kalshi, verbose=False, fast_decode=False, native_ingest=False,
+                            state: ServerState | None = None, on_update: Callable[[], None] | None = None,
+                            recorder: FeedRecorder | None = None):
+    if state is None:
+        state = ServerState()
+    batch = UpdateBatch(state)
+
+    resync = KalshiResync(state)
+    if native_ingest:
+        apply = lambda client, msg: _ingest_kalshi_native(
+            state, msg, fast_decode, lambda sid, tickers: resync.on_gap(client, sid, tickers))
+    else:
+        apply = lambda client, msg: _update_serverstate_from_kalshi(
+            state, msg, batch, fast_decode, lambda sid, tickers: resync.on_gap(client, sid, tickers))
+    on_message = _with_update_hook(apply, on_update, recorder, 'kalshi')
     ws_client = KalshiWebSocketClient(
         key_id=auth.keyid,
         private_key=auth.private_key, # type: ignore
         environment=auth.env,
-        on_message_callback = lambda _, msg: _update_serverstate_from_kalshi(state, msg),
+        on_message_callback = on_message,
         tickers=[m.market_id for m in market_tickers if m.exchange_id=='kalshi'],
     )
 
     await ws_client.connect()
-    await ws_client.handler()
\ No newline at end of file
+    await ws_client.handler()
+
+def _apply_timed(latency: FeedLatency, exchange_id: str, msg: ws.Data, recv_ns: int, decode: Callable[[ws.Data], Any],
+                 apply: Callable[[Any], None], batch: UpdateBatch | None = None):
+    """ decode and apply one frame, recording its exchange / decode / apply latencies """
+    decoded = decode(msg)
+    decoded_ns = time.time_ns()
+    queued = len(batch) if batch is not None else 0
+    apply(decoded)
+    if batch is not None and len(batch) > queued:
+        # applied when the batch flushes
+        kind = latency.frame(exchange_id, msg, recv_ns, decoded_ns, None)
+        batch.after_flush(latency, exchange_id, kind, decoded_ns)
+    else:
+        latency.frame(exchange_id, msg, recv_ns, decoded_ns, time.time_ns())
+
+def _raw(msg: ws.Data) -> ws.Data:
+    return msg  # native ingest parses inside the apply call
+
+def add_kalshi_feed(pool: ConnectionPool, market_tickers: List[Endpoint], auth: Auth_Kalshi, fast_decode=False, native_ingest=False,
+                    connections: int = 1, max_markets_per_connection: int = 250, ws_base_url: Optional[str] = None) -> Feed:
+    """
+    Kalshi markets on `pool`, sharded over several connections. Each
+    connection's sids are tracked separately (its shard's stream); a
+    dropped connection's sequence state goes with it. `ws_base_url`
+    overrides the environment's host. With `pool.latency` set, every frame's
+    latencies are recorded there. With `pool.capture` set, the connections
+    also subscribe to the trade channel and trades are recorded there.
+    """
+    state = pool.state
+    batch = UpdateBatch(state)
+    resync = KalshiResync(state)
+    latency = pool.latency
+    capture = pool.capture
+
+    def apply(shard: Shard, client, msg, recv_ns: int):
+        on_gap = lambda sid, tickers: resync.on_gap(client, sid, tickers)
+        if latency is not None:
+            if native_ingest:
+                _apply_timed(latency, 'kalshi', msg, recv_ns, _raw,
+                             lambda m: _ingest_kalshi_native(state, m, fast_decode, on_gap, shard.stream, capture))
+            else:
+                _apply_timed(latency, 'kalshi', msg, recv_ns, lambda m: _decode_kalshi(m, fast_decode),
+                             lambda m: _apply_kalshi(state, m, batch, on_gap, shard.stream, capture), batch)
+        elif native_ingest:
+            _ingest_kalshi_native(state, msg, fast_decode, on_gap, shard.stream, capture)
+        else:
+            _update_serverstate_from_kalshi(state, msg, batch, fast_decode, on_gap, shard.stream, capture)
+
+    def make_client(tickers, on_message):
+        return KalshiWebSocketClient(
+            key_id=auth.keyid,
+            private_key=auth.private_key, # type: ignore
+            environment=auth.env,
+            on_message_callback=on_message,
+            tickers=tickers,
+            ws_base_url=ws_base_url,
+            trades=capture is not None,
+        )
+
+    def on_disconnect(shard: Shard):
+        state.reset_kalshi_sequence(shard.stream)
+
+    return pool.add_feed('kalshi', [m.market_id for m in market_tickers if m.exchange_id == 'kalshi'],
+                         make_client, apply, on_disconnect, connections, max_markets_per_connection)
+
+def add_polymarket_feed(pool: ConnectionPool, market_tickers: List[Endpoint], fast_decode=False, native_ingest=False,
+                        connections: int = 1, max_markets_per_connection: int = 250, url: Optional[str] = None) -> Feed:
+    """
+    Polymarket assets on `pool`, sharded over several connections; `url`
+    overrides the client's WSS_URL. With `pool.latency` set, every frame's
+    latencies are recorded there, and with `pool.capture` set, every trade.
+    """
+    state = pool.state
+    batch = UpdateBatch(state)
+    latency = pool.latency
+    capture = pool.capture
+
+    def apply(shard: Shard, client, msg, recv_ns: int):
+        if latency is not None:
+            if native_ingest:
+                _apply_timed(latency, 'polymarket', msg, recv_ns, _raw,
+                             lambda m: _ingest_polymarket_native(state, m, fast_decode, capture))
+            else:
+                _apply_timed(latency, 'polymarket', msg, recv_ns, lambda m: _decode_polymarket(m, fast_decode),
+                             lambda events: _apply_polymarket(state, events, batch, capture), batch)
+        elif native_ingest:
+            _ingest_polymarket_native(state, msg, fast_decode, capture)
+        else:
+            _update_serverstate_from_polymarket(state, msg, batch, fast_decode, capture)
+
+    def make_client(tickers, on_message):
+        return PolymarketWebSocketClient(asset_ids=tickers, channel='market', on_message=on_message, url=url)
+
+    return pool.add_feed('polymarket', [m.market_id for m in market_tickers if m.exchange_id == 'polymarket'],
+                         make_client, apply, None, connections, max_markets_per_connection)
+
+
+def add_groups(state: ServerState, markets: List[Endpoint]) -> dict[int, list[int]]:
+    """
+    Put every market with a group_id into that group's consolidated book
+    (ServerState.get_group_depth / get_group_bbo), `direction` 'n' for
+    markets whose yes is the group's no. Returns group_id -> handles.
+    """
+    groups: dict[int, list[int]] = {}
+    for m in markets:
+        if m.group_id is None:
+            continue
+        handle = state.register_book(m.exchange_id, m.market_id)
+        state.add_to_group(m.group_id, handle, m.direction)
+        groups.setdefault(m.group_id, []).append(handle)
+    return groups
@@ -0,0 +1,49 @@
+import asyncio
+import struct
+
+import orderbook_ext as ob
+import pytest
+
+import client_protocol as proto
+from client_server import ClientServer
+
+
+def test_request_round_trip():
+    body = proto.encode_add_market("kalshi", "KXTEST-1")[4:]
+    assert proto.decode_request(body) == (proto.ADD_MARKET, "kalshi", "KXTEST-1")
+
+
+@pytest.mark.parametrize("body", [
+    b"\x01",                           # no key
+    b"\x01\x06kalshi",                 # no market length
+    b"\x01\x06kal",                    # exchange id cut short
+    b"\x01\x06kalshi\x05\x00ab",       # market id cut short
+    b"\x01\x06kalshi\x02\x00abcd",     # trailing bytes
+])
+def test_malformed_request_is_rejected(body):
+    with pytest.raises(ValueError):
+        proto.decode_request(body)
+
+
+def test_server_answers_malformed_request_with_error():
+    async def main():
+        server = ClientServer(ob.ServerState())
+        await server.start(host="127.0.0.1", port=0)
+        port = server._servers[0].sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for body in (b"\x01\x06kalshi", b"\x01\x06kalshi\x05\x00ab"):
+                writer.write(struct.pack("<I", len(body)) + body)
+            await writer.drain()
+            replies = [proto.decode_message(await asyncio.wait_for(proto.read_frame(reader), 5)) for _ in range(2)]
+            # the connection is still served afterwards
+            writer.write(proto.encode_unsubscribe("kalshi", "nope"))
+            await writer.drain()
+            replies.append(proto.decode_message(await asyncio.wait_for(proto.read_frame(reader), 5)))
+            return replies
+        finally:
+            writer.close()
+            await server.close()
+    replies = asyncio.run(main())
+    assert all(isinstance(r, proto.Error) for r in replies)
+    assert [r.message.startswith("malformed request") for r in replies] == [True, True, False]
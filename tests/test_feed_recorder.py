@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from feed_recorder import FeedRecorder, read_recording
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_quiet_feed_is_flushed_on_the_interval(tmp_path, compress):
+    async def main():
+        rec = FeedRecorder(tmp_path, compress=compress, flush_interval=0.05)
+        flusher = asyncio.create_task(rec.run())
+        try:
+            rec.record("kalshi", 3, '{"type":"orderbook_delta"}')
+            rec.record("polymarket", 0, b"\x01\x02")
+            # no further frames arrive; the timer alone has to write them
+            await asyncio.sleep(0.2)
+            return list(read_recording(tmp_path)), rec
+        finally:
+            flusher.cancel()
+            rec.close()
+
+    frames, rec = asyncio.run(main())
+    assert [(f.exchange_id, f.stream, f.data) for f in frames] == [
+        ("kalshi", 3, '{"type":"orderbook_delta"}'), ("polymarket", 0, b"\x01\x02")]
+    assert rec.bytes_written > 0
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from requests.exceptions import HTTPError
+
+from exchange_sim import ExchangeSimulator
+from kalshi_client import AsyncKalshiHttpClient, KalshiWebSocketClient
+
+KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def run(test, limits=None, max_retries=3, **sim_args):
+    """ run `test(client, sim)` against a fresh simulator """
+    async def main():
+        sim = ExchangeSimulator(**sim_args)
+        await sim.start()
+        try:
+            async with AsyncKalshiHttpClient("test-key", KEY, http_base_url=sim.kalshi_http_url, limits=limits,
+                                             max_retries=max_retries) as client:
+                return await test(client, sim)
+        finally:
+            await sim.close()
+    return asyncio.run(main())
+
+
+def test_rate_limit_spaces_requests():
+    async def test(client, sim):
+        start = time.monotonic()
+        await asyncio.gather(*[client.get_exchange_status() for _ in range(21)])
+        return time.monotonic() - start
+    # a burst of 1, then one request per 1/40 s
+    elapsed = run(test, limits={"read": (40.0, 1.0), "write": (10.0, 10.0)})
+    assert elapsed >= 0.45
+
+
+def test_writes_have_their_own_bucket():
+    async def test(client, sim):
+        start = time.monotonic()
+        order = {"ticker": "SIM-K00000", "action": "buy", "side": "yes", "count": 1, "type": "limit", "yes_price": 40}
+        writes = asyncio.gather(*[client.post("/trade-api/v2/portfolio/orders", order) for _ in range(11)])
+        await asyncio.gather(*[client.get_balance() for _ in range(30)])
+        reads_done = time.monotonic() - start
+        await writes
+        return reads_done, time.monotonic() - start
+    reads_done, writes_done = run(test, limits={"read": (1000.0, 1000.0), "write": (10.0, 1.0)})
+    assert reads_done < 0.5
+    assert writes_done >= 0.9
+
+
+def test_trades_pagination():
+    async def test(client, sim):
+        ticker = sim.kalshi_tickers()[3]
+        pages = [(trades, cursor) async for trades, cursor in client.iter_trades(ticker=ticker, limit=100)]
+        return pages, sim.kalshi_trades(ticker)
+
+    pages, expected = run(test, trades_per_market=250)
+    assert [len(trades) for trades, _ in pages] == [100, 100, 50]
+    assert [bool(cursor) for _, cursor in pages] == [True, True, False]
+    assert [t for trades, _ in pages for t in trades] == expected
+
+
+def test_trades_time_filter():
+    min_ts, max_ts = 1_750_010_000, 1_750_020_000
+
+    async def test(client, sim):
+        page = await client.get_trades(ticker="SIM-K00001", min_ts=min_ts, max_ts=max_ts, limit=1000)
+        return page, sim.kalshi_trades("SIM-K00001")
+    page, history = run(test, trades_per_market=1000)
+
+    def ts(trade):
+        return int(datetime.strptime(trade["created_time"], "%Y-%m-%dT%H:%M:%SZ")
+                   .replace(tzinfo=timezone.utc).timestamp())
+    assert not page["cursor"]
+    assert page["trades"] == [t for t in history if min_ts <= ts(t) <= max_ts] != []
+
+
+def test_429_backs_off_the_whole_client():
+    async def test(client, sim):
+        results = await asyncio.gather(*[client.get_exchange_status() for _ in range(20)], return_exceptions=True)
+        return results, client.retries, client.limiters["read"].backoffs, sim.rest_throttled["read"]
+    # the client allows 10x what the exchange does; every caller still gets through
+    results, retries, backoffs, throttled = run(test, limits={"read": (50.0, 50.0), "write": (10.0, 10.0)},
+                                                rest_rate=5)
+    assert not [r for r in results if isinstance(r, Exception)]
+    assert retries == throttled > 0
+    assert backoffs >= 1
+
+
+def test_429_raises_once_retries_run_out():
+    async def test(client, sim):
+        return await asyncio.gather(*[client.get_exchange_status() for _ in range(5)], return_exceptions=True)
+    results = run(test, limits={"read": (50.0, 50.0), "write": (10.0, 10.0)}, max_retries=0, rest_rate=2)
+    errors = [r for r in results if isinstance(r, Exception)]
+    assert errors and all(isinstance(e, HTTPError) and e.response.status_code == 429 for e in errors)
+
+
+def test_place_and_cancel_order():
+    async def test(client, sim):
+        placed = await client.post("/trade-api/v2/portfolio/orders", {
+            "ticker": "SIM-K00002", "action": "buy", "side": "no", "count": 7, "type": "limit", "no_price": 35,
+            "client_order_id": "abc"})
+        order_id = placed["order"]["order_id"]
+        resting = await client.get("/trade-api/v2/portfolio/orders", {"status": "resting"})
+        canceled = await client.delete(f"/trade-api/v2/portfolio/orders/{order_id}")
+        with pytest.raises(HTTPError) as missing:
+            await client.delete("/trade-api/v2/portfolio/orders/no-such-order")
+        return placed["order"], resting["orders"], canceled, missing.value.response.status_code, sim
+
+    order, resting, canceled, missing_status, sim = run(test)
+    assert order["status"] == "resting" and order["yes_price"] == 65 and order["client_order_id"] == "abc"
+    assert [o["order_id"] for o in resting] == [order["order_id"]]
+    assert canceled["order"]["status"] == "canceled" and canceled["reduced_by"] == 7
+    assert missing_status == 404
+    assert sim.rest_requests["write"] == 3
+
+
+def test_subscribe_replies_are_forgotten_once_every_channel_answers():
+    async def main():
+        sim = ExchangeSimulator()
+        await sim.start()
+        tickers = sim.kalshi_tickers()[:3]
+        client = KalshiWebSocketClient("test-key", KEY, ws_base_url=sim.kalshi_url, tickers=list(tickers),
+                                       trades=True)
+        connection = asyncio.create_task(client.connect())
+        try:
+            # ticker + trade shared by the three markets, then one orderbook_delta sid per market
+            while len(client.subscriptions) < 5:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            return tickers, client
+        finally:
+            connection.cancel()
+            await sim.close()
+
+    tickers, client = asyncio.run(main())
+    assert sorted(channel for channel, _ in client.subscriptions.values()) == \
+        ["orderbook_delta"] * 3 + ["ticker", "trade"]
+    assert sorted(ts[0] for channel, ts in client.subscriptions.values() if channel == "orderbook_delta") == tickers
+    assert client._requested == {}
+    # a rejected command is forgotten on its error reply
+    client._requested[99] = (["SIM-K00000"], {"ticker"})
+    client._track_subscribed('{"id": 99, "type": "error", "msg": {"code": 6, "msg": "Already subscribed"}}')
+    assert client._requested == {}
@@ -0,0 +1,21 @@
+import asyncio
+
+from market_store import MarketStore
+
+
+def test_quiet_market_is_flushed_on_the_interval(tmp_path):
+    async def main():
+        store = MarketStore(tmp_path, flush_interval=0.05)
+        flusher = asyncio.create_task(store.run())
+        try:
+            store.append_row("trades", "kalshi", "K1", (1_750_000_000 * 10 ** 9, 420_000, 3_000_000, 1))
+            # nothing else is appended; the timer alone has to write the row
+            await asyncio.sleep(0.2)
+            return MarketStore(tmp_path).read("trades", "kalshi", "K1"), store.rows_written
+        finally:
+            flusher.cancel()
+            store.close()
+
+    trades, written = asyncio.run(main())
+    assert written == 1
+    assert trades["price"].tolist() == [420_000] and trades["qty"].tolist() == [3_000_000]
@@ -0,0 +1,81 @@
+import numpy as np
+import orderbook_ext as ob
+import pytest
+
+
+def _levels(side):
+    return [(round(e.price, 4), e.quantity) for e in side]
+
+
+def _book(state, bids, offers, tick=0.01):
+    h = state.register_book("test", f"m{state.num_books()}")
+    state.init_order_book(h, [], [])
+    state.set_tick_size(h, tick)
+    for p, q in bids:
+        state.update_order_book(h, "y", "b", ob.LOBEntry(p, q), False)
+    for p, q in offers:
+        state.update_order_book(h, "y", "o", ob.LOBEntry(p, q), False)
+    return h
+
+
+def test_get_market_uncrossed():
+    s = ob.ServerState()
+    h = _book(s, [(0.30, 5.0), (0.40, 7.0)], [(0.60, 3.0), (0.55, 2.0)])
+    bids, offers = s.get_market(h)
+    assert _levels(bids) == [(0.30, 5.0), (0.40, 7.0)]
+    assert _levels(offers) == [(0.55, 2.0), (0.60, 3.0)]
+
+
+def test_get_market_crossed_keeps_every_level():
+    s = ob.ServerState()
+    h = _book(s, [(0.30, 5.0), (0.62, 1.0)], [(0.35, 4.0), (0.70, 3.0)])
+    bids, offers = s.get_market(h)
+    assert _levels(bids) == [(0.30, 5.0), (0.62, 1.0)]
+    assert _levels(offers) == [(0.35, 4.0), (0.70, 3.0)]
+
+
+def test_get_market_locked_offer_stays_an_offer():
+    s = ob.ServerState()
+    h = _book(s, [(0.40, 5.0), (0.50, 6.0)], [(0.50, 8.0), (0.60, 3.0)])
+    bids, offers = s.get_market(h)
+    assert _levels(bids) == [(0.40, 5.0), (0.50, 6.0)]
+    assert _levels(offers) == [(0.50, 8.0), (0.60, 3.0)]
+
+
+def test_get_market_fine_ticks_and_one_sided():
+    s = ob.ServerState()
+    h = _book(s, [(0.1234, 2.0), (0.5001, 1.0)], [], tick=0.0001)
+    bids, offers = s.get_market(h)
+    assert _levels(bids) == [(0.1234, 2.0), (0.5001, 1.0)]
+    assert offers == []
+    h = _book(s, [], [(0.5, 1.0), (0.4999, 2.0)], tick=0.0001)
+    bids, offers = s.get_market(h)
+    assert bids == []
+    assert _levels(offers) == [(0.4999, 2.0), (0.5, 1.0)]
+
+
+@pytest.mark.parametrize("pred", ["y", "n"])
+@pytest.mark.parametrize("side", ["b", "o"])
+def test_tick_api_matches_price_api(pred, side):
+    # every kalshi cent reaches the same level through the float and tick APIs
+    s = ob.ServerState()
+    for cents in range(101):
+        by_price, by_tick = s.register_book("drift", f"p{cents}"), s.register_book("drift", f"t{cents}")
+        s.init_order_book(by_price, [], [])
+        s.init_order_book_ticks(by_tick, [], [])
+        s.update_order_book(by_price, pred, side, ob.LOBEntry(cents / 100, 1.0), False)
+        s.update_order_book_ticks(by_tick, pred, side, cents, 1.0, False)
+        for a, b in zip(s.get_book_arrays(by_price)[:2], s.get_book_arrays(by_tick)[:2]):
+            np.testing.assert_array_equal(a, b, err_msg=f"level drift at {cents} cents")
+
+
+def test_tick_snapshot_matches_price_snapshot():
+    s = ob.ServerState()
+    for cents in range(101):
+        h = s.register_book("drift", f"s{cents}")
+        s.init_order_book(h, [ob.LOBEntry(round(cents / 100, 3), 1.0)],
+                          [ob.LOBEntry(round(1 - cents / 100, 3), 2.0)])
+        expected = s.get_book_arrays(h)[:2]
+        s.init_order_book_ticks(h, [(cents, 1.0)], [(cents, 2.0)])
+        for a, b in zip(expected, s.get_book_arrays(h)[:2]):
+            np.testing.assert_array_equal(a, b, err_msg=f"snapshot level drift at {cents} cents")